@@ -8,7 +8,12 @@ st.set_page_config(
 )
 
 # ─── Imports AFTER config ────────────────────────────────────
-from logic.login_handler import login_form
+from logic.login_handler import forget_session, login_form
+from utils.warmup import start_warm_up
+
+# ─── Warm-up (once per process, in the background) ───────────
+# Fills the shared caches while the first user is still logging in.
+start_warm_up()
 
 # ─── Login Guard ─────────────────────────────────────────────
 if not st.session_state.get("user"):
@@ -35,7 +40,7 @@ if st.button("🚪 Logout"):
         </div>
         <meta http-equiv="refresh" content="1">
     """, unsafe_allow_html=True)
-    st.session_state.pop("user", None)
+    forget_session()
     st.stop()
 
 # ─── Landing Message ─────────────────────────────────────────
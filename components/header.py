@@ -1,11 +1,40 @@
 import streamlit as st
+from utils.jobs import ensure_app_workers
+from utils.notifications import describe, get_hub, subscribe_current_user
+from utils.warmup import start_warm_up
+
+
+# === Notification bell ===
+# Reruns on its own every few seconds, reading only the process's in-memory
+# inbox (utils/notifications.py) – no query per session.
+@st.fragment(run_every=float(st.secrets.get("notifications_refresh_seconds", 10)))
+def notification_bell():
+    key = subscribe_current_user()
+    if key is None:
+        st.markdown("🔔")
+        return
+    hub = get_hub()
+    events, unread = hub.inbox(key)
+    with st.popover(f"🔔 {unread}" if unread else "🔔", use_container_width=True):
+        if not events:
+            st.caption("No notifications yet.")
+        for event in reversed(events):
+            st.markdown(f"{describe(event)}  \n:gray[{event['received_at']:%Y-%m-%d %H:%M}]")
+        if unread and st.button("Mark all as read", key="notifications_mark_read"):
+            hub.mark_read(key)
+            st.rerun(scope="fragment")
+
 
 def render_header():
     user = st.session_state.get("user", {})
     page = st.session_state.get("current_page", "Dashboard")
+    # Jobs queued from cron run even before anyone submits one in the app
+    ensure_app_workers()
+    # No-op once the process is warm (or when `utils.warmup serve` already did it)
+    start_warm_up()
 
     # === Top Bar Layout ===
-    col1, col2, col3 = st.columns([3, 6, 1])
+    col1, col2, col_bell, col3 = st.columns([3, 5, 1, 1])
 
     with col1:
         st.markdown(
@@ -21,7 +50,6 @@ def render_header():
         st.markdown(
             """
             <div style="text-align: right; padding: 0.2rem 1rem 0 0;">
-                <span style="margin-right: 1rem; cursor: pointer;">🔔</span>
                 <span style="margin-right: 1rem; cursor: pointer;" onclick="window.location.reload();">
                     {theme_toggle}
                 </span>
@@ -30,6 +58,9 @@ def render_header():
             unsafe_allow_html=True
         )
 
+    with col_bell:
+        notification_bell()
+
     with col3:
         with st.expander(f"👤 {user.get('username', '')}", expanded=False):
             st.markdown(f"**Role**: `{user.get('role', 'Unknown')}`", unsafe_allow_html=True)
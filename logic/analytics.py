@@ -0,0 +1,388 @@
+import threading
+from collections import OrderedDict
+from datetime import date
+
+import streamlit as st
+
+from logic import repository
+from logic.archive import reaches_archive
+from logic.fx import rates_available, reporting_currency, to_reporting
+from logic.schema import schema_registry
+from logic.warehouse import analytics_query
+from utils.cache import change_cached, month_stamp
+from utils.db import read_connection, reads_from_primary
+
+
+# ─── Month helpers ─────────────────────────────────────────────────────────────
+def month_start(d: date) -> date:
+    return date(d.year, d.month, 1)
+
+
+def add_months(d: date, n: int) -> date:
+    y, m = divmod(d.month - 1 + n, 12)
+    return date(d.year + y, m + 1, 1)
+
+
+# ─── Monthly cash flow query ───────────────────────────────────────────────────
+# Requested amounts are bucketed by requested_date (rejected requests are not
+# cash flow), paid amounts by paid_date. One row per (month, project). A
+# request is never paid before it is requested, so the paid side is bounded by
+# requested_date < end as well; payment_requests is partitioned by that
+# column's year and later years are skipped. {source} is payment_requests, or
+# payment_request_history when the range reaches archived requests.
+CASHFLOW_SQL = """
+    SELECT month, project_id,
+           SUM(requested_usd) AS requested_usd, SUM(requested_iqd) AS requested_iqd,
+           SUM(paid_usd)      AS paid_usd,      SUM(paid_iqd)      AS paid_iqd
+    FROM (
+        SELECT date_trunc('month', pr.requested_date)::date AS month, c.project_id,
+               COALESCE(SUM(pr.amount_usd), 0) AS requested_usd,
+               COALESCE(SUM(pr.amount_iqd), 0) AS requested_iqd,
+               0 AS paid_usd, 0 AS paid_iqd
+        FROM {source} pr
+        JOIN contracts c ON pr.contract_id = c.id
+        WHERE pr.requested_date >= %(start)s AND pr.requested_date < %(end)s
+          AND pr.status <> 'rejected' {scope}
+        GROUP BY 1, 2
+        UNION ALL
+        SELECT date_trunc('month', pr.paid_date)::date, c.project_id,
+               0, 0,
+               COALESCE(SUM(pr.amount_usd), 0), COALESCE(SUM(pr.amount_iqd), 0)
+        FROM {source} pr
+        JOIN contracts c ON pr.contract_id = c.id
+        WHERE pr.status = 'paid' AND pr.requested_date < %(end)s
+          AND pr.paid_date >= %(start)s AND pr.paid_date < %(end)s {scope}
+        GROUP BY 1, 2
+    ) flows
+    GROUP BY month, project_id
+    ORDER BY month, project_id
+"""
+
+
+def query_cashflow(start: date, end: date, project_id=None) -> list[dict]:
+    scope = "AND c.project_id = %(project_id)s" if project_id else ""
+    source = "payment_request_history" if reaches_archive(start) else "payment_requests"
+    with read_connection() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            CASHFLOW_SQL.format(scope=scope, source=source),
+            {"start": start, "end": end, "project_id": project_id},
+        )
+        return cur.fetchall()
+
+
+# ─── Closed-month store ────────────────────────────────────────────────────────
+# A closed month's figures are computed once and kept; only months not yet in
+# the store are queried (one range query), so after a month ends the next
+# render fetches just that month. Each entry is stamped with its month's
+# change token (utils/cache.month_stamp), which moves when a write in any
+# process changes a payment request requested or paid in that month, or
+# deletes or moves a contract with requests then (migration 0018); other
+# months stay. Edits on this server also call invalidate_months() so their
+# own next render does not wait for the notification. Entries built from the
+# primary and from the replica are kept apart, like change_cached's. The
+# store keeps the `closed_months_max_entries` most recently used entries.
+@st.cache_resource
+def _closed_month_store():
+    return OrderedDict(), threading.Lock()
+
+
+def load_closed_months(start: date, end: date, project_id=None) -> list[dict]:
+    store, lock = _closed_month_store()
+    max_entries = int(st.secrets.get("closed_months_max_entries", 2048))
+    primary = reads_from_primary()
+    stamps = {}
+    m = start
+    while m < end:
+        stamps[m] = month_stamp(m)
+        m = add_months(m, 1)
+
+    current = {}
+    with lock:
+        for m, stamp in stamps.items():
+            entry = store.get((primary, project_id, m))
+            if entry and entry[0] == stamp:
+                store.move_to_end((primary, project_id, m))
+                current[m] = entry[1]
+    missing = [m for m in stamps if m not in current]
+    if missing:
+        rows = query_cashflow(missing[0], add_months(missing[-1], 1), project_id)
+        fetched = {m: [] for m in missing}
+        for r in rows:
+            fetched.setdefault(r["month"], []).append(r)
+        with lock:
+            for m, month_rows in fetched.items():
+                store[(primary, project_id, m)] = (stamps[m], month_rows)
+                store.move_to_end((primary, project_id, m))
+                current[m] = month_rows
+            while len(store) > max_entries:
+                store.popitem(last=False)
+
+    return [r for m in stamps for r in current[m]]
+
+
+def invalidate_months(*dates):
+    store, lock = _closed_month_store()
+    months = {month_start(d) for d in dates if d}
+    with lock:
+        for key in [k for k in store if k[2] in months]:
+            del store[key]
+
+
+@change_cached("payment_requests", "reference")
+def load_current_month(month: date, project_id=None) -> list[dict]:
+    return query_cashflow(month, add_months(month, 1), project_id)
+
+
+def load_monthly_cashflow(months_back: int, project_id=None) -> list[dict]:
+    current = month_start(date.today())
+    start = add_months(current, -months_back)
+    return load_closed_months(start, current, project_id) + load_current_month(current, project_id)
+
+
+# ─── Combined totals in the reporting currency ─────────────────────────────────
+# Budgets and paid amounts are summed per day in SQL, then each day is
+# converted at that day's rate with one vectorized lookup.
+@change_cached("payment_requests", "reference")
+def load_daily_totals(project_id=None) -> dict[str, list[dict]]:
+    where = "WHERE c.project_id = %(project_id)s" if project_id else ""
+    scope = "AND c.project_id = %(project_id)s" if project_id else ""
+    params = {"project_id": project_id}
+    with read_connection() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            f"""
+            SELECT COALESCE(c.start_date, c.created_at::date) AS day,
+                   COALESCE(SUM(c.contract_value_usd), 0) AS usd,
+                   COALESCE(SUM(c.contract_value_iqd), 0) AS iqd
+            FROM contracts c {where}
+            GROUP BY 1
+            """,
+            params,
+        )
+        budget = cur.fetchall()
+        cur.execute(
+            f"""
+            SELECT pr.paid_date::date AS day,
+                   COALESCE(SUM(pr.amount_usd), 0) AS usd,
+                   COALESCE(SUM(pr.amount_iqd), 0) AS iqd
+            FROM payment_request_history pr
+            JOIN contracts c ON pr.contract_id = c.id
+            WHERE pr.status = 'paid' AND pr.paid_date IS NOT NULL {scope}
+            GROUP BY 1
+            """,
+            params,
+        )
+        paid = cur.fetchall()
+    return {"budget": budget, "paid": paid}
+
+
+def combined_totals(daily: dict[str, list[dict]], currency: str | None = None) -> dict[str, float] | None:
+    """Budget and paid totals in `currency`, or None when there is no
+    exchange rate to convert with."""
+    if not rates_available():
+        return None
+    currency = currency or reporting_currency()
+    totals = {}
+    for key, rows in daily.items():
+        if not rows:
+            totals[key] = 0.0
+            continue
+        totals[key] = float(to_reporting(
+            [r["usd"] for r in rows], [r["iqd"] for r in rows], [r["day"] for r in rows], currency
+        ).sum())
+    return totals
+
+
+# ─── Aging and time-to-pay ─────────────────────────────────────────────────────
+# Open = not yet paid or rejected; age is counted from requested_date. Buckets
+# are pivoted with FILTER and each contractor's share of the project's open
+# requests comes from a window over the grouped rows, so only one row per
+# (project, contractor) leaves the database.
+AGING_BUCKETS = ["0–7 days", "8–30 days", "31–60 days", "60+ days"]
+
+AGING_SQL = """
+    WITH open_requests AS (
+        SELECT c.project_id, c.contractor_id, ct.name AS contractor_name,
+               COALESCE(pr.amount_usd, 0) AS amount_usd,
+               COALESCE(pr.amount_iqd, 0) AS amount_iqd,
+               CURRENT_DATE - pr.requested_date::date AS age_days
+        FROM payment_requests pr
+        JOIN contracts c ON pr.contract_id = c.id
+        LEFT JOIN contractors ct ON c.contractor_id = ct.id
+        WHERE pr.status NOT IN ('paid', 'rejected')
+          AND pr.requested_date IS NOT NULL {scope}
+    )
+    SELECT project_id, contractor_id, contractor_name,
+           COUNT(*) FILTER (WHERE age_days <= 7)                  AS "0–7 days",
+           COUNT(*) FILTER (WHERE age_days BETWEEN 8 AND 30)      AS "8–30 days",
+           COUNT(*) FILTER (WHERE age_days BETWEEN 31 AND 60)     AS "31–60 days",
+           COUNT(*) FILTER (WHERE age_days > 60)                  AS "60+ days",
+           COUNT(*)                                               AS open_count,
+           SUM(amount_usd) AS open_usd,
+           SUM(amount_iqd) AS open_iqd,
+           MAX(age_days)   AS oldest_days,
+           ROUND(100.0 * COUNT(*) / SUM(COUNT(*)) OVER (PARTITION BY project_id), 1)
+                           AS share_of_project_pct
+    FROM open_requests
+    GROUP BY project_id, contractor_id, contractor_name
+    ORDER BY project_id, open_count DESC
+"""
+
+# One row per project plus a grand-total row (project_id NULL).
+TIME_TO_PAY_SQL = """
+    SELECT c.project_id,
+           GROUPING(c.project_id) = 1 AS is_total,
+           COUNT(*) AS paid_count,
+           percentile_cont(0.5) WITHIN GROUP (ORDER BY days) AS p50_days,
+           percentile_cont(0.9) WITHIN GROUP (ORDER BY days) AS p90_days
+    FROM (
+        SELECT pr.contract_id,
+               EXTRACT(EPOCH FROM (pr.paid_date - pr.requested_date)) / 86400 AS days
+        FROM payment_request_history pr
+        WHERE pr.status = 'paid'
+          AND pr.paid_date IS NOT NULL AND pr.requested_date IS NOT NULL
+    ) t
+    JOIN contracts c ON t.contract_id = c.id
+    WHERE TRUE {scope}
+    GROUP BY GROUPING SETS ((c.project_id), ())
+    ORDER BY is_total, c.project_id
+"""
+
+
+@change_cached("payment_requests", "reference")
+def load_aging(project_id=None) -> dict[str, list[dict]]:
+    scope = "AND c.project_id = %(project_id)s" if project_id else ""
+    params = {"project_id": project_id}
+    with read_connection() as conn:
+        cur = conn.cursor()
+        cur.execute(AGING_SQL.format(scope=scope), params)
+        aging = cur.fetchall()
+        cur.execute(TIME_TO_PAY_SQL.format(scope=scope), params)
+        time_to_pay = cur.fetchall()
+    return {"aging": aging, "time_to_pay": time_to_pay}
+
+
+# ─── Long-range analytics (snapshot engine when enabled) ───────────────────────
+# These scan every request ever made (payment_request_history includes the
+# archive), so in analytics mode they run in DuckDB over the Parquet snapshot
+# instead of on the OLTP database. The SQL is kept to the dialect both
+# engines share.
+def query_history(sql: str, params: dict) -> tuple[list[dict], str | None]:
+    result = analytics_query(sql, params)
+    if result is not None:
+        return result
+    with read_connection() as conn:
+        cur = conn.cursor()
+        cur.execute(sql, params)
+        return cur.fetchall(), None
+
+
+CONTRACTOR_RANKING_SQL = """
+    SELECT ct.id AS contractor_id, ct.name AS contractor,
+           COUNT(DISTINCT c.id) AS contracts,
+           COUNT(pr.id) AS requests,
+           COALESCE(SUM(CASE WHEN pr.status = 'paid' THEN pr.amount_usd END), 0) AS paid_usd,
+           COALESCE(SUM(CASE WHEN pr.status = 'paid' THEN pr.amount_iqd END), 0) AS paid_iqd,
+           AVG(CASE WHEN pr.status = 'paid'
+                    THEN EXTRACT(EPOCH FROM (pr.paid_date - pr.requested_date)) / 86400 END)
+               AS avg_days_to_pay,
+           RANK() OVER (ORDER BY COALESCE(SUM(CASE WHEN pr.status = 'paid'
+                                                   THEN pr.amount_usd END), 0) DESC) AS rank
+    FROM contractors ct
+    JOIN contracts c ON c.contractor_id = ct.id
+    LEFT JOIN payment_request_history pr ON pr.contract_id = c.id
+    WHERE TRUE {scope}
+    GROUP BY ct.id, ct.name
+    ORDER BY rank, contractor
+"""
+
+YEARLY_TREND_SQL = """
+    SELECT EXTRACT(YEAR FROM pr.requested_date)::int AS year, c.project_id,
+           COUNT(*) AS requests,
+           COALESCE(SUM(CASE WHEN pr.status <> 'rejected' THEN pr.amount_usd END), 0) AS requested_usd,
+           COALESCE(SUM(CASE WHEN pr.status = 'paid' THEN pr.amount_usd END), 0) AS paid_usd,
+           COALESCE(SUM(CASE WHEN pr.status <> 'rejected' THEN pr.amount_iqd END), 0) AS requested_iqd,
+           COALESCE(SUM(CASE WHEN pr.status = 'paid' THEN pr.amount_iqd END), 0) AS paid_iqd
+    FROM payment_request_history pr
+    JOIN contracts c ON pr.contract_id = c.id
+    WHERE TRUE {scope}
+    GROUP BY 1, 2
+    ORDER BY 1, 2
+"""
+
+CONTRACT_DRILLDOWN_SQL = """
+    SELECT c.id AS contract_id, c.title, c.project_id, c.status,
+           c.contract_value_usd, c.contract_value_iqd,
+           COUNT(pr.id) AS requests,
+           COALESCE(SUM(CASE WHEN pr.status = 'paid' THEN pr.amount_usd END), 0) AS paid_usd,
+           COALESCE(SUM(CASE WHEN pr.status = 'paid' THEN pr.amount_iqd END), 0) AS paid_iqd,
+           MAX(pr.paid_date) AS last_paid
+    FROM contracts c
+    LEFT JOIN payment_request_history pr ON pr.contract_id = c.id
+    WHERE c.contractor_id = %(contractor_id)s {scope}
+    GROUP BY c.id, c.title, c.project_id, c.status, c.contract_value_usd, c.contract_value_iqd
+    ORDER BY paid_usd DESC
+"""
+
+
+def _history_scope(project_id) -> str:
+    return "AND c.project_id = %(project_id)s" if project_id else ""
+
+
+@st.cache_data(ttl=300, show_spinner=False)
+def load_contractor_ranking(project_id=None):
+    return query_history(
+        CONTRACTOR_RANKING_SQL.format(scope=_history_scope(project_id)), {"project_id": project_id}
+    )
+
+
+@st.cache_data(ttl=300, show_spinner=False)
+def load_yearly_trend(project_id=None):
+    return query_history(
+        YEARLY_TREND_SQL.format(scope=_history_scope(project_id)), {"project_id": project_id}
+    )
+
+
+@st.cache_data(ttl=300, show_spinner=False)
+def load_contract_drilldown(contractor_id: str, project_id=None):
+    return query_history(
+        CONTRACT_DRILLDOWN_SQL.format(scope=_history_scope(project_id)),
+        {"contractor_id": contractor_id, "project_id": project_id},
+    )
+
+
+# ─── Dashboard ─────────────────────────────────────────────────────────────────
+# The dashboard's loaders live here rather than in the page so the boot
+# warm-up (utils/warmup.py) fills the very cache entries the page reads.
+# Summary figures are all-time, so archived requests count too
+# (payment_request_history).
+@change_cached("payment_requests", "reference")
+def load_summary_data(project_id=None):
+    return repository.dashboard_summary(schema_registry().money_columns(), project_id)
+
+
+@change_cached("payment_requests", "reference")
+def load_pending_requests(project_id=None):
+    return repository.pending_payment_requests(project_id)
+
+
+@change_cached("payment_requests", "reference")
+def load_recent_payment_requests(limit=5, project_id=None):
+    return repository.recent_payment_requests(limit, project_id)
+
+
+def dashboard_calls(project_id=None, cashflow_months: int = 36) -> dict:
+    """The dashboard's independent loaders for one project filter, as
+    zero-argument calls for run_parallel(). Warming the cache through the
+    same calls keeps the cache keys identical."""
+    return {
+        "summary": lambda: load_summary_data(project_id=project_id),
+        "pending": lambda: load_pending_requests(project_id=project_id),
+        "recent":  lambda: load_recent_payment_requests(limit=5, project_id=project_id),
+        "cashflow": lambda: load_monthly_cashflow(cashflow_months, project_id=project_id),
+        "daily":   lambda: load_daily_totals(project_id=project_id),
+        "aging":   lambda: load_aging(project_id=project_id),
+        "ranking": lambda: load_contractor_ranking(project_id=project_id),
+        "trend":   lambda: load_yearly_trend(project_id=project_id),
+    }
@@ -0,0 +1,162 @@
+"""Archive tier: closed payment requests of completed projects.
+
+    python -m logic.archive run                 # move everything eligible
+    python -m logic.archive run --dry-run       # only count it
+    python -m logic.archive run --after-days 730 --batch-size 200
+
+Paid and rejected requests of projects whose status is "Completed" move,
+with their attachments, to the `archive` schema (migration 0012) once both
+their requested date and their closing date (paid date, else last update)
+are older than --after-days. Run it from cron, or queue it as a background
+job (python -m utils.jobs enqueue archive); each batch is one short
+transaction and rows being edited are skipped until the next run.
+"""
+
+import argparse
+from datetime import date, datetime, timedelta
+
+import psycopg2
+import streamlit as st
+
+from logic import repository
+from logic.reference import load_data_version
+from utils.jobs import job_handler
+
+AFTER_DAYS = 365
+BATCH_SIZE = 500
+
+ELIGIBLE = """
+    SELECT pr.id, pr.requested_date
+    FROM payment_requests pr
+    JOIN contracts c ON c.id = pr.contract_id
+    JOIN projects p ON p.id = c.project_id
+    WHERE p.status = 'Completed'
+      AND pr.status IN ('paid', 'rejected')
+      AND pr.requested_date < %(cutoff)s
+      AND COALESCE(pr.paid_date, pr.updated_at) < %(cutoff)s
+"""
+
+# Columns moved to the archive, by name: the archive tables were created with
+# LIKE (migration 0012) and need not keep the hot tables' column order.
+REQUEST_COLUMNS = (
+    "id, contract_id, requested_by, requested_date, paid_date, amount_usd, amount_iqd, "
+    "note, status, comments, created_at, updated_at, ref_no"
+)
+ATTACHMENT_COLUMNS = "id, payment_request_id, filename, content, mime_type, created_at, requested_date"
+
+# One batch: attachments first, then the requests, each deleted from the hot
+# table and inserted into the archive in the same statement.
+ARCHIVE_BATCH = f"""
+    WITH batch AS (
+        {ELIGIBLE}
+        ORDER BY pr.requested_date, pr.id
+        LIMIT %(limit)s
+        FOR UPDATE OF pr SKIP LOCKED
+    ), files AS (
+        DELETE FROM payment_request_attachments a USING batch b
+        WHERE a.payment_request_id = b.id AND a.requested_date = b.requested_date
+        RETURNING a.*
+    ), archived_files AS (
+        INSERT INTO archive.payment_request_attachments ({ATTACHMENT_COLUMNS}, archived_at)
+        SELECT {ATTACHMENT_COLUMNS}, NOW() FROM files
+        RETURNING 1
+    ), moved AS (
+        DELETE FROM payment_requests pr USING batch b
+        WHERE pr.id = b.id AND pr.requested_date = b.requested_date
+        RETURNING pr.*
+    ), archived AS (
+        INSERT INTO archive.payment_requests ({REQUEST_COLUMNS}, archived_at)
+        SELECT {REQUEST_COLUMNS}, NOW() FROM moved
+        RETURNING 1
+    )
+    SELECT (SELECT COUNT(*) FROM archived) AS requests,
+           (SELECT COUNT(*) FROM archived_files) AS attachments
+"""
+
+
+# ─── Job ───────────────────────────────────────────────────────────────────────
+def count_eligible(conn, after_days: int = AFTER_DAYS) -> int:
+    cur = conn.cursor()
+    cur.execute(f"SELECT COUNT(*) AS n FROM ({ELIGIBLE}) e", {"cutoff": _cutoff(after_days)})
+    n = cur.fetchone()["n"]
+    conn.rollback()
+    return n
+
+
+def archive_closed_requests(conn, after_days: int = AFTER_DAYS,
+                            batch_size: int = BATCH_SIZE) -> tuple[int, int]:
+    """Moves eligible requests in batches, committing each; returns the
+    number of requests and attachments archived."""
+    cutoff = _cutoff(after_days)
+    cur = conn.cursor()
+    requests = attachments = 0
+    while True:
+        cur.execute("SELECT set_config('paytrack.archiving', 'on', true)")
+        cur.execute(ARCHIVE_BATCH, {"cutoff": cutoff, "limit": batch_size})
+        moved = cur.fetchone()
+        conn.commit()
+        requests += moved["requests"]
+        attachments += moved["attachments"]
+        if moved["requests"] < batch_size:
+            return requests, attachments
+
+
+@job_handler("archive")
+def archive_job(conn, payload: dict) -> dict:
+    requests, attachments = archive_closed_requests(
+        conn, payload.get("after_days", AFTER_DAYS), payload.get("batch_size", BATCH_SIZE)
+    )
+    return {"requests": requests, "attachments": attachments}
+
+
+def _cutoff(after_days: int) -> datetime:
+    return datetime.combine(date.today() - timedelta(days=after_days), datetime.min.time())
+
+
+# ─── App integration ───────────────────────────────────────────────────────────
+# Archived rows are never newer than the archive's latest date, so a view
+# whose range starts after it can leave the archive out.
+@st.cache_data(max_entries=4, show_spinner=False)
+def _archived_through(version: int) -> datetime | None:
+    return repository.archived_through()
+
+
+def reaches_archive(since: date | None) -> bool:
+    """True when a range starting at `since` (None: the beginning) may
+    include archived requests."""
+    through = _archived_through(load_data_version("payment_requests"))
+    if through is None:
+        return False
+    return since is None or since <= through.date()
+
+
+# ─── CLI ───────────────────────────────────────────────────────────────────────
+def main():
+    from psycopg2.extras import RealDictCursor
+
+    from utils.migrations import default_dsn
+
+    parser = argparse.ArgumentParser(description="PayTrack payment request archival")
+    parser.add_argument("command", choices=["run"])
+    parser.add_argument("--after-days", type=int, default=AFTER_DAYS,
+                        help="archive requests closed at least this many days ago")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--dry-run", action="store_true", help="only count eligible requests")
+    parser.add_argument("--dsn", default=default_dsn())
+    args = parser.parse_args()
+    if not args.dsn:
+        parser.error("no DSN: pass --dsn or set PAYTRACK_DB_URL")
+
+    conn = psycopg2.connect(args.dsn, cursor_factory=RealDictCursor)
+    try:
+        if args.dry_run:
+            print(f"{count_eligible(conn, args.after_days)} requests eligible for archival")
+        else:
+            requests, attachments = archive_closed_requests(conn, args.after_days, args.batch_size)
+            print(f"archived {requests} requests and {attachments} attachments")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""Orphan cleanup: rows whose parent has been deleted.
+
+    python -m logic.cleanup run                 # delete every orphan
+    python -m logic.cleanup run --dry-run       # only count them
+    python -m logic.cleanup run --batch-size 200
+
+The schema declares no foreign keys (migration 0001), so deleting a project,
+contract or payment request only removes that row. This job removes what hung off it, top
+down: contracts of missing projects, then their payment requests (hot and
+archived), then attachments, ledger rows, statements and project
+assignments. Orphans are found with anti-joins and deleted in batches of
+--batch-size, one short transaction each, so vacuum can keep up and no long
+lock is held. Deleting a project, contract or payment request queues a run
+as a background job (utils/jobs.py).
+"""
+
+import argparse
+from dataclasses import dataclass
+
+import psycopg2
+
+from utils.jobs import job_handler, submit
+
+BATCH_SIZE = 500
+
+
+@dataclass(frozen=True)
+class Orphans:
+    """Rows of `table` with no parent; `bytes` is a stored payload column."""
+    table: str
+    key: tuple[str, ...]
+    orphan: str
+    bytes: str | None = None
+
+
+# In dependency order: each step may orphan rows for the steps after it
+ORPHANS = (
+    Orphans("contracts", ("id",),
+            "NOT EXISTS (SELECT 1 FROM projects p WHERE p.id = t.project_id)"),
+    Orphans("payment_requests", ("id", "requested_date"),
+            "NOT EXISTS (SELECT 1 FROM contracts c WHERE c.id = t.contract_id)"),
+    Orphans("archive.payment_requests", ("id",),
+            "NOT EXISTS (SELECT 1 FROM contracts c WHERE c.id = t.contract_id)"),
+    Orphans("payment_request_attachments", ("id", "requested_date"),
+            "NOT EXISTS (SELECT 1 FROM payment_requests pr"
+            " WHERE pr.id = t.payment_request_id AND pr.requested_date = t.requested_date)",
+            bytes="content"),
+    Orphans("archive.payment_request_attachments", ("id",),
+            "NOT EXISTS (SELECT 1 FROM archive.payment_requests pr"
+            " WHERE pr.id = t.payment_request_id)",
+            bytes="content"),
+    Orphans("contract_attachments", ("id",),
+            "NOT EXISTS (SELECT 1 FROM contracts c WHERE c.id = t.contract_id)",
+            bytes="file_data"),
+    Orphans("contract_ledger", ("contract_id",),
+            "NOT EXISTS (SELECT 1 FROM contracts c WHERE c.id = t.contract_id)"),
+    Orphans("reports", ("id",),
+            "NOT EXISTS (SELECT 1 FROM projects p WHERE t.kind = 'project' AND p.id = t.entity_id)"
+            " AND NOT EXISTS (SELECT 1 FROM contractors co"
+            " WHERE t.kind = 'contractor' AND co.id = t.entity_id)",
+            bytes="content"),
+    Orphans("user_projects", ("user_id", "project_id"),
+            "NOT EXISTS (SELECT 1 FROM projects p WHERE p.id = t.project_id)"),
+    Orphans("project_assignments", ("user_id", "project_id"),
+            "NOT EXISTS (SELECT 1 FROM projects p WHERE p.id = t.project_id)"),
+)
+
+
+def _count_sql(o: Orphans) -> str:
+    size = f"pg_column_size(t.{o.bytes})" if o.bytes else "0"
+    return f"""
+        SELECT COUNT(*) AS rows, COALESCE(SUM({size}), 0) AS bytes
+        FROM {o.table} t WHERE {o.orphan}
+    """
+
+
+def _batch_sql(o: Orphans) -> str:
+    key = ", ".join(o.key)
+    match = " AND ".join(f"t.{k} = b.{k}" for k in o.key)
+    size = f"pg_column_size(t.{o.bytes})" if o.bytes else "0"
+    return f"""
+        WITH b AS (
+            SELECT {key} FROM {o.table} t WHERE {o.orphan}
+            LIMIT %(limit)s
+            FOR UPDATE SKIP LOCKED
+        ), gone AS (
+            DELETE FROM {o.table} t USING b WHERE {match}
+            RETURNING {size} AS size
+        )
+        SELECT COUNT(*) AS rows, COALESCE(SUM(size), 0) AS bytes FROM gone
+    """
+
+
+# ─── Job ───────────────────────────────────────────────────────────────────────
+def count_orphans(conn) -> dict[str, tuple[int, int]]:
+    """Table -> (orphan rows, payload bytes) as of now. Only the first level
+    is exact: rows orphaned by a cascade are counted once it has run."""
+    cur = conn.cursor()
+    counts = {}
+    for o in ORPHANS:
+        cur.execute(_count_sql(o))
+        row = cur.fetchone()
+        counts[o.table] = (row["rows"], row["bytes"])
+    conn.rollback()
+    return counts
+
+
+def delete_orphans(conn, batch_size: int = BATCH_SIZE) -> dict[str, tuple[int, int]]:
+    """Deletes orphans table by table in committed batches; returns table ->
+    (rows deleted, payload bytes reclaimed) for the tables that had any."""
+    cur = conn.cursor()
+    deleted = {}
+    for o in ORPHANS:
+        sql = _batch_sql(o)
+        rows = size = 0
+        while True:
+            cur.execute(sql, {"limit": batch_size})
+            batch = cur.fetchone()
+            conn.commit()
+            rows += batch["rows"]
+            size += batch["bytes"]
+            if batch["rows"] < batch_size:
+                break
+        if rows:
+            deleted[o.table] = (rows, size)
+    return deleted
+
+
+def format_report(counts: dict[str, tuple[int, int]]) -> str:
+    counts = {table: c for table, c in counts.items() if c[0]}
+    if not counts:
+        return "no orphans"
+    lines = [f"{table}: {rows} rows" + (f", {_size(size)}" if size else "")
+             for table, (rows, size) in counts.items()]
+    total = sum(size for _, size in counts.values())
+    return "\n".join(lines + [f"file payload: {_size(total)}"])
+
+
+def _size(n: int) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if n < 1024 or unit == "GB":
+            return f"{n:.0f} {unit}" if unit == "B" else f"{n:.1f} {unit}"
+        n /= 1024
+
+
+# ─── Background job ────────────────────────────────────────────────────────────
+# Delete buttons only remove the row the user clicked and queue the cascade.
+# Deletes made while a cleanup is still waiting share that one job.
+@job_handler("cleanup")
+def cleanup_job(conn, payload: dict) -> dict:
+    deleted = delete_orphans(conn, payload.get("batch_size", BATCH_SIZE))
+    return {table: {"rows": rows, "bytes": size} for table, (rows, size) in deleted.items()}
+
+
+def request_cleanup():
+    """Queues an orphan cleanup; returns at once."""
+    submit("cleanup", dedupe_key="cleanup")
+
+
+# ─── CLI ───────────────────────────────────────────────────────────────────────
+def main():
+    from psycopg2.extras import RealDictCursor
+
+    from utils.migrations import default_dsn
+
+    parser = argparse.ArgumentParser(description="PayTrack orphan cleanup")
+    parser.add_argument("command", choices=["run"])
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--dry-run", action="store_true", help="only count orphans")
+    parser.add_argument("--dsn", default=default_dsn())
+    args = parser.parse_args()
+    if not args.dsn:
+        parser.error("no DSN: pass --dsn or set PAYTRACK_DB_URL")
+
+    conn = psycopg2.connect(args.dsn, cursor_factory=RealDictCursor)
+    try:
+        if args.dry_run:
+            print(format_report(count_orphans(conn)))
+        else:
+            print(format_report(delete_orphans(conn, args.batch_size)))
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+import argparse
+import csv
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+import numpy as np
+import streamlit as st
+
+from utils.db import read_connection
+
+if TYPE_CHECKING:
+    import pandas as pd  # imported where used: most callers never need it
+
+CURRENCIES = ("USD", "IQD")
+
+
+def reporting_currency() -> str:
+    return st.secrets.get("reporting_currency", "USD")
+
+
+# ─── Rate table: sorted dates + rates, looked up with searchsorted ─────────────
+@dataclass(frozen=True)
+class RateTable:
+    dates: np.ndarray  # datetime64[D], ascending
+    iqd_per_usd: np.ndarray  # float64
+
+    def lookup(self, dates) -> np.ndarray:
+        if not len(self.dates):
+            fallback = float(st.secrets.get("default_iqd_per_usd", "nan"))
+            return np.full(len(dates), fallback)
+        days = np.asarray(dates, dtype="datetime64[D]")
+        idx = np.searchsorted(self.dates, days, side="right") - 1
+        # Dates before the first known rate use the first rate
+        return self.iqd_per_usd[np.clip(idx, 0, len(self.dates) - 1)]
+
+
+@st.cache_data(ttl=600, show_spinner=False)
+def load_rate_table() -> RateTable:
+    with read_connection() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            "SELECT rate_date, per_usd FROM exchange_rates WHERE currency = 'IQD' ORDER BY rate_date"
+        )
+        rows = cur.fetchall()
+    return RateTable(
+        dates=np.array([r["rate_date"] for r in rows], dtype="datetime64[D]"),
+        iqd_per_usd=np.array([r["per_usd"] for r in rows], dtype="float64"),
+    )
+
+
+def rates_available(rates: RateTable | None = None) -> bool:
+    """False when nothing can be converted: the exchange_rates table is empty
+    and `default_iqd_per_usd` is not set."""
+    if rates is None:
+        rates = load_rate_table()
+    return bool(len(rates.dates)) or bool(st.secrets.get("default_iqd_per_usd"))
+
+
+# ─── Vectorized normalization ──────────────────────────────────────────────────
+def to_reporting(usd, iqd, dates, currency: str | None = None, rates: RateTable | None = None) -> np.ndarray:
+    currency = currency or reporting_currency()
+    if rates is None:
+        rates = load_rate_table()
+    usd = np.nan_to_num(np.asarray(usd, dtype="float64"))
+    iqd = np.nan_to_num(np.asarray(iqd, dtype="float64"))
+    rate = rates.lookup(dates)
+    if currency == "IQD":
+        return usd * rate + iqd
+    return usd + iqd / rate
+
+
+def normalize_frame(df: "pd.DataFrame", usd_col: str, iqd_col: str, date_col: str,
+                    currency: str | None = None) -> "pd.Series":
+    import pandas as pd
+
+    usd = pd.to_numeric(df[usd_col], errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+    iqd = pd.to_numeric(df[iqd_col], errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+    dates = pd.to_datetime(df[date_col]).to_numpy(dtype="datetime64[D]")
+    return pd.Series(to_reporting(usd, iqd, dates, currency), index=df.index)
+
+
+# ─── CLI: load rates from CSV (columns: currency, rate_date, per_usd) ─────────
+def main():
+    import psycopg2
+    from psycopg2.extras import execute_values
+
+    from utils.migrations import default_dsn
+
+    parser = argparse.ArgumentParser(description="Load exchange rates from CSV")
+    parser.add_argument("csv_file")
+    parser.add_argument("--dsn", default=default_dsn())
+    args = parser.parse_args()
+
+    with open(args.csv_file, newline="") as f:
+        rows = [(r["currency"].upper(), r["rate_date"], r["per_usd"]) for r in csv.DictReader(f)]
+    conn = psycopg2.connect(args.dsn)
+    with conn, conn.cursor() as cur:
+        execute_values(
+            cur,
+            """
+            INSERT INTO exchange_rates (currency, rate_date, per_usd) VALUES %s
+            ON CONFLICT (currency, rate_date) DO UPDATE SET per_usd = EXCLUDED.per_usd
+            """,
+            rows,
+        )
+    conn.close()
+    print(f"loaded {len(rows)} rates")
+
+
+if __name__ == "__main__":
+    main()
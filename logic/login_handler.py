@@ -1,64 +1,63 @@
 import streamlit as st
-import psycopg2
-from psycopg2.extras import RealDictCursor
 import hashlib
-from streamlit_cookies_manager import EncryptedCookieManager
 import json
+from logic.repository import user_for_login
+from utils.audit import record
 
 
 # ─── COOKIE MANAGER (persistent across sessions) ───────────────────────────────
-cookies = EncryptedCookieManager(
-    prefix="paytrack/",
-    password=st.secrets["cookie_password"]
-)
-if not cookies.ready():
-    st.stop()
+# Built once per script run by login_form() rather than at import: importing
+# this module stays cheap, and every session restores its own cookie instead
+# of only the first one the process served.
+def _cookies():
+    from streamlit_cookies_manager import EncryptedCookieManager
+
+    cookies = EncryptedCookieManager(
+        prefix="paytrack/",
+        password=st.secrets["cookie_password"]
+    )
+    if not cookies.ready():
+        st.stop()
+    return cookies
 
 # Restore session from cookie if available
-saved = cookies.get("user_session")
-if saved:
+def _restore_session(cookies) -> bool:
+    saved = cookies.get("user_session")
+    if not saved:
+        return False
     try:
         st.session_state.user = json.loads(saved)
+        return True
     except json.JSONDecodeError:
         cookies["user_session"] = None  # clear invalid data
         cookies.save()
+        return False
 
 # ─── PASSWORD HASH ─────────────────────────────────────────────────────────────
 def hash_password(pw: str) -> str:
     return hashlib.sha256(pw.encode()).hexdigest()
 
 # ─── AUTHENTICATION ────────────────────────────────────────────────────────────
-def authenticate_user(username: str, password: str) -> bool:
+def authenticate_user(username: str, password: str, cookies) -> bool:
     try:
-        conn = psycopg2.connect(st.secrets["db_url"], cursor_factory=RealDictCursor)
-        cur  = conn.cursor()
-        cur.execute(
-            "SELECT id, username, role, hashed_password FROM users WHERE username = %s AND is_active = TRUE",
-            (username,)
-        )
-        user = cur.fetchone()
-        conn.close()
+        user = user_for_login(username)
     except Exception as e:
         st.error(f"Database error: {e}")
         return False
 
     if not user or hash_password(password) != user["hashed_password"]:
+        record("login_failed", "session", user["id"] if user else None,
+               f"Failed login for {username}", user={"username": username})
         return False
 
-    # Load assigned projects
-    conn = psycopg2.connect(st.secrets["db_url"], cursor_factory=RealDictCursor)
-    cur  = conn.cursor()
-    cur.execute("SELECT project_id FROM user_projects WHERE user_id = %s", (user["id"],))
-    assigned = [r["project_id"] for r in cur.fetchall()]
-    conn.close()
-
     session_user = {
         "id":                user["id"],
         "username":          user["username"],
         "role":              user["role"],
-        "assigned_projects": assigned,
+        "assigned_projects": user["assigned_projects"],
     }
     st.session_state.user = session_user
+    record("login", "session", user["id"], f"{user['username']} logged in", user=session_user)
 
     # Save to cookie
     cookies["user_session"] = json.dumps(session_user)
@@ -67,19 +66,26 @@ def authenticate_user(username: str, password: str) -> bool:
     return True
 
 # ─── LOGOUT ────────────────────────────────────────────────────────────────────
-def logout():
+def forget_session(cookies=None):
+    cookies = cookies or _cookies()
     st.session_state.pop("user", None)
     cookies["user_session"] = None
     cookies.save()
+
+def logout(cookies):
+    forget_session(cookies)
     st.rerun()
 
 # ─── LOGIN FORM ────────────────────────────────────────────────────────────────
 def login_form():
+    cookies = _cookies()
     if st.session_state.get("user"):
         st.write(f"👋 Logged in as **{st.session_state.user['username']}**")
         if st.button("🔒 Logout"):
-            logout()
+            logout(cookies)
         return
+    if _restore_session(cookies):
+        st.rerun()
 
     st.subheader("🔐 Login to GEG PayTrack")
     with st.form("login_form"):
@@ -87,7 +93,7 @@ def login_form():
         pwd    = st.text_input("Password", type="password")
         submit = st.form_submit_button("Login")
         if submit:
-            if authenticate_user(uname, pwd):
+            if authenticate_user(uname, pwd, cookies):
                 st.success("✅ Login successful")
                 st.rerun()
             else:
@@ -0,0 +1,243 @@
+import re
+from collections import defaultdict
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Iterable
+
+import numpy as np
+import streamlit as st
+
+from utils.db import pooled_connection, read_connection, reads_from_primary
+
+
+# ─── Immutable choice lists ────────────────────────────────────────────────────
+# IDs and labels live in numpy arrays (one contiguous buffer each) in label
+# order, with read-only maps both ways. Instances are shared by every session
+# in the process, so nothing here may be mutated after construction.
+@dataclass(frozen=True)
+class Choices:
+    ids: np.ndarray
+    labels: tuple[str, ...]
+    id_by_label: MappingProxyType
+    label_by_id: MappingProxyType
+
+    @classmethod
+    def build(cls, pairs: Iterable[tuple[str, str]]) -> "Choices":
+        pairs = sorted(((str(i), label) for i, label in pairs), key=lambda p: p[1])
+        ids = np.array([i for i, _ in pairs], dtype=str)
+        ids.setflags(write=False)
+        labels = tuple(label for _, label in pairs)
+        return cls(
+            ids=ids,
+            labels=labels,
+            id_by_label=MappingProxyType(dict(zip(labels, ids.tolist()))),
+            label_by_id=MappingProxyType(dict(zip(ids.tolist(), labels))),
+        )
+
+    def subset(self, ids: Iterable[str]) -> "Choices":
+        keep = {str(i) for i in ids}
+        return Choices.build((i, self.label_by_id[i]) for i in keep if i in self.label_by_id)
+
+
+# ─── Contract lookup index ─────────────────────────────────────────────────────
+# Positions (into contracts.labels) grouped by project, contractor and both,
+# plus a word-prefix index for typeahead. Prefix lists are ranked: matches on
+# an earlier word of the label (the title) come before later ones, then label
+# order. A search walks one ranked list and stops at `limit`, so its cost does
+# not grow with the number of contracts.
+PREFIX_MAX = 8
+SEARCH_SCAN_MAX = 5000
+EMPTY = np.array([], dtype=np.int32)
+
+
+def _words(label: str) -> tuple[str, ...]:
+    return tuple(re.findall(r"\w+", label.lower()))
+
+
+def _positions(groups: dict) -> MappingProxyType:
+    frozen = {}
+    for key, positions in groups.items():
+        arr = np.array(positions, dtype=np.int32)
+        arr.setflags(write=False)
+        frozen[key] = arr
+    return MappingProxyType(frozen)
+
+
+@dataclass(frozen=True)
+class ContractIndex:
+    by_project: MappingProxyType
+    by_contractor: MappingProxyType
+    by_pair: MappingProxyType
+    by_prefix: MappingProxyType
+    words: tuple[tuple[str, ...], ...]
+
+    @classmethod
+    def build(cls, labels: tuple[str, ...], projects: list[str], contractors: list[str]) -> "ContractIndex":
+        by_project, by_contractor, by_pair = defaultdict(list), defaultdict(list), defaultdict(list)
+        best = defaultdict(dict)  # prefix -> {position: earliest word index}
+        words = tuple(_words(label) for label in labels)
+        for pos, (project_id, contractor_id) in enumerate(zip(projects, contractors)):
+            by_project[project_id].append(pos)
+            by_contractor[contractor_id].append(pos)
+            by_pair[(project_id, contractor_id)].append(pos)
+            for wi, word in enumerate(words[pos]):
+                for n in range(1, min(len(word), PREFIX_MAX) + 1):
+                    best[word[:n]].setdefault(pos, wi)
+        ranked = {
+            prefix: sorted(hits, key=lambda pos: (hits[pos], pos)) for prefix, hits in best.items()
+        }
+        return cls(
+            by_project=_positions(by_project),
+            by_contractor=_positions(by_contractor),
+            by_pair=_positions(by_pair),
+            by_prefix=_positions(ranked),
+            words=words,
+        )
+
+
+@dataclass(frozen=True)
+class ReferenceStore:
+    version: int
+    projects: Choices        # "name (location)"
+    project_names: Choices   # "name"
+    contractors: Choices
+    contracts: Choices       # "title (project) — contractor"
+    # Position-aligned with contracts.ids: owning project / contractor ID.
+    contract_project: np.ndarray
+    contract_contractor: np.ndarray
+    contract_index: ContractIndex
+
+    @classmethod
+    def build(cls, version: int, projects: list[dict], contractors: list[dict],
+              contracts: list[dict]) -> "ReferenceStore":
+        """From rows of projects (id, name, location), contractors (id, name)
+        and contracts (id, title, project_id, contractor_id, project_name,
+        contractor_name)."""
+        contract_choices = Choices.build(
+            (c["id"], f"{c['title']} ({c['project_name']}) — {c['contractor_name']}") for c in contracts
+        )
+        owner = {str(c["id"]): (str(c["project_id"]), str(c["contractor_id"])) for c in contracts}
+        contract_project = [owner[i][0] for i in contract_choices.ids.tolist()]
+        contract_contractor = [owner[i][1] for i in contract_choices.ids.tolist()]
+        return cls(
+            version=version,
+            projects=Choices.build((p["id"], f"{p['name']} ({p['location']})") for p in projects),
+            project_names=Choices.build((p["id"], p["name"]) for p in projects),
+            contractors=Choices.build((c["id"], c["name"]) for c in contractors),
+            contracts=contract_choices,
+            contract_project=_frozen(contract_project),
+            contract_contractor=_frozen(contract_contractor),
+            contract_index=ContractIndex.build(
+                contract_choices.labels, contract_project, contract_contractor
+            ),
+        )
+
+    def _scope(self, project_id=None, contractor_id=None) -> np.ndarray | None:
+        idx = self.contract_index
+        if project_id and contractor_id:
+            return idx.by_pair.get((str(project_id), str(contractor_id)), EMPTY)
+        if project_id:
+            return idx.by_project.get(str(project_id), EMPTY)
+        if contractor_id:
+            return idx.by_contractor.get(str(contractor_id), EMPTY)
+        return None
+
+    def contract_labels(self, project_id=None, contractor_id=None) -> tuple[str, ...]:
+        scope = self._scope(project_id, contractor_id)
+        if scope is None:
+            return self.contracts.labels
+        labels = self.contracts.labels
+        return tuple(labels[i] for i in scope)
+
+    def search_contracts(
+        self, query: str = "", project_id=None, contractor_id=None, limit: int = 50
+    ) -> tuple[tuple[str, ...], bool]:
+        """Up to `limit` ranked contract labels whose words start with every
+        word of `query`, within the project/contractor scope. The flag is True
+        when more contracts may match than were returned: more did, or the
+        scan stopped after SEARCH_SCAN_MAX candidates."""
+        labels = self.contracts.labels
+        terms = _words(query or "")
+        if not terms:
+            scope = self._scope(project_id, contractor_id)
+            positions = range(len(labels)) if scope is None else scope
+            return tuple(labels[i] for i in positions[:limit]), len(positions) > limit
+
+        idx = self.contract_index
+        candidates = idx.by_prefix.get(terms[0][:PREFIX_MAX], EMPTY)
+        scope = self._scope(project_id, contractor_id)
+        if scope is not None:
+            # Narrowed to the scope before the scan cap, so the cap only ever
+            # skips contracts the search could have returned
+            candidates = candidates[np.isin(candidates, scope, assume_unique=True)]
+        found = []
+        for pos in candidates[:SEARCH_SCAN_MAX]:
+            words = idx.words[pos]
+            if all(any(w.startswith(t) for w in words) for t in terms):
+                found.append(labels[pos])
+                if len(found) > limit:
+                    return tuple(found[:limit]), True
+        return tuple(found), len(candidates) > SEARCH_SCAN_MAX
+
+
+def _frozen(values: list[str]) -> np.ndarray:
+    arr = np.array(values, dtype=str)
+    arr.setflags(write=False)
+    return arr
+
+
+# ─── Loading ───────────────────────────────────────────────────────────────────
+# Versions key caches that every session shares, while a session may read
+# the primary (it has just written) or the replica. A version is therefore
+# read from, and cached for, the server the session reads from: what the
+# session then builds under it comes from that server too and holds at least
+# the changes the version counts. A replica build never lands under a
+# version only the primary has reached.
+def load_data_version(name: str) -> int:
+    return _data_version(name, reads_from_primary())
+
+
+@st.cache_data(ttl=5, show_spinner=False)
+def _data_version(name: str, primary: bool) -> int:
+    with pooled_connection(replica=not primary) as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT version FROM data_versions WHERE name = %s", (name,))
+        row = cur.fetchone()
+    return row["version"] if row else 0
+
+
+@st.cache_resource(max_entries=2, show_spinner=False)
+def _store_for(version: int) -> ReferenceStore:
+    with read_connection() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT id, name, location FROM projects")
+        projects = cur.fetchall()
+        cur.execute("SELECT id, name FROM contractors")
+        contractors = cur.fetchall()
+        cur.execute(
+            """
+            SELECT c.id, c.title, c.project_id, c.contractor_id,
+                   p.name AS project_name, co.name AS contractor_name
+            FROM contracts c
+            LEFT JOIN projects p ON c.project_id = p.id
+            LEFT JOIN contractors co ON c.contractor_id = co.id
+            """
+        )
+        contracts = cur.fetchall()
+    return ReferenceStore.build(version, projects, contractors, contracts)
+
+
+def reference_store() -> ReferenceStore:
+    """The process-wide store for the current `reference` data version."""
+    return _store_for(load_data_version("reference"))
+
+
+def forget_data_versions():
+    """Drops this process's cached versions of every domain."""
+    _data_version.clear()
+
+
+def reference_changed():
+    """Call after writing projects, contractors or contracts so this process
+    picks up the new version on its next rerun."""
+    forget_data_versions()
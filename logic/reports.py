@@ -0,0 +1,353 @@
+"""Contractor and project statements, rendered to XLSX or PDF.
+
+    python -m logic.reports build project <id> 2025-01-01 2025-12-31 --format pdf -o out.pdf
+
+A statement lists the entity's contracts with their value, what was
+requested and paid in the period and the balance left at its end, followed
+by every payment request of the period (archived ones included). Pages queue
+reports with request_report(); a background job (utils/jobs.py) builds each
+one and stores the file in `reports` (migration 0013), keyed by entity,
+period, format and the data versions it was built from, so an unchanged
+statement is never built twice. XLSX needs openpyxl, PDF needs reportlab.
+"""
+
+import argparse
+import io
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+from typing import TYPE_CHECKING
+
+import psycopg2
+
+from logic import repository
+from utils.jobs import ensure_app_workers, job_handler
+
+if TYPE_CHECKING:
+    import pandas as pd  # imported where used: loading the job handlers must stay cheap
+
+KINDS = {"contractor": ("contractors", "contractor_id"), "project": ("projects", "project_id")}
+FORMATS = {
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "pdf": "application/pdf",
+}
+
+# ─── Statement queries ─────────────────────────────────────────────────────────
+# One row per contract of the entity: what was requested and what was paid in
+# [start, end), and the balance left at `end`. Payments before `end` can only
+# be on requests made before it (paid date >= requested date), so the join
+# stops there and only the partitions up to `end` are read.
+CONTRACT_LINES = """
+    SELECT c.title AS contract, p.name AS project, co.name AS contractor, c.status,
+           c.contract_value_usd AS value_usd, c.contract_value_iqd AS value_iqd,
+           COUNT(h.id) FILTER (WHERE h.requested_date >= %(start)s) AS requests,
+           COALESCE(SUM(h.amount_usd) FILTER (WHERE h.requested_date >= %(start)s
+                                                AND lower(h.status) <> 'rejected'), 0) AS requested_usd,
+           COALESCE(SUM(h.amount_iqd) FILTER (WHERE h.requested_date >= %(start)s
+                                                AND lower(h.status) <> 'rejected'), 0) AS requested_iqd,
+           COALESCE(SUM(h.amount_usd) FILTER (WHERE h.paid_date >= %(start)s AND h.paid_date < %(end)s
+                                                AND lower(h.status) = 'paid'), 0) AS paid_usd,
+           COALESCE(SUM(h.amount_iqd) FILTER (WHERE h.paid_date >= %(start)s AND h.paid_date < %(end)s
+                                                AND lower(h.status) = 'paid'), 0) AS paid_iqd,
+           COALESCE(c.contract_value_usd, 0)
+             - COALESCE(SUM(h.amount_usd) FILTER (WHERE h.paid_date < %(end)s
+                                                  AND lower(h.status) = 'paid'), 0) AS balance_usd,
+           COALESCE(c.contract_value_iqd, 0)
+             - COALESCE(SUM(h.amount_iqd) FILTER (WHERE h.paid_date < %(end)s
+                                                  AND lower(h.status) = 'paid'), 0) AS balance_iqd
+    FROM contracts c
+    JOIN projects p ON p.id = c.project_id
+    JOIN contractors co ON co.id = c.contractor_id
+    LEFT JOIN payment_request_history h
+           ON h.contract_id = c.id AND h.requested_date < %(end)s
+    WHERE c.{column} = %(entity_id)s
+    GROUP BY c.id, p.name, co.name
+    ORDER BY p.name, co.name, c.title
+"""
+
+REQUEST_LINES = """
+    SELECT h.ref_no, c.title AS contract, h.requested_date::date AS requested,
+           h.paid_date::date AS paid, h.status, h.amount_usd, h.amount_iqd, h.note
+    FROM payment_request_history h
+    JOIN contracts c ON c.id = h.contract_id
+    WHERE c.{column} = %(entity_id)s
+      AND h.requested_date >= %(start)s AND h.requested_date < %(end)s
+    ORDER BY h.requested_date, h.ref_no
+"""
+
+COLUMN_TITLES = {
+    "contract": "Contract", "project": "Project", "contractor": "Contractor", "status": "Status",
+    "value_usd": "Value USD", "value_iqd": "Value IQD", "requests": "Requests",
+    "requested_usd": "Requested USD", "requested_iqd": "Requested IQD",
+    "paid_usd": "Paid USD", "paid_iqd": "Paid IQD", "balance_usd": "Balance USD",
+    "balance_iqd": "Balance IQD", "ref_no": "Ref", "requested": "Requested", "paid": "Paid",
+    "amount_usd": "Amount USD", "amount_iqd": "Amount IQD", "note": "Note",
+}
+TOTALS = ("value_usd", "value_iqd", "requests", "requested_usd", "requested_iqd",
+          "paid_usd", "paid_iqd", "balance_usd", "balance_iqd")
+
+
+@dataclass(frozen=True)
+class Statement:
+    kind: str
+    entity_name: str
+    start: date
+    end: date
+    contracts: "pd.DataFrame"
+    requests: "pd.DataFrame"
+
+    @property
+    def title(self) -> str:
+        return f"{self.kind.title()} statement — {self.entity_name}"
+
+    @property
+    def period(self) -> str:
+        return f"{self.start:%Y-%m-%d} to {self.end:%Y-%m-%d}"
+
+    def totals(self) -> dict:
+        return {col: self.contracts[col].fillna(0).sum() for col in TOTALS}
+
+
+def load_statement(conn, kind: str, entity_id: str, start: date, end: date) -> Statement:
+    """Reads a statement for the requests made from `start` to `end`
+    (inclusive) in one snapshot."""
+    import pandas as pd
+
+    table, column = KINDS[kind]
+    params = {
+        "entity_id": entity_id,
+        "start": datetime.combine(start, time.min),
+        "end": datetime.combine(end + timedelta(days=1), time.min),
+    }
+    cur = conn.cursor()
+    cur.execute(f"SELECT name FROM {table} WHERE id = %(entity_id)s", params)
+    entity = cur.fetchone()
+    if entity is None:
+        raise LookupError(f"{kind} {entity_id} no longer exists")
+    cur.execute(CONTRACT_LINES.format(column=column), params)
+    contracts = pd.DataFrame(cur.fetchall(), columns=[d[0] for d in cur.description])
+    cur.execute(REQUEST_LINES.format(column=column), params)
+    requests = pd.DataFrame(cur.fetchall(), columns=[d[0] for d in cur.description])
+    for df in (contracts, requests):
+        for col in df.columns:
+            if col.endswith(("_usd", "_iqd")):
+                df[col] = df[col].astype(float)
+    return Statement(kind, entity["name"], start, end, contracts, requests)
+
+
+# ─── Rendering ─────────────────────────────────────────────────────────────────
+def _require(module: str, what: str):
+    try:
+        return __import__(module)
+    except ImportError as e:
+        raise RuntimeError(f"{what} reports need {module}: pip install {module}") from e
+
+
+def render_xlsx(statement: Statement) -> bytes:
+    _require("openpyxl", "XLSX")
+    import pandas as pd
+
+    summary = pd.concat(
+        [statement.contracts, pd.DataFrame([{"contract": "Total", **statement.totals()}])],
+        ignore_index=True,
+    )
+    buf = io.BytesIO()
+    with pd.ExcelWriter(buf, engine="openpyxl") as xl:
+        pd.DataFrame({"": [statement.title, f"Period {statement.period}"]}).to_excel(
+            xl, sheet_name="Contracts", index=False, header=False
+        )
+        summary.rename(columns=COLUMN_TITLES).to_excel(
+            xl, sheet_name="Contracts", index=False, startrow=3
+        )
+        statement.requests.rename(columns=COLUMN_TITLES).to_excel(
+            xl, sheet_name="Requests", index=False
+        )
+        for sheet in xl.sheets.values():
+            for column in sheet.columns:
+                width = max(len(str(cell.value or "")) for cell in column[3:] or column)
+                sheet.column_dimensions[column[0].column_letter].width = min(max(width, 8) + 2, 50)
+    return buf.getvalue()
+
+
+def render_pdf(statement: Statement) -> bytes:
+    _require("reportlab", "PDF")
+    import pandas as pd
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4, landscape
+    from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+    from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+    styles = getSampleStyleSheet()
+    cell = ParagraphStyle("cell", fontSize=7, leading=8)
+
+    def grid(first_amount: int, last_amount: int) -> TableStyle:
+        return TableStyle([
+            ("FONTSIZE", (0, 0), (-1, -1), 7),
+            ("BACKGROUND", (0, 0), (-1, 0), colors.lightgrey),
+            ("GRID", (0, 0), (-1, -1), 0.25, colors.grey),
+            ("ALIGN", (first_amount, 1), (last_amount, -1), "RIGHT"),
+            ("VALIGN", (0, 0), (-1, -1), "TOP"),
+        ])
+
+    def money(v) -> str:
+        return "" if v is None or pd.isna(v) else f"{v:,.2f}"
+
+    totals = statement.totals()
+    contract_rows = [["Contract", "Project / contractor", "Value USD", "Value IQD", "Req.",
+                      "Requested USD", "Requested IQD", "Paid USD", "Paid IQD",
+                      "Balance USD", "Balance IQD"]]
+    for r in statement.contracts.itertuples():
+        contract_rows.append([
+            Paragraph(r.contract, cell), Paragraph(f"{r.project} / {r.contractor}", cell),
+            money(r.value_usd), money(r.value_iqd), r.requests,
+            money(r.requested_usd), money(r.requested_iqd), money(r.paid_usd), money(r.paid_iqd),
+            money(r.balance_usd), money(r.balance_iqd),
+        ])
+    contract_rows.append(["Total", "", *(
+        totals[c] if c == "requests" else money(totals[c]) for c in TOTALS
+    )])
+
+    request_rows = [["Ref", "Contract", "Requested", "Paid", "Status", "USD", "IQD", "Note"]]
+    for r in statement.requests.itertuples():
+        request_rows.append([
+            r.ref_no or "", r.contract, r.requested, r.paid or "", r.status,
+            money(r.amount_usd), money(r.amount_iqd), Paragraph(r.note or "", cell),
+        ])
+
+    buf = io.BytesIO()
+    doc = SimpleDocTemplate(buf, pagesize=landscape(A4), title=statement.title)
+    doc.build([
+        Paragraph(statement.title, styles["Title"]),
+        Paragraph(f"Period {statement.period} · generated {datetime.now():%Y-%m-%d %H:%M}",
+                  styles["Normal"]),
+        Spacer(1, 12),
+        Table(contract_rows, style=grid(2, -1), repeatRows=1,
+              colWidths=[110, 130, *[62] * 9]),
+        Spacer(1, 18),
+        Paragraph(f"Payment requests ({len(statement.requests)})", styles["Heading2"]),
+        Table(request_rows, style=grid(5, 6), repeatRows=1,
+              colWidths=[70, 150, 60, 60, 55, 70, 85, 240]),
+    ])
+    return buf.getvalue()
+
+
+RENDERERS = {"xlsx": render_xlsx, "pdf": render_pdf}
+
+
+def file_name(statement: Statement, fmt: str) -> str:
+    slug = "".join(ch if ch.isalnum() else "_" for ch in statement.entity_name).strip("_")
+    return f"{statement.kind}_{slug}_{statement.start:%Y%m%d}-{statement.end:%Y%m%d}.{fmt}"
+
+
+# ─── Background job ────────────────────────────────────────────────────────────
+# A retried job finds its report still 'running' and starts it over
+START = """
+    UPDATE reports SET status = 'running', started_at = NOW(), error = NULL
+    WHERE id = %(id)s AND status IN ('queued', 'running')
+    RETURNING id, kind, entity_id::text, period_start, period_end, format
+"""
+
+FINISH = """
+    UPDATE reports SET status = 'done', finished_at = NOW(), file_name = %(file_name)s,
+                       content = %(content)s
+    WHERE id = %(id)s
+"""
+
+FAIL = """
+    UPDATE reports SET status = 'failed', finished_at = NOW(), error = %(error)s WHERE id = %(id)s
+"""
+
+# A finished report replaces the ones built for the same statement from older data
+DROP_SUPERSEDED = """
+    DELETE FROM reports o USING reports n
+    WHERE n.id = %(id)s AND o.id <> n.id
+      AND o.kind = n.kind AND o.entity_id = n.entity_id AND o.format = n.format
+      AND o.period_start = n.period_start AND o.period_end = n.period_end
+      AND o.status IN ('done', 'failed')
+      AND (o.reference_version, o.requests_version) < (n.reference_version, n.requests_version)
+"""
+
+
+def build_report(conn, report: dict) -> tuple[str, bytes]:
+    try:
+        conn.cursor().execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY")
+        statement = load_statement(conn, report["kind"], report["entity_id"],
+                                   report["period_start"], report["period_end"])
+    finally:
+        conn.rollback()
+    return file_name(statement, report["format"]), RENDERERS[report["format"]](statement)
+
+
+def _fail(conn, report_id: str, error: str):
+    conn.cursor().execute(FAIL, {"id": report_id, "error": error[:500]})
+
+
+def _report_job_failed(conn, payload: dict, error: str):
+    _fail(conn, payload["report_id"], error)
+
+
+@job_handler("report", on_failure=_report_job_failed)
+def report_job(conn, payload: dict) -> dict:
+    """Builds one queued report. A statement that cannot be built (entity
+    deleted, renderer missing) fails at once; database errors are retried."""
+    cur = conn.cursor()
+    cur.execute(START, {"id": payload["report_id"]})
+    report = cur.fetchone()
+    conn.commit()
+    if report is None:
+        return {"skipped": "report already built or deleted"}
+    try:
+        name, content = build_report(conn, report)
+    except (LookupError, RuntimeError) as e:
+        _fail(conn, report["id"], str(e))
+        return {"failed": str(e)}
+    cur.execute(FINISH, {"id": report["id"], "file_name": name, "content": psycopg2.Binary(content)})
+    cur.execute(DROP_SUPERSEDED, {"id": report["id"]})
+    return {"file_name": name, "bytes": len(content)}
+
+
+def request_report(kind: str, entity_id: str, start: date, end: date, fmt: str,
+                   requested_by: str | None) -> str:
+    """Queues a statement unless one for the current data already exists or
+    is being built; returns the report id."""
+    report_id = repository.queue_report(kind, entity_id, start, end, fmt, requested_by)
+    ensure_app_workers()
+    return report_id
+
+
+# ─── CLI ───────────────────────────────────────────────────────────────────────
+def main():
+    from psycopg2.extras import RealDictCursor
+
+    from utils.migrations import default_dsn
+
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--dsn", default=default_dsn())
+    parser = argparse.ArgumentParser(description="PayTrack statements")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", parents=[common],
+                           help="build one statement to a file, bypassing the queue")
+    build.add_argument("kind", choices=list(KINDS))
+    build.add_argument("entity_id")
+    build.add_argument("start", type=date.fromisoformat)
+    build.add_argument("end", type=date.fromisoformat)
+    build.add_argument("--format", choices=list(FORMATS), default="xlsx")
+    build.add_argument("-o", "--output", required=True)
+    args = parser.parse_args()
+    if not args.dsn:
+        parser.error("no DSN: pass --dsn or set PAYTRACK_DB_URL")
+
+    conn = psycopg2.connect(args.dsn, cursor_factory=RealDictCursor)
+    try:
+        _, content = build_report(conn, {
+            "kind": args.kind, "entity_id": args.entity_id, "period_start": args.start,
+            "period_end": args.end, "format": args.format,
+        })
+        with open(args.output, "wb") as f:
+            f.write(content)
+        print(f"wrote {args.output} ({len(content)} bytes)")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,784 @@
+import uuid
+import zlib
+from datetime import date, datetime
+
+import psycopg2
+
+from utils.db import execute, pooled_connection, read_connection, statement, write_connection
+from utils.jobs import PRIORITY_INTERACTIVE, enqueue
+
+
+# ─── Repository ────────────────────────────────────────────────────────────────
+# Page SQL lives here as named Statements (utils/db.py), prepared once per
+# pooled connection. Reads go through read_connection (replica when one is
+# configured), writes through write_connection. Functions return RealDict
+# rows; recording to the activity log and cache invalidation stay with the
+# callers.
+def _all(stmt, params: dict | None = None) -> list[dict]:
+    with read_connection() as conn:
+        return execute(conn.cursor(), stmt, params).fetchall()
+
+
+def _one(stmt, params: dict | None = None) -> dict | None:
+    with read_connection() as conn:
+        return execute(conn.cursor(), stmt, params).fetchone()
+
+
+def _write(stmt, params: dict | None = None) -> dict | None:
+    with write_connection() as conn:
+        cur = execute(conn.cursor(), stmt, params)
+        return cur.fetchone() if cur.description else None
+
+
+# ─── Payment requests ──────────────────────────────────────────────────────────
+PAYMENT_REQUEST_COLUMNS = """
+    pr.id, pr.ref_no, pr.contract_id, pr.requested_date, pr.paid_date,
+    pr.amount_usd, pr.amount_iqd, pr.note, pr.status, pr.comments,
+    pr.created_at, pr.updated_at
+"""
+
+# One row per request with its contract, project, contractor and requester;
+# archived_at is set only on rows read from the archive (migration 0012)
+_REQUEST_VIEW = """
+    SELECT {columns}, {archived_at} AS archived_at,
+           pr.requested_by, u.username AS requested_by_name,
+           c.title AS contract_title, p.name AS project_name, co.name AS contractor_name
+    FROM {source} pr
+    LEFT JOIN users u ON pr.requested_by = u.id
+    LEFT JOIN contracts c ON pr.contract_id = c.id
+    LEFT JOIN projects p ON c.project_id = p.id
+    LEFT JOIN contractors co ON c.contractor_id = co.id
+"""
+PAYMENT_REQUEST_VIEW = _REQUEST_VIEW.format(
+    columns=PAYMENT_REQUEST_COLUMNS, archived_at="NULL::timestamp", source="payment_requests"
+)
+ARCHIVED_REQUEST_VIEW = _REQUEST_VIEW.format(
+    columns=PAYMENT_REQUEST_COLUMNS, archived_at="pr.archived_at", source="archive.payment_requests"
+)
+
+# payment_requests is partitioned by requested_date year (migration 0011), so
+# lists are always bounded by requested_date and only the years in range are
+# scanned. Single requests are addressed by their key, (id, requested_date).
+_LIST_BOUNDS = """
+    WHERE pr.requested_date >= %(since)s AND pr.requested_date < %(until)s
+      AND (%(status)s::text IS NULL OR pr.status = %(status)s)
+"""
+
+LIST_PAYMENT_REQUESTS = statement("pr_list", f"""
+    {PAYMENT_REQUEST_VIEW}
+    {_LIST_BOUNDS}
+    ORDER BY pr.requested_date DESC
+""")
+
+# Reference-number prefix search, served by the lower(ref_no) index
+SEARCH_PAYMENT_REQUESTS = statement("pr_search", f"""
+    {PAYMENT_REQUEST_VIEW}
+    {_LIST_BOUNDS}
+      AND lower(pr.ref_no) LIKE %(prefix)s
+    ORDER BY pr.requested_date DESC
+""")
+
+ARCHIVED_PAYMENT_REQUESTS = statement("pr_archived_list", f"""
+    {ARCHIVED_REQUEST_VIEW}
+    {_LIST_BOUNDS}
+    ORDER BY pr.requested_date DESC
+""")
+
+SEARCH_ARCHIVED_PAYMENT_REQUESTS = statement("pr_archived_search", f"""
+    {ARCHIVED_REQUEST_VIEW}
+    {_LIST_BOUNDS}
+      AND lower(pr.ref_no) LIKE %(prefix)s
+    ORDER BY pr.requested_date DESC
+""")
+
+FIRST_REQUEST_DATE = statement("pr_first_date", """
+    SELECT LEAST((SELECT MIN(requested_date) FROM payment_requests),
+                 (SELECT MIN(requested_date) FROM archive.payment_requests)) AS first
+""")
+
+# No archived row has a requested or paid date after this
+ARCHIVED_THROUGH = statement("pr_archived_through", """
+    SELECT MAX(GREATEST(requested_date, paid_date)) AS through FROM archive.payment_requests
+""")
+
+# Dashboard lists: the requester is shown by username in place of the id
+_DASHBOARD_VIEW = f"""
+    SELECT {PAYMENT_REQUEST_COLUMNS},
+           c.title AS contract_title, p.name AS project_name,
+           co.name AS contractor_name, u.username AS requested_by
+    FROM payment_requests pr
+    JOIN contracts c ON pr.contract_id = c.id
+    JOIN projects p ON c.project_id = p.id
+    JOIN contractors co ON c.contractor_id = co.id
+    JOIN users u ON pr.requested_by = u.id
+"""
+
+PENDING_PAYMENT_REQUESTS = statement("pr_pending", f"""
+    {_DASHBOARD_VIEW}
+    WHERE pr.status = 'pending'
+    ORDER BY pr.created_at DESC
+""")
+
+PENDING_PAYMENT_REQUESTS_FOR_PROJECT = statement("pr_pending_project", f"""
+    {_DASHBOARD_VIEW}
+    WHERE pr.status = 'pending' AND c.project_id = %(project_id)s
+    ORDER BY pr.created_at DESC
+""")
+
+RECENT_PAYMENT_REQUESTS = statement("pr_recent", f"""
+    {_DASHBOARD_VIEW}
+    ORDER BY pr.created_at DESC
+    LIMIT %(limit)s
+""")
+
+RECENT_PAYMENT_REQUESTS_FOR_PROJECT = statement("pr_recent_project", f"""
+    {_DASHBOARD_VIEW}
+    WHERE c.project_id = %(project_id)s
+    ORDER BY pr.created_at DESC
+    LIMIT %(limit)s
+""")
+
+INSERT_PAYMENT_REQUEST = statement("pr_insert", """
+    INSERT INTO payment_requests
+      (id, contract_id, requested_by, requested_date, paid_date,
+       amount_usd, amount_iqd, note, status, comments, created_at, updated_at)
+    VALUES (%(id)s, %(contract_id)s, %(requested_by)s, %(requested_date)s, %(paid_date)s,
+            %(amount_usd)s, %(amount_iqd)s, %(note)s, %(status)s, %(comments)s, NOW(), NOW())
+    RETURNING ref_no
+""")
+
+# Returns the values the row had before the update
+UPDATE_PAYMENT_REQUEST = statement("pr_update", """
+    UPDATE payment_requests pr
+    SET amount_usd = %(amount_usd)s,
+        amount_iqd = %(amount_iqd)s,
+        note = %(note)s,
+        paid_date = %(paid_date)s,
+        status = %(status)s,
+        comments = %(comments)s,
+        updated_at = NOW()
+    FROM (
+      SELECT id, requested_date, ref_no, paid_date, status, amount_usd, amount_iqd
+      FROM payment_requests WHERE id = %(id)s AND requested_date = %(stored_date)s
+      FOR UPDATE
+    ) old
+    WHERE pr.id = old.id AND pr.requested_date = old.requested_date
+    RETURNING old.ref_no, old.requested_date, old.paid_date, old.status,
+              old.amount_usd, old.amount_iqd
+""")
+
+# A new requested_date may move the request and its attachments to another
+# year's partition; the flag tells the notify trigger this is not a new request.
+FLAG_REQUEST_MOVE = statement("pr_flag_move", """
+    SELECT set_config('paytrack.moving_request', %(id)s, true)
+""")
+
+MOVE_PAYMENT_REQUEST = statement("pr_move", """
+    WITH files AS (
+        UPDATE payment_request_attachments SET requested_date = %(requested_date)s
+        WHERE payment_request_id = %(id)s AND requested_date = %(stored_date)s
+    )
+    UPDATE payment_requests SET requested_date = %(requested_date)s
+    WHERE id = %(id)s AND requested_date = %(stored_date)s
+""")
+
+ENSURE_PARTITION = statement("pr_ensure_partition", """
+    SELECT ensure_payment_request_partition(%(year)s) AS ready
+""")
+
+MARK_PAYMENT_REQUEST_PAID = statement("pr_mark_paid", """
+    UPDATE payment_requests
+    SET status = 'paid', paid_date = %(paid_date)s, updated_at = NOW()
+    WHERE id = %(id)s AND requested_date = %(requested_date)s
+""")
+
+# Only the request: its attachments are left to the orphan cleanup job
+# (logic/cleanup.py), so deleting never waits on large files
+DELETE_PAYMENT_REQUEST = statement("pr_delete", """
+    DELETE FROM payment_requests WHERE id = %(id)s AND requested_date = %(requested_date)s
+    RETURNING requested_date, paid_date
+""")
+
+# Years this process knows have partitions; a year without one lands in the
+# default partition, which is never pruned. The check runs in the write's own
+# transaction, so a year is only remembered once that write has committed.
+_partition_years = set()
+
+
+def _ensure_partition(cur, requested_date: date) -> bool:
+    if requested_date.year in _partition_years:
+        return True
+    return execute(cur, ENSURE_PARTITION, {"year": requested_date.year}).fetchone()["ready"]
+
+
+def list_payment_requests(ref_prefix: str | None = None, status: str | None = None,
+                          since: date | None = None, until: date | None = None,
+                          archived: bool = False) -> list[dict]:
+    """Requests with since <= requested_date < until; leave a bound out only
+    when every year really is wanted. `archived` reads the archive instead."""
+    params = {"since": since or date.min, "until": until or date.max, "status": status}
+    if ref_prefix:
+        prefix = ref_prefix.strip().lower().replace("%", r"\%") + "%"
+        stmt = SEARCH_ARCHIVED_PAYMENT_REQUESTS if archived else SEARCH_PAYMENT_REQUESTS
+        return _all(stmt, {**params, "prefix": prefix})
+    return _all(ARCHIVED_PAYMENT_REQUESTS if archived else LIST_PAYMENT_REQUESTS, params)
+
+
+def first_request_year() -> int | None:
+    row = _one(FIRST_REQUEST_DATE)
+    return row["first"].year if row and row["first"] else None
+
+
+def archived_through() -> datetime | None:
+    return _one(ARCHIVED_THROUGH)["through"]
+
+
+def pending_payment_requests(project_id: str | None = None) -> list[dict]:
+    if project_id:
+        return _all(PENDING_PAYMENT_REQUESTS_FOR_PROJECT, {"project_id": project_id})
+    return _all(PENDING_PAYMENT_REQUESTS)
+
+
+def recent_payment_requests(limit: int = 5, project_id: str | None = None) -> list[dict]:
+    if project_id:
+        return _all(RECENT_PAYMENT_REQUESTS_FOR_PROJECT, {"project_id": project_id, "limit": limit})
+    return _all(RECENT_PAYMENT_REQUESTS, {"limit": limit})
+
+
+def insert_payment_request(request_id: str, contract_id: str, requested_by: str,
+                           requested_date: date, paid_date: date | None,
+                           amount_usd: float | None, amount_iqd: float | None,
+                           note: str | None, status: str, comments: str | None) -> str:
+    """Inserts the request; returns the ref_no the database assigned."""
+    with write_connection() as conn:
+        cur = conn.cursor()
+        partitioned = _ensure_partition(cur, requested_date)
+        row = execute(cur, INSERT_PAYMENT_REQUEST, {
+            "id": request_id, "contract_id": contract_id, "requested_by": requested_by,
+            "requested_date": requested_date, "paid_date": paid_date or None,
+            "amount_usd": amount_usd or None, "amount_iqd": amount_iqd or None,
+            "note": note or None, "status": status, "comments": comments or None,
+        }).fetchone()
+    if partitioned:
+        _partition_years.add(requested_date.year)
+    return row["ref_no"]
+
+
+def update_payment_request(request_id: str, stored_date: datetime, requested_date: date,
+                           paid_date: date | None, amount_usd: float | None,
+                           amount_iqd: float | None, note: str | None, status: str,
+                           comments: str | None) -> dict | None:
+    """Updates the request stored under stored_date; returns its previous
+    values, or None if it is gone."""
+    partitioned = False
+    with write_connection() as conn:
+        cur = conn.cursor()
+        old = execute(cur, UPDATE_PAYMENT_REQUEST, {
+            "id": request_id, "stored_date": stored_date, "paid_date": paid_date or None,
+            "amount_usd": amount_usd or None, "amount_iqd": amount_iqd or None,
+            "note": note or None, "status": status, "comments": comments or None,
+        }).fetchone()
+        if old and old["requested_date"] != datetime.combine(requested_date, datetime.min.time()):
+            partitioned = _ensure_partition(cur, requested_date)
+            execute(cur, FLAG_REQUEST_MOVE, {"id": request_id})
+            execute(cur, MOVE_PAYMENT_REQUEST, {
+                "id": request_id, "stored_date": old["requested_date"], "requested_date": requested_date,
+            })
+    if partitioned:
+        _partition_years.add(requested_date.year)
+    return old
+
+
+def mark_payment_request_paid(request_id: str, requested_date: datetime, paid_date: datetime):
+    _write(MARK_PAYMENT_REQUEST_PAID, {
+        "id": request_id, "requested_date": requested_date, "paid_date": paid_date,
+    })
+
+
+def delete_payment_request(request_id: str, requested_date: datetime) -> dict | None:
+    """Deletes the request and returns its dates; call
+    logic.cleanup.request_cleanup() afterwards for its attachments."""
+    return _write(DELETE_PAYMENT_REQUEST, {"id": request_id, "requested_date": requested_date})
+
+
+# ─── Payment request attachments ───────────────────────────────────────────────
+# Attachments carry their request's requested_date and share its partition.
+REQUEST_ATTACHMENTS = statement("pra_list", """
+    SELECT id, filename, mime_type, created_at
+    FROM payment_request_attachments
+    WHERE payment_request_id = %(request_id)s AND requested_date = %(requested_date)s
+    ORDER BY created_at DESC
+""")
+
+REQUEST_ATTACHMENT_CONTENT = statement("pra_content", """
+    SELECT content FROM payment_request_attachments
+    WHERE id = %(id)s AND requested_date = %(requested_date)s
+""")
+
+# Inserts nothing if the request is gone
+INSERT_REQUEST_ATTACHMENT = statement("pra_insert", """
+    INSERT INTO payment_request_attachments
+      (id, payment_request_id, requested_date, filename, content, mime_type, created_at)
+    SELECT %(id)s, pr.id, pr.requested_date, %(filename)s, %(content)s, %(mime_type)s, NOW()
+    FROM payment_requests pr
+    WHERE pr.id = %(request_id)s AND pr.requested_date = %(requested_date)s
+""")
+
+DELETE_REQUEST_ATTACHMENT = statement("pra_delete", """
+    DELETE FROM payment_request_attachments
+    WHERE id = %(id)s AND requested_date = %(requested_date)s
+    RETURNING filename
+""")
+
+
+ARCHIVED_REQUEST_ATTACHMENTS = statement("pra_archived_list", """
+    SELECT id, filename, mime_type, created_at
+    FROM archive.payment_request_attachments
+    WHERE payment_request_id = %(request_id)s
+    ORDER BY created_at DESC
+""")
+
+ARCHIVED_ATTACHMENT_CONTENT = statement("pra_archived_content", """
+    SELECT content FROM archive.payment_request_attachments WHERE id = %(id)s
+""")
+
+
+def request_attachments(request_id: str, requested_date: datetime) -> list[dict]:
+    return _all(REQUEST_ATTACHMENTS, {"request_id": request_id, "requested_date": requested_date})
+
+
+def request_attachment_content(attachment_id: str, requested_date: datetime) -> bytes | None:
+    row = _one(REQUEST_ATTACHMENT_CONTENT, {"id": attachment_id, "requested_date": requested_date})
+    return bytes(row["content"]) if row and row["content"] is not None else None
+
+
+def add_request_attachments(request_id: str, requested_date: datetime,
+                            files: list[tuple[str, bytes, str | None]]):
+    """Stores (filename, content, mime type) files in one transaction."""
+    with write_connection() as conn:
+        cur = conn.cursor()
+        for filename, content, mime_type in files:
+            execute(cur, INSERT_REQUEST_ATTACHMENT, {
+                "id": str(uuid.uuid4()), "request_id": request_id,
+                "requested_date": requested_date, "filename": filename,
+                "content": psycopg2.Binary(content), "mime_type": mime_type,
+            })
+            if cur.rowcount == 0:
+                raise LookupError("Payment request no longer exists")
+
+
+def archived_request_attachments(request_id: str) -> list[dict]:
+    return _all(ARCHIVED_REQUEST_ATTACHMENTS, {"request_id": request_id})
+
+
+def archived_attachment_content(attachment_id: str) -> bytes | None:
+    row = _one(ARCHIVED_ATTACHMENT_CONTENT, {"id": attachment_id})
+    return bytes(row["content"]) if row and row["content"] is not None else None
+
+
+def delete_request_attachment(attachment_id: str, requested_date: datetime) -> str | None:
+    """Deletes the attachment; returns its filename, or None if it was gone."""
+    row = _write(DELETE_REQUEST_ATTACHMENT, {"id": attachment_id, "requested_date": requested_date})
+    return row["filename"] if row else None
+
+
+# ─── Projects ──────────────────────────────────────────────────────────────────
+PROJECT_COLUMNS = """
+    p.id, p.name, p.location, p.start_date, p.end_date, p.status, p.created_by, p.created_at
+"""
+
+LIST_PROJECTS = statement("project_list", f"""
+    SELECT {PROJECT_COLUMNS}
+    FROM projects p
+    ORDER BY p.created_at DESC
+""")
+
+LIST_PROJECTS_FOR_USER = statement("project_list_user", f"""
+    SELECT {PROJECT_COLUMNS}
+    FROM projects p
+    JOIN project_assignments pa ON p.id = pa.project_id
+    WHERE pa.user_id = %(user_id)s
+    ORDER BY p.created_at DESC
+""")
+
+INSERT_PROJECT = statement("project_insert", """
+    INSERT INTO projects (id, name, location, start_date, end_date, status, created_by, created_at)
+    VALUES (%(id)s, %(name)s, %(location)s, %(start_date)s, %(end_date)s, %(status)s,
+            %(created_by)s, %(created_at)s)
+""")
+
+UPDATE_PROJECT = statement("project_update", """
+    UPDATE projects
+    SET name = %(name)s, location = %(location)s, start_date = %(start_date)s,
+        end_date = %(end_date)s, status = %(status)s
+    WHERE id = %(id)s
+""")
+
+DELETE_PROJECT = statement("project_delete", """
+    DELETE FROM projects WHERE id = %(id)s
+""")
+
+
+def list_projects(user_id: str | None = None) -> list[dict]:
+    """All projects, or only those assigned to `user_id`."""
+    if user_id:
+        return _all(LIST_PROJECTS_FOR_USER, {"user_id": user_id})
+    return _all(LIST_PROJECTS)
+
+
+def insert_project(name: str, location: str | None, start_date: date, end_date: date,
+                   status: str, created_by: str) -> str:
+    project_id = str(uuid.uuid4())
+    _write(INSERT_PROJECT, {
+        "id": project_id, "name": name, "location": location, "start_date": start_date,
+        "end_date": end_date, "status": status, "created_by": created_by,
+        "created_at": datetime.utcnow(),
+    })
+    return project_id
+
+
+def update_project(project_id: str, name: str, location: str | None, start_date: date,
+                   end_date: date, status: str):
+    _write(UPDATE_PROJECT, {
+        "id": project_id, "name": name, "location": location, "start_date": start_date,
+        "end_date": end_date, "status": status,
+    })
+
+
+def delete_project(project_id: str):
+    _write(DELETE_PROJECT, {"id": project_id})
+
+
+# ─── Contracts ─────────────────────────────────────────────────────────────────
+CONTRACT_COLUMNS = """
+    c.id, c.title, c.project_id, c.contractor_id, c.contract_value_usd, c.contract_value_iqd,
+    c.start_date, c.end_date, c.status, c.scope, c.created_at
+"""
+
+LIST_CONTRACTS = statement("contract_list", f"""
+    SELECT {CONTRACT_COLUMNS}, p.name AS project_name, t.name AS contractor_name
+    FROM contracts c
+    JOIN projects p ON c.project_id = p.id
+    JOIN contractors t ON c.contractor_id = t.id
+    ORDER BY c.created_at DESC
+""")
+
+LIST_CONTRACTS_FOR_USER = statement("contract_list_user", f"""
+    SELECT {CONTRACT_COLUMNS}, p.name AS project_name, t.name AS contractor_name
+    FROM contracts c
+    JOIN projects p ON c.project_id = p.id
+    JOIN contractors t ON c.contractor_id = t.id
+    JOIN project_assignments pa ON p.id = pa.project_id
+    WHERE pa.user_id = %(user_id)s
+    ORDER BY c.created_at DESC
+""")
+
+PROJECTS_FOR_USER = statement("contract_user_projects", """
+    SELECT p.id, p.name
+    FROM projects p
+    JOIN project_assignments pa ON p.id = pa.project_id
+    WHERE pa.user_id = %(user_id)s
+    ORDER BY p.name
+""")
+
+INSERT_CONTRACT = statement("contract_insert", """
+    INSERT INTO contracts (
+        id, title, project_id, contractor_id,
+        contract_value_usd, contract_value_iqd,
+        start_date, end_date, status, scope, created_at
+    ) VALUES (%(id)s, %(title)s, %(project_id)s, %(contractor_id)s, %(value_usd)s, %(value_iqd)s,
+              %(start_date)s, %(end_date)s, %(status)s, %(scope)s, %(created_at)s)
+""")
+
+DELETE_CONTRACT = statement("contract_delete", """
+    DELETE FROM contracts WHERE id = %(id)s
+""")
+
+# Single-row lookup in contract_ledger, which a trigger keeps in step with
+# every payment request change
+CONTRACT_BALANCE = statement("contract_balance", """
+    SELECT c.contract_value_usd,
+           c.contract_value_iqd,
+           COALESCE(l.requested_usd, 0) AS requested_usd,
+           COALESCE(l.requested_iqd, 0) AS requested_iqd,
+           COALESCE(l.paid_usd, 0) AS paid_usd,
+           COALESCE(l.paid_iqd, 0) AS paid_iqd
+    FROM contracts c
+    LEFT JOIN contract_ledger l ON l.contract_id = c.id
+    WHERE c.id = %(id)s
+""")
+
+
+def list_contracts(user_id: str | None = None) -> list[dict]:
+    """All contracts, or only those of the projects assigned to `user_id`."""
+    if user_id:
+        return _all(LIST_CONTRACTS_FOR_USER, {"user_id": user_id})
+    return _all(LIST_CONTRACTS)
+
+
+def projects_for_user(user_id: str) -> list[dict]:
+    return _all(PROJECTS_FOR_USER, {"user_id": user_id})
+
+
+def insert_contract(title: str, project_id: str, contractor_id: str,
+                    value_usd: float | None, value_iqd: float | None,
+                    start_date: date, end_date: date, status: str, scope: str | None) -> str:
+    contract_id = str(uuid.uuid4())
+    _write(INSERT_CONTRACT, {
+        "id": contract_id, "title": title, "project_id": project_id,
+        "contractor_id": contractor_id, "value_usd": value_usd or None,
+        "value_iqd": value_iqd or None, "start_date": start_date, "end_date": end_date,
+        "status": status, "scope": scope, "created_at": datetime.utcnow(),
+    })
+    return contract_id
+
+
+def delete_contract(contract_id: str):
+    _write(DELETE_CONTRACT, {"id": contract_id})
+
+
+def contract_balance(contract_id: str) -> dict | None:
+    return _one(CONTRACT_BALANCE, {"id": contract_id})
+
+
+# ─── Contract attachments ──────────────────────────────────────────────────────
+CONTRACT_ATTACHMENTS = statement("ca_list", """
+    SELECT id, file_name, file_type, uploaded_at
+    FROM contract_attachments
+    WHERE contract_id = %(contract_id)s
+    ORDER BY uploaded_at DESC
+""")
+
+CONTRACT_ATTACHMENT_CONTENT = statement("ca_content", """
+    SELECT file_data FROM contract_attachments WHERE id = %(id)s
+""")
+
+INSERT_CONTRACT_ATTACHMENT = statement("ca_insert", """
+    INSERT INTO contract_attachments (id, contract_id, file_name, file_type, file_data)
+    VALUES (%(id)s, %(contract_id)s, %(file_name)s, %(file_type)s, %(file_data)s)
+""")
+
+DELETE_CONTRACT_ATTACHMENT = statement("ca_delete", """
+    DELETE FROM contract_attachments WHERE id = %(id)s
+""")
+
+
+def contract_attachments(contract_id: str) -> list[dict]:
+    return _all(CONTRACT_ATTACHMENTS, {"contract_id": contract_id})
+
+
+def contract_attachment_content(attachment_id: str) -> bytes | None:
+    row = _one(CONTRACT_ATTACHMENT_CONTENT, {"id": attachment_id})
+    return bytes(row["file_data"]) if row and row["file_data"] is not None else None
+
+
+def add_contract_attachments(contract_id: str, files: list[tuple[str, bytes, str | None]]):
+    """Stores (file name, content, file type) files in one transaction."""
+    with write_connection() as conn:
+        cur = conn.cursor()
+        for file_name, content, file_type in files:
+            execute(cur, INSERT_CONTRACT_ATTACHMENT, {
+                "id": str(uuid.uuid4()), "contract_id": contract_id, "file_name": file_name,
+                "file_type": file_type, "file_data": psycopg2.Binary(content),
+            })
+
+
+def delete_contract_attachment(attachment_id: str):
+    _write(DELETE_CONTRACT_ATTACHMENT, {"id": attachment_id})
+
+
+# ─── Contractors ───────────────────────────────────────────────────────────────
+LIST_CONTRACTORS = statement("contractor_list", """
+    SELECT id, name, contact_person, email, phone, address, created_at
+    FROM contractors
+    ORDER BY created_at DESC
+""")
+
+INSERT_CONTRACTOR = statement("contractor_insert", """
+    INSERT INTO contractors (id, name, contact_person, email, phone, address, created_at)
+    VALUES (%(id)s, %(name)s, %(contact_person)s, %(email)s, %(phone)s, %(address)s, %(created_at)s)
+""")
+
+UPDATE_CONTRACTOR = statement("contractor_update", """
+    UPDATE contractors
+    SET name = %(name)s, contact_person = %(contact_person)s, email = %(email)s,
+        phone = %(phone)s, address = %(address)s
+    WHERE id = %(id)s
+""")
+
+DELETE_CONTRACTOR = statement("contractor_delete", """
+    DELETE FROM contractors WHERE id = %(id)s
+""")
+
+
+def list_contractors() -> list[dict]:
+    return _all(LIST_CONTRACTORS)
+
+
+def insert_contractor(name: str, contact_person: str | None = None, email: str | None = None,
+                      phone: str | None = None, address: str | None = None) -> str:
+    contractor_id = str(uuid.uuid4())
+    _write(INSERT_CONTRACTOR, {
+        "id": contractor_id, "name": name, "contact_person": contact_person,
+        "email": email, "phone": phone, "address": address, "created_at": datetime.utcnow(),
+    })
+    return contractor_id
+
+
+def update_contractor(contractor_id: str, name: str, contact_person: str | None, email: str | None,
+                      phone: str | None, address: str | None):
+    _write(UPDATE_CONTRACTOR, {
+        "id": contractor_id, "name": name, "contact_person": contact_person,
+        "email": email, "phone": phone, "address": address,
+    })
+
+
+def delete_contractor(contractor_id: str):
+    _write(DELETE_CONTRACTOR, {"id": contractor_id})
+
+
+# ─── Dashboard summary ─────────────────────────────────────────────────────────
+# All-time figures for the dashboard, archived requests included
+# (payment_request_history), in one round trip. The amount columns are named
+# differently in older databases (logic/schema.py), so the statement is
+# built for the names in use; a missing column sums to 0.
+SUMMARY_SQL = """
+    WITH c AS MATERIALIZED (
+        SELECT c.id, c.contractor_id, {budget_usd} AS budget_usd, {budget_iqd} AS budget_iqd
+        FROM contracts c
+        {scope}
+    ), pr AS (
+        SELECT pr.status, pr.requested_date, pr.paid_date,
+               {paid_usd} AS amount_usd, {paid_iqd} AS amount_iqd
+        FROM payment_request_history pr
+        JOIN c ON pr.contract_id = c.id
+    )
+    SELECT (SELECT COUNT(*) FROM c) AS contracts,
+           (SELECT COUNT(DISTINCT contractor_id) FROM c) AS contractors,
+           COUNT(*) AS requests,
+           COUNT(*) FILTER (WHERE lower(status) = 'pending') AS pending,
+           COUNT(*) FILTER (WHERE lower(status) = 'approved') AS approved,
+           COUNT(*) FILTER (WHERE lower(status) = 'rejected') AS rejected,
+           COUNT(*) FILTER (WHERE lower(status) = 'paid') AS paid_cnt,
+           (SELECT COALESCE(SUM(budget_usd), 0) FROM c) AS budget_usd,
+           (SELECT COALESCE(SUM(budget_iqd), 0) FROM c) AS budget_iqd,
+           COALESCE(SUM(amount_usd) FILTER (WHERE status = 'paid'), 0) AS paid_usd,
+           COALESCE(SUM(amount_iqd) FILTER (WHERE status = 'paid'), 0) AS paid_iqd,
+           COALESCE(AVG(EXTRACT(EPOCH FROM (paid_date - requested_date)) / 86400)
+                    FILTER (WHERE paid_date IS NOT NULL), 0) AS avg_days
+    FROM pr
+"""
+
+
+def _summary_statement(money_columns: tuple, for_project: bool):
+    usd_contract, iqd_contract, usd_request, iqd_request = (
+        f"{alias}.{column}" if column else "NULL::numeric"
+        for alias, column in zip(("c", "c", "pr", "pr"), money_columns)
+    )
+    sql = SUMMARY_SQL.format(
+        budget_usd=usd_contract, budget_iqd=iqd_contract, paid_usd=usd_request, paid_iqd=iqd_request,
+        scope="WHERE c.project_id = %(project_id)s" if for_project else "",
+    )
+    name = f"summary_{zlib.crc32(repr(money_columns).encode()):08x}"
+    return statement(f"{name}_project" if for_project else name, sql)
+
+
+def dashboard_summary(money_columns: tuple, project_id: str | None = None) -> dict:
+    """Counts and totals for all projects or one; `money_columns` is
+    SchemaRegistry.money_columns()."""
+    stmt = _summary_statement(money_columns, bool(project_id))
+    return dict(_one(stmt, {"project_id": project_id}))
+
+
+# ─── Reports ───────────────────────────────────────────────────────────────────
+# A report row per statement and data version (migration 0013), queued with
+# a job that builds it (logic/reports.py) in the same transaction. Asking
+# again for a report that failed queues it again, anything else returns the
+# existing row.
+QUEUE_REPORT = statement("report_queue", """
+    INSERT INTO reports (id, kind, entity_id, period_start, period_end, format,
+                         reference_version, requests_version, requested_by)
+    SELECT %(id)s, %(kind)s, %(entity_id)s, %(start)s, %(end)s, %(format)s,
+           (SELECT version FROM data_versions WHERE name = 'reference'),
+           (SELECT version FROM data_versions WHERE name = 'payment_requests'),
+           %(requested_by)s
+    ON CONFLICT (kind, entity_id, period_start, period_end, format,
+                 reference_version, requests_version)
+    DO UPDATE SET status = 'queued', error = NULL, requested_at = NOW(),
+                  requested_by = EXCLUDED.requested_by
+        WHERE reports.status = 'failed'
+    RETURNING id
+""")
+
+REPORT_FOR_KEY = statement("report_for_key", """
+    SELECT r.id FROM reports r
+    WHERE r.kind = %(kind)s AND r.entity_id = %(entity_id)s AND r.format = %(format)s
+      AND r.period_start = %(start)s AND r.period_end = %(end)s
+      AND r.reference_version = (SELECT version FROM data_versions WHERE name = 'reference')
+      AND r.requests_version = (SELECT version FROM data_versions WHERE name = 'payment_requests')
+""")
+
+RECENT_REPORTS = statement("report_recent", """
+    SELECT r.id, r.kind, r.entity_id, COALESCE(p.name, co.name) AS entity_name,
+           r.period_start, r.period_end, r.format, r.status, r.error,
+           r.reference_version, r.requests_version, r.requested_at, r.finished_at,
+           u.username AS requested_by_name, r.file_name, octet_length(r.content) AS size
+    FROM reports r
+    LEFT JOIN projects p ON r.kind = 'project' AND p.id = r.entity_id
+    LEFT JOIN contractors co ON r.kind = 'contractor' AND co.id = r.entity_id
+    LEFT JOIN users u ON u.id = r.requested_by
+    ORDER BY r.requested_at DESC
+    LIMIT %(limit)s
+""")
+
+REPORT_CONTENT = statement("report_content", """
+    SELECT file_name, format, content FROM reports WHERE id = %(id)s AND status = 'done'
+""")
+
+
+def queue_report(kind: str, entity_id: str, start: date, end: date, fmt: str,
+                 requested_by: str | None) -> str:
+    """Queues a report for the current data versions; returns its id, or the
+    id of the report already built or queued for them."""
+    params = {"id": str(uuid.uuid4()), "kind": kind, "entity_id": entity_id, "start": start,
+              "end": end, "format": fmt, "requested_by": requested_by}
+    with write_connection() as conn:
+        cur = conn.cursor()
+        while True:  # the versions can move between the two statements
+            row = execute(cur, QUEUE_REPORT, params).fetchone()
+            if row is not None:
+                enqueue(conn, "report", {"report_id": str(row["id"])}, priority=PRIORITY_INTERACTIVE)
+                break
+            row = execute(cur, REPORT_FOR_KEY, params).fetchone()
+            if row is not None:
+                break
+    return str(row["id"])
+
+
+def recent_reports(limit: int = 50) -> list[dict]:
+    # From the primary: the list follows the worker's progress
+    with pooled_connection() as conn:
+        return execute(conn.cursor(), RECENT_REPORTS, {"limit": limit}).fetchall()
+
+
+def report_content(report_id: str) -> dict | None:
+    row = _one(REPORT_CONTENT, {"id": report_id})
+    if row is not None:
+        row["content"] = bytes(row["content"])
+    return row
+
+
+# ─── Users ─────────────────────────────────────────────────────────────────────
+USER_FOR_LOGIN = statement("user_login", """
+    SELECT u.id, u.username, u.role, u.hashed_password,
+           ARRAY(SELECT up.project_id::text FROM user_projects up
+                 WHERE up.user_id = u.id) AS assigned_projects
+    FROM users u
+    WHERE u.username = %(username)s AND u.is_active = TRUE
+""")
+
+
+def user_for_login(username: str) -> dict | None:
+    """The active user with this username and their assigned projects."""
+    with pooled_connection() as conn:  # the primary: never a lagging replica at login
+        return execute(conn.cursor(), USER_FOR_LOGIN, {"username": username}).fetchone()
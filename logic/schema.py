@@ -0,0 +1,58 @@
+from dataclasses import dataclass
+from types import MappingProxyType
+
+import streamlit as st
+
+from utils.db import read_connection
+
+# Candidate names of the amount columns, in order of preference. Older
+# databases used the longer names; the first one present wins.
+MONEY_COLUMNS = {
+    "contracts": (("value_usd", "contract_value_usd", "budget_usd"),
+                  ("value_iqd", "contract_value_iqd", "budget_iqd")),
+    "payment_requests": (("amount_usd", "paid_amount_usd"),
+                         ("amount_iqd", "paid_amount_iqd")),
+}
+
+
+# ─── Schema registry ───────────────────────────────────────────────────────────
+# Tables and columns of the public schema, read from information_schema once
+# per process. The schema only changes through migrations, which are applied
+# before a deploy, so an hourly refresh is plenty.
+@dataclass(frozen=True)
+class SchemaRegistry:
+    tables: MappingProxyType  # table -> ((column, data_type), ...) in column order
+
+    def columns(self, table: str) -> set[str]:
+        return {name for name, _ in self.tables.get(table, ())}
+
+    def first_present(self, table: str, candidates: tuple[str, ...]) -> str | None:
+        present = self.columns(table)
+        return next((c for c in candidates if c in present), None)
+
+    def money_columns(self) -> tuple[str | None, str | None, str | None, str | None]:
+        """(contract USD, contract IQD, request USD, request IQD) column names."""
+        return tuple(
+            self.first_present(table, candidates)
+            for table, pair in MONEY_COLUMNS.items()
+            for candidates in pair
+        )
+
+
+@st.cache_resource(ttl=3600, show_spinner=False)
+def schema_registry() -> SchemaRegistry:
+    with read_connection() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            SELECT table_name, column_name, data_type
+            FROM information_schema.columns
+            WHERE table_schema = 'public'
+            ORDER BY table_name, ordinal_position
+            """
+        )
+        rows = cur.fetchall()
+    tables = {}
+    for r in rows:
+        tables.setdefault(r["table_name"], []).append((r["column_name"], r["data_type"]))
+    return SchemaRegistry(tables=MappingProxyType({t: tuple(cols) for t, cols in tables.items()}))
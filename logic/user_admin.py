@@ -0,0 +1,349 @@
+import uuid
+from datetime import datetime
+from typing import TYPE_CHECKING
+
+import streamlit as st
+from psycopg2.extras import execute_values
+
+from logic.login_handler import hash_password
+from logic.reference import forget_data_versions, load_data_version
+from utils.audit import changes
+from utils.db import pooled_connection, read_connection, write_connection
+
+if TYPE_CHECKING:
+    import pandas as pd  # imported where used: the user list pages through plain rows
+
+ALL_ROLES = ["Superadmin", "HQ Admin", "HQ Accountant", "Site Accountant", "Site PM"]
+PROJECT_ROLES = ["Site PM", "Site Accountant"]
+PROVISION_COLUMNS = ["username", "full_name", "role", "password", "projects"]
+PROJECT_SEPARATOR = ";"
+
+
+# ─── User directory ────────────────────────────────────────────────────────────
+# Filtering and paging happen in SQL: search is a prefix match on username or
+# full name, role and project are plain predicates, and pages continue from
+# the last username seen, so a page costs the same however many users exist.
+# Results are cached per `users` data version; writes here bump it through
+# triggers and users_changed() makes this process see the bump at once.
+def _directory_where(search: str, role: str | None, project_id: str | None) -> tuple[list[str], dict]:
+    where, params = [], {}
+    if search:
+        prefix = search.lower().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        where.append("(lower(u.username) LIKE %(prefix)s OR lower(u.full_name) LIKE %(prefix)s)")
+        params["prefix"] = prefix + "%"
+    if role:
+        where.append("u.role = %(role)s")
+        params["role"] = role
+    if project_id:
+        where.append(
+            "EXISTS (SELECT 1 FROM user_projects up"
+            " WHERE up.user_id = u.id AND up.project_id = %(project_id)s)"
+        )
+        params["project_id"] = project_id
+    return where or ["TRUE"], params
+
+
+@st.cache_data(max_entries=200, show_spinner=False)
+def _directory_page(version: int, search: str, role: str | None, project_id: str | None,
+                    after: str | None, limit: int) -> list[dict]:
+    where, params = _directory_where(search, role, project_id)
+    if after is not None:
+        where.append("u.username > %(after)s")
+    with read_connection() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            f"""
+            SELECT u.id::text AS id, u.username, u.full_name, u.role, u.is_active, u.created_at,
+                   ARRAY(SELECT up.project_id::text FROM user_projects up
+                         WHERE up.user_id = u.id) AS project_ids
+            FROM users u
+            WHERE {' AND '.join(where)}
+            ORDER BY u.username
+            LIMIT %(limit)s
+            """,
+            {**params, "after": after, "limit": limit + 1},
+        )
+        return cur.fetchall()
+
+
+@st.cache_data(max_entries=200, show_spinner=False)
+def _directory_count(version: int, search: str, role: str | None, project_id: str | None) -> int:
+    where, params = _directory_where(search, role, project_id)
+    with read_connection() as conn:
+        cur = conn.cursor()
+        cur.execute(f"SELECT COUNT(*) AS n FROM users u WHERE {' AND '.join(where)}", params)
+        return cur.fetchone()["n"]
+
+
+def load_user_page(search: str = "", role: str | None = None, project_id: str | None = None,
+                   after: str | None = None, limit: int = 50) -> tuple[list[dict], bool]:
+    """One page of users ordered by username, and whether another follows."""
+    rows = _directory_page(load_data_version("users"), search, role, project_id, after, limit)
+    return rows[:limit], len(rows) > limit
+
+
+def count_users(search: str = "", role: str | None = None, project_id: str | None = None) -> int:
+    return _directory_count(load_data_version("users"), search, role, project_id)
+
+
+@st.cache_data(max_entries=2, show_spinner=False)
+def _users_export(version: int, reference_version: int) -> "pd.DataFrame":
+    with read_connection() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            SELECT u.id, u.username, u.full_name, u.role,
+                   COALESCE(string_agg(p.name, ', ' ORDER BY p.name), '') AS projects,
+                   u.created_at
+            FROM users u
+            LEFT JOIN user_projects up ON u.id = up.user_id
+            LEFT JOIN projects p ON up.project_id = p.id
+            GROUP BY u.id
+            ORDER BY u.username
+            """
+        )
+        rows = cur.fetchall()
+    import pandas as pd
+    return pd.DataFrame(rows, columns=["id", "username", "full_name", "role", "projects", "created_at"])
+
+
+def load_users_export() -> "pd.DataFrame":
+    return _users_export(load_data_version("users"), load_data_version("reference"))
+
+
+def users_changed():
+    """Call after writing users or user_projects so this process picks up the
+    new version on its next rerun."""
+    forget_data_versions()
+
+
+# ─── Single-user writes ────────────────────────────────────────────────────────
+# Assignment changes are applied as a diff against the stored rows: one DELETE
+# with `= ANY` for removals and one multi-row INSERT for additions, so an edit
+# that keeps a user's projects touches no user_projects rows at all.
+def create_user(username: str, full_name: str, password: str, role: str,
+                project_ids: list[str]) -> str:
+    user_id = str(uuid.uuid4())
+    with write_connection() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            INSERT INTO users (id, username, full_name, hashed_password, role, created_at)
+            VALUES (%s, %s, %s, %s, %s, %s)
+            """,
+            (user_id, username, full_name, hash_password(password), role, datetime.utcnow()),
+        )
+        if project_ids:
+            execute_values(
+                cur,
+                "INSERT INTO user_projects (user_id, project_id) VALUES %s",
+                [(user_id, p) for p in project_ids],
+            )
+    users_changed()
+    return user_id
+
+
+USER_FOR_EDIT = """
+    SELECT u.full_name, u.role,
+           ARRAY(SELECT up.project_id::text FROM user_projects up
+                 WHERE up.user_id = u.id) AS project_ids
+    FROM users u
+    WHERE u.id = %s
+"""
+
+
+def _user_diff(cur, user_id: str, full_name: str, role: str, desired: set[str],
+               lock: bool = False) -> tuple[dict, list[str], list[str]]:
+    """(changed fields, project ids to remove, project ids to add)."""
+    cur.execute(USER_FOR_EDIT + (" FOR UPDATE" if lock else ""), (user_id,))
+    current = cur.fetchone()
+    if current is None:
+        raise LookupError("User no longer exists")
+    stored = set(current["project_ids"])
+    diff = changes(
+        {"full_name": current["full_name"] or "", "role": current["role"]},
+        {"full_name": full_name or "", "role": role},
+    )
+    return diff, sorted(stored - desired), sorted(desired - stored)
+
+
+def update_user(user_id: str, full_name: str, role: str, project_ids: list[str]) -> dict:
+    """Applies only what differs from the stored user; returns the changes
+    ({field: [old, new]}), empty when nothing was written."""
+    desired = set(project_ids)
+    # Diffed on the primary first: a form saved without changes takes no row
+    # lock and does not send the session's reads to the primary
+    with pooled_connection() as conn:
+        diff, removed, added = _user_diff(conn.cursor(), user_id, full_name, role, desired)
+    if not (diff or removed or added):
+        return {}
+
+    with write_connection() as conn:
+        cur = conn.cursor()
+        # Again under the row lock, against what a concurrent edit left
+        diff, removed, added = _user_diff(cur, user_id, full_name, role, desired, lock=True)
+        if diff:
+            cur.execute(
+                "UPDATE users SET full_name = %s, role = %s WHERE id = %s",
+                (full_name, role, user_id),
+            )
+        if removed:
+            cur.execute(
+                "DELETE FROM user_projects WHERE user_id = %s AND project_id = ANY(%s::uuid[])",
+                (user_id, removed),
+            )
+            diff["projects_removed"] = removed
+        if added:
+            execute_values(
+                cur,
+                "INSERT INTO user_projects (user_id, project_id) VALUES %s ON CONFLICT DO NOTHING",
+                [(user_id, p) for p in added],
+            )
+            diff["projects_added"] = added
+    if diff:
+        users_changed()
+    return diff
+
+
+def reset_password(user_id: str, password: str):
+    with write_connection() as conn:
+        conn.cursor().execute(
+            "UPDATE users SET hashed_password = %s WHERE id = %s", (hash_password(password), user_id)
+        )
+    users_changed()
+
+
+def delete_user(user_id: str) -> str | None:
+    """Removes the user and their assignments in one statement; returns the
+    username, or None if the user was already gone."""
+    with write_connection() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            WITH assignments AS (
+                DELETE FROM user_projects WHERE user_id = %(id)s
+            )
+            DELETE FROM users WHERE id = %(id)s
+            RETURNING username
+            """,
+            {"id": user_id},
+        )
+        row = cur.fetchone()
+    users_changed()
+    return row["username"] if row else None
+
+
+# ─── Bulk provisioning ─────────────────────────────────────────────────────────
+# A CSV of PROVISION_COLUMNS (projects by name, separated by ";") is checked
+# as a whole: one query for usernames that already exist and one for the
+# named projects, then per-row rules. Valid rows are written in a single
+# transaction with one batched INSERT for users and one for user_projects.
+class ProvisioningConflict(Exception):
+    def __init__(self, usernames: list[str]):
+        super().__init__(f"Usernames taken while importing: {', '.join(usernames)}")
+        self.usernames = usernames
+
+
+def read_provisioning_csv(file) -> "pd.DataFrame":
+    import pandas as pd
+    df = pd.read_csv(file, dtype=str, keep_default_na=False)
+    df.columns = [c.strip().lower() for c in df.columns]
+    missing = [c for c in PROVISION_COLUMNS if c not in df.columns]
+    if missing:
+        raise ValueError(f"Missing column(s): {', '.join(missing)}")
+    df = df[PROVISION_COLUMNS].apply(lambda col: col.str.strip())
+    df.index = df.index + 2  # CSV line numbers (after the header)
+    return df
+
+
+def provisioning_template() -> str:
+    import pandas as pd
+    return pd.DataFrame(
+        [["site_pm_01", "Site PM 01", "Site PM", "change-me", "Project A;Project B"]],
+        columns=PROVISION_COLUMNS,
+    ).to_csv(index=False)
+
+
+def validate_provisioning(df: "pd.DataFrame") -> "pd.DataFrame":
+    """Adds `project_ids` and `problems` (empty when the row can be created)."""
+    names = [n for n in df["username"] if n]
+    project_names = {
+        p.strip() for cell in df["projects"] for p in cell.split(PROJECT_SEPARATOR) if p.strip()
+    }
+    with read_connection() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT username FROM users WHERE username = ANY(%s)", (names,))
+        existing = {r["username"] for r in cur.fetchall()}
+        cur.execute("SELECT id::text AS id, name FROM projects WHERE name = ANY(%s)", (list(project_names),))
+        project_ids = {r["name"]: r["id"] for r in cur.fetchall()}
+
+    repeated = set(df["username"][df["username"].duplicated(keep=False)])
+    result = df.copy()
+    all_ids, all_problems = [], []
+    for row in df.itertuples():
+        problems = []
+        if not row.username:
+            problems.append("username is required")
+        elif row.username in existing:
+            problems.append("username already exists")
+        elif row.username in repeated:
+            problems.append("username repeated in this file")
+        if not row.password:
+            problems.append("password is required")
+        if row.role not in ALL_ROLES:
+            problems.append(f"unknown role '{row.role}'")
+        requested = [p.strip() for p in row.projects.split(PROJECT_SEPARATOR) if p.strip()]
+        unknown = [p for p in requested if p not in project_ids]
+        if unknown:
+            problems.append(f"unknown project(s): {', '.join(unknown)}")
+        if requested and row.role in ALL_ROLES and row.role not in PROJECT_ROLES:
+            problems.append(f"{row.role} is not assigned to projects")
+        all_ids.append(sorted({project_ids[p] for p in requested if p in project_ids}))
+        all_problems.append("; ".join(problems))
+    result["project_ids"] = all_ids
+    result["problems"] = all_problems
+    return result
+
+
+def provision_users(rows: "pd.DataFrame") -> list[tuple[str, str]]:
+    """Creates the given validated rows; returns (user id, username) pairs.
+    Nothing is written if any username was taken in the meantime."""
+    if rows.empty:
+        return []
+    now = datetime.utcnow()
+    users = [
+        (str(uuid.uuid4()), r.username, r.full_name or None,
+         hash_password(r.password), r.role, now)
+        for r in rows.itertuples()
+    ]
+    with write_connection() as conn:
+        cur = conn.cursor()
+        created = execute_values(
+            cur,
+            """
+            INSERT INTO users (id, username, full_name, hashed_password, role, created_at)
+            VALUES %s
+            ON CONFLICT (username) DO NOTHING
+            RETURNING username
+            """,
+            users,
+            page_size=len(users),
+            fetch=True,
+        )
+        if len(created) < len(users):
+            taken = sorted({u[1] for u in users} - {r["username"] for r in created})
+            raise ProvisioningConflict(taken)
+        assignments = [
+            (user[0], project_id)
+            for user, project_ids in zip(users, rows["project_ids"])
+            for project_id in project_ids
+        ]
+        if assignments:
+            execute_values(
+                cur,
+                "INSERT INTO user_projects (user_id, project_id) VALUES %s",
+                assignments,
+                page_size=1000,
+            )
+    users_changed()
+    return [(u[0], u[1]) for u in users]
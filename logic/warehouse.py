@@ -0,0 +1,273 @@
+"""Analytics mode: Parquet snapshots of the reporting tables, queried in DuckDB.
+
+    python -m logic.warehouse snapshot             # write a new snapshot
+    python -m logic.warehouse query "SELECT ..."   # ad-hoc query on the latest
+
+Enable in the app with `analytics_mode = "duckdb"`; needs `pip install duckdb`.
+"""
+
+import argparse
+import os
+import re
+import shutil
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+import psycopg2
+import streamlit as st
+
+from utils.db import read_connection
+
+ROOT = Path(__file__).resolve().parent.parent
+CURRENT = "CURRENT"
+CHUNK_ROWS = 50_000
+KEEP_SNAPSHOTS = 2
+
+# ─── What gets snapshotted ─────────────────────────────────────────────────────
+# (query, partition column). Amounts are exported as float8: analytics sums
+# do not need NUMERIC exactness and DuckDB scans doubles fastest.
+SNAPSHOT_TABLES = {
+    "projects": ("SELECT id::text, name, location, start_date, end_date, status FROM projects", None),
+    "contractors": ("SELECT id::text, name FROM contractors", None),
+    "contracts": (
+        """
+        SELECT id::text, title, project_id::text, contractor_id::text,
+               contract_value_usd::float8, contract_value_iqd::float8,
+               start_date, end_date, status, created_at
+        FROM contracts
+        """,
+        None,
+    ),
+    # Archived requests included (migration 0012)
+    "payment_request_history": (
+        """
+        SELECT id::text, contract_id::text, requested_date, paid_date,
+               amount_usd::float8, amount_iqd::float8, status, created_at, updated_at,
+               EXTRACT(YEAR FROM requested_date)::int AS year
+        FROM payment_request_history
+        """,
+        "year",
+    ),
+}
+
+
+def _duckdb():
+    try:
+        import duckdb
+    except ImportError as e:
+        raise RuntimeError("analytics mode needs DuckDB: pip install duckdb") from e
+    return duckdb
+
+
+# ─── Snapshot writer ───────────────────────────────────────────────────────────
+# Each snapshot is written to its own directory and published by atomically
+# replacing the CURRENT pointer, so readers never see a half-written one.
+def current_snapshot(root: Path) -> Path | None:
+    try:
+        name = (root / CURRENT).read_text().strip()
+    except OSError:
+        return None
+    path = root / name
+    # A snapshot written before a table was added to SNAPSHOT_TABLES does not
+    # count; the next refresh replaces it.
+    if not all((path / table).is_dir() for table in SNAPSHOT_TABLES):
+        return None
+    return path
+
+
+# Postgres type OIDs of the snapshot columns -> DuckDB types. Staging tables
+# are declared up front so a chunk whose column is all NULL keeps its type.
+DUCKDB_TYPES = {16: "BOOLEAN", 23: "INTEGER", 25: "VARCHAR", 701: "DOUBLE",
+                1082: "DATE", 1114: "TIMESTAMP"}
+
+
+def write_snapshot(conn, root: Path, keep: int = KEEP_SNAPSHOTS) -> Path:
+    duckdb = _duckdb()
+    import pandas as pd
+
+    root.mkdir(parents=True, exist_ok=True)
+    name = f"{datetime.now():%Y%m%dT%H%M%S}-{os.getpid()}"
+    target = root / f".{name}.tmp"
+    target.mkdir()
+
+    # File-backed staging database, so large tables spill to disk rather
+    # than being held in memory before the Parquet write.
+    db = duckdb.connect(str(target / "staging.duckdb"))
+    try:
+        # All tables are read in one repeatable-read transaction, so the
+        # snapshot is consistent across them.
+        conn.cursor().execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY")
+        for table, (sql, partition) in SNAPSHOT_TABLES.items():
+            # Named cursor: rows stream from Postgres in chunks.
+            cur = conn.cursor(name=f"snapshot_{table}")
+            cur.itersize = CHUNK_ROWS
+            cur.execute(sql)
+            rows = cur.fetchmany(CHUNK_ROWS)
+            columns = [d[0] for d in cur.description]
+            types = [DUCKDB_TYPES.get(d[1], "VARCHAR") for d in cur.description]
+            db.execute(
+                f"CREATE TABLE {table} ("
+                + ", ".join(f"{c} {t}" for c, t in zip(columns, types)) + ")"
+            )
+            while rows:
+                chunk = pd.DataFrame(rows, columns=columns)
+                db.register("chunk", chunk)
+                db.execute(f"INSERT INTO {table} SELECT * FROM chunk")
+                db.unregister("chunk")
+                rows = cur.fetchmany(CHUNK_ROWS)
+            cur.close()
+
+            out = target / table
+            if partition:
+                db.execute(
+                    f"COPY {table} TO '{out}' (FORMAT PARQUET, PARTITION_BY ({partition}))"
+                )
+            else:
+                out.mkdir()
+                db.execute(f"COPY {table} TO '{out / 'data.parquet'}' (FORMAT PARQUET)")
+        conn.commit()
+    except Exception:
+        db.close()
+        shutil.rmtree(target, ignore_errors=True)
+        raise
+    db.close()
+    (target / "staging.duckdb").unlink()
+
+    final = root / name
+    target.rename(final)
+    pointer = root / f".{CURRENT}.{os.getpid()}"
+    pointer.write_text(name)
+    os.replace(pointer, root / CURRENT)
+
+    snapshots = sorted(p for p in root.iterdir() if p.is_dir() and not p.name.startswith("."))
+    for old in snapshots[:-keep]:
+        shutil.rmtree(old, ignore_errors=True)
+    return final
+
+
+# ─── Query engine ──────────────────────────────────────────────────────────────
+def open_engine(snapshot: Path):
+    duckdb = _duckdb()
+    db = duckdb.connect()
+    for table, (_, partition) in SNAPSHOT_TABLES.items():
+        pattern = f"{snapshot / table}/**/*.parquet" if partition else f"{snapshot / table}/*.parquet"
+        hive = ", hive_partitioning = true" if partition else ""
+        db.execute(f"CREATE VIEW {table} AS SELECT * FROM read_parquet('{pattern}'{hive})")
+    return db
+
+
+def run_query(db, sql: str, params: dict | None = None) -> list[dict]:
+    # The loaders are written with psycopg2 placeholders; DuckDB takes $name
+    # and rejects parameters the statement does not use.
+    names = set(re.findall(r"%\((\w+)\)s", sql))
+    cur = db.cursor()
+    try:
+        cur.execute(
+            re.sub(r"%\((\w+)\)s", r"$\1", sql),
+            {k: v for k, v in (params or {}).items() if k in names},
+        )
+        columns = [d[0] for d in cur.description]
+        return [dict(zip(columns, row)) for row in cur.fetchall()]
+    finally:
+        cur.close()
+
+
+# ─── App integration ───────────────────────────────────────────────────────────
+def analytics_enabled() -> bool:
+    return st.secrets.get("analytics_mode", "postgres") == "duckdb"
+
+
+def analytics_root() -> Path:
+    return ROOT / st.secrets.get("analytics_dir", "data/analytics")
+
+
+@st.cache_resource
+def _engine_for(snapshot: str):
+    # One DuckDB database per published snapshot; each query takes its own
+    # cursor, which DuckDB allows from any thread.
+    return open_engine(Path(snapshot))
+
+
+@st.cache_resource
+def _refresh_state():
+    return {"running": False, "checked": 0.0, "error": None}, threading.Lock()
+
+
+def _refresh(root: Path):
+    state, lock = _refresh_state()
+    try:
+        with read_connection() as conn:
+            write_snapshot(conn, root)
+        state["error"] = None
+    except Exception as e:
+        state["error"] = repr(e)
+    finally:
+        with lock:
+            state["running"] = False
+
+
+def ensure_fresh():
+    """Starts a background snapshot when the current one is older than
+    `analytics_refresh_minutes`; at most one refresh runs per process."""
+    root = analytics_root()
+    max_age = float(st.secrets.get("analytics_refresh_minutes", 60)) * 60
+    state, lock = _refresh_state()
+    with lock:
+        if state["running"] or time.time() - state["checked"] < 30:
+            return
+        state["checked"] = time.time()
+        snapshot = current_snapshot(root)
+        if snapshot is not None and time.time() - snapshot.stat().st_mtime < max_age:
+            return
+        state["running"] = True
+    threading.Thread(target=_refresh, args=(root,), daemon=True, name="analytics-snapshot").start()
+
+
+def analytics_query(sql: str, params: dict | None = None) -> tuple[list[dict], str] | None:
+    """Runs `sql` on the latest snapshot and returns (rows, snapshot name), or
+    None when analytics mode is off or no snapshot exists yet (callers then
+    query Postgres)."""
+    if not analytics_enabled():
+        return None
+    ensure_fresh()
+    snapshot = current_snapshot(analytics_root())
+    if snapshot is None:
+        return None
+    return run_query(_engine_for(str(snapshot)), sql, params), snapshot.name
+
+
+# ─── CLI ───────────────────────────────────────────────────────────────────────
+def main():
+    from psycopg2.extras import RealDictCursor
+
+    from utils.migrations import default_dsn
+
+    parser = argparse.ArgumentParser(description="PayTrack analytics snapshots")
+    parser.add_argument("command", choices=["snapshot", "query"])
+    parser.add_argument("sql", nargs="?")
+    parser.add_argument("--dsn", default=default_dsn())
+    parser.add_argument("--dir", default=str(ROOT / "data" / "analytics"))
+    args = parser.parse_args()
+    root = Path(args.dir)
+
+    if args.command == "snapshot":
+        if not args.dsn:
+            parser.error("no DSN: pass --dsn or set PAYTRACK_DB_URL")
+        conn = psycopg2.connect(args.dsn, cursor_factory=RealDictCursor)
+        try:
+            print(f"wrote {write_snapshot(conn, root)}")
+        finally:
+            conn.close()
+    else:
+        snapshot = current_snapshot(root)
+        if snapshot is None:
+            parser.error(f"no snapshot in {root}; run `snapshot` first")
+        if not args.sql:
+            parser.error("query needs SQL")
+        print(open_engine(snapshot).sql(args.sql))
+
+
+if __name__ == "__main__":
+    main()
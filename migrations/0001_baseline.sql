@@ -0,0 +1,94 @@
+-- Baseline schema as used by the pages. Every statement is IF NOT EXISTS so
+-- this applies cleanly to deployments that were created by hand before
+-- migrations existed. Like those deployments it declares no foreign keys:
+-- referential cleanup is done by the application.
+
+CREATE TABLE IF NOT EXISTS users (
+    id              UUID PRIMARY KEY,
+    username        TEXT NOT NULL UNIQUE,
+    full_name       TEXT,
+    hashed_password TEXT NOT NULL,
+    role            TEXT NOT NULL,
+    is_active       BOOLEAN NOT NULL DEFAULT TRUE,
+    created_at      TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+CREATE TABLE IF NOT EXISTS projects (
+    id         UUID PRIMARY KEY,
+    name       TEXT NOT NULL,
+    location   TEXT,
+    start_date DATE,
+    end_date   DATE,
+    status     TEXT NOT NULL DEFAULT 'Planned',
+    created_by TEXT,
+    created_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+CREATE TABLE IF NOT EXISTS contractors (
+    id             UUID PRIMARY KEY,
+    name           TEXT NOT NULL,
+    contact_person TEXT,
+    email          TEXT,
+    phone          TEXT,
+    address        TEXT,
+    created_at     TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+CREATE TABLE IF NOT EXISTS contracts (
+    id                 UUID PRIMARY KEY,
+    title              TEXT NOT NULL,
+    project_id         UUID NOT NULL,
+    contractor_id      UUID NOT NULL,
+    contract_value_usd NUMERIC(18, 2),
+    contract_value_iqd NUMERIC(20, 2),
+    start_date         DATE,
+    end_date           DATE,
+    status             TEXT NOT NULL DEFAULT 'Pending',
+    scope              TEXT,
+    created_at         TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+CREATE TABLE IF NOT EXISTS contract_attachments (
+    id          UUID PRIMARY KEY,
+    contract_id UUID NOT NULL,
+    file_name   TEXT NOT NULL,
+    file_type   TEXT,
+    file_data   BYTEA,
+    uploaded_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+CREATE TABLE IF NOT EXISTS payment_requests (
+    id             UUID PRIMARY KEY,
+    contract_id    UUID NOT NULL,
+    requested_by   UUID,
+    requested_date TIMESTAMP NOT NULL,
+    paid_date      TIMESTAMP,
+    amount_usd     NUMERIC(18, 2),
+    amount_iqd     NUMERIC(20, 2),
+    note           TEXT,
+    status         TEXT NOT NULL DEFAULT 'submitted',
+    comments       TEXT,
+    created_at     TIMESTAMP NOT NULL DEFAULT NOW(),
+    updated_at     TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+CREATE TABLE IF NOT EXISTS payment_request_attachments (
+    id                 UUID PRIMARY KEY,
+    payment_request_id UUID NOT NULL,
+    filename           TEXT NOT NULL,
+    content            BYTEA,
+    mime_type          TEXT,
+    created_at         TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+CREATE TABLE IF NOT EXISTS user_projects (
+    user_id    UUID NOT NULL,
+    project_id UUID NOT NULL,
+    PRIMARY KEY (user_id, project_id)
+);
+
+CREATE TABLE IF NOT EXISTS project_assignments (
+    user_id    UUID NOT NULL,
+    project_id UUID NOT NULL,
+    PRIMARY KEY (user_id, project_id)
+);
@@ -0,0 +1,46 @@
+-- migrate: no-transaction
+-- Indexes for the hot predicates of the pages. Built CONCURRENTLY so they can
+-- be applied to a live deployment without blocking writes; a failed build
+-- leaves an INVALID index, which `python -m utils.migrations check` reports.
+
+-- Dashboard status counts / sums and per-contract lookups
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_payment_requests_contract_status_date
+    ON payment_requests (contract_id, status, requested_date);
+
+-- Dashboard "Pending" and "Recent" lists
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_payment_requests_status_created
+    ON payment_requests (status, created_at DESC);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_payment_requests_created
+    ON payment_requests (created_at DESC);
+
+-- Payment request list ordered / filtered by requested date
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_payment_requests_requested_date
+    ON payment_requests (requested_date DESC);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_payment_requests_requested_by
+    ON payment_requests (requested_by);
+
+-- Project filter on every dashboard query, contract list and pickers
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_contracts_project
+    ON contracts (project_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_contracts_contractor
+    ON contracts (contractor_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_contracts_created
+    ON contracts (created_at DESC);
+
+-- Attachment lists per parent, newest first
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_contract_attachments_contract_uploaded
+    ON contract_attachments (contract_id, uploaded_at DESC);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_payment_request_attachments_request_created
+    ON payment_request_attachments (payment_request_id, created_at DESC);
+
+-- Reverse lookups of assignments (the primary keys cover user_id first)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_user_projects_project
+    ON user_projects (project_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_project_assignments_project
+    ON project_assignments (project_id);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_projects_name
+    ON projects (name);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_contractors_name
+    ON contractors (name);
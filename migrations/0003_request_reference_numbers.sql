@@ -0,0 +1,73 @@
+-- Human-readable reference numbers for payment requests, assigned once at
+-- insert time from a per-project sequence: "<project>-<CON>-<n>".
+
+ALTER TABLE payment_requests ADD COLUMN IF NOT EXISTS ref_no TEXT;
+
+CREATE TABLE IF NOT EXISTS project_request_counters (
+    project_id UUID PRIMARY KEY,
+    last_seq   INTEGER NOT NULL
+);
+
+-- Backfill existing requests in creation order within each project
+WITH numbered AS (
+    SELECT pr.id, c.project_id, p.name AS project_name, co.name AS contractor_name,
+           row_number() OVER (PARTITION BY c.project_id ORDER BY pr.created_at, pr.id) AS seq
+    FROM payment_requests pr
+    JOIN contracts c ON pr.contract_id = c.id
+    JOIN projects p ON c.project_id = p.id
+    JOIN contractors co ON c.contractor_id = co.id
+)
+UPDATE payment_requests pr
+SET ref_no = n.project_name || '-' || upper(left(n.contractor_name, 3)) || '-' || n.seq
+FROM numbered n
+WHERE pr.id = n.id AND pr.ref_no IS NULL;
+
+INSERT INTO project_request_counters (project_id, last_seq)
+SELECT c.project_id, COUNT(*)
+FROM payment_requests pr
+JOIN contracts c ON pr.contract_id = c.id
+GROUP BY c.project_id
+ON CONFLICT (project_id) DO UPDATE SET last_seq = GREATEST(project_request_counters.last_seq, EXCLUDED.last_seq);
+
+-- Assignment on insert. The counter row lock serialises concurrent inserts
+-- for the same project only.
+CREATE OR REPLACE FUNCTION assign_request_ref() RETURNS trigger AS $$
+DECLARE
+    v_project_id      UUID;
+    v_project_name    TEXT;
+    v_contractor_name TEXT;
+    v_seq             INTEGER;
+BEGIN
+    IF NEW.ref_no IS NOT NULL THEN
+        RETURN NEW;
+    END IF;
+
+    SELECT c.project_id, p.name, co.name
+    INTO v_project_id, v_project_name, v_contractor_name
+    FROM contracts c
+    JOIN projects p ON c.project_id = p.id
+    JOIN contractors co ON c.contractor_id = co.id
+    WHERE c.id = NEW.contract_id;
+
+    IF v_project_id IS NULL THEN
+        RETURN NEW;
+    END IF;
+
+    INSERT INTO project_request_counters (project_id, last_seq)
+    VALUES (v_project_id, 1)
+    ON CONFLICT (project_id) DO UPDATE SET last_seq = project_request_counters.last_seq + 1
+    RETURNING last_seq INTO v_seq;
+
+    NEW.ref_no := v_project_name || '-' || upper(left(v_contractor_name, 3)) || '-' || v_seq;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_payment_requests_ref_no ON payment_requests;
+CREATE TRIGGER trg_payment_requests_ref_no
+    BEFORE INSERT ON payment_requests
+    FOR EACH ROW EXECUTE FUNCTION assign_request_ref();
+
+-- Exact and prefix search by reference number (case-insensitive)
+CREATE INDEX IF NOT EXISTS ix_payment_requests_ref_no
+    ON payment_requests (lower(ref_no) text_pattern_ops);
@@ -0,0 +1,9 @@
+-- Dated exchange rates, stored as units of `currency` per 1 USD. A rate
+-- applies from rate_date until the next rate for the same currency.
+
+CREATE TABLE IF NOT EXISTS exchange_rates (
+    currency  TEXT NOT NULL,
+    rate_date DATE NOT NULL,
+    per_usd   NUMERIC(18, 6) NOT NULL CHECK (per_usd > 0),
+    PRIMARY KEY (currency, rate_date)
+);
@@ -0,0 +1,90 @@
+-- Running per-contract totals of payment requests, maintained by a trigger in
+-- the same transaction as every insert, update and delete on
+-- payment_requests.
+--   requested: every request that is not rejected
+--   approved:  requests approved or already paid
+--   paid:      requests marked paid
+
+CREATE TABLE IF NOT EXISTS contract_ledger (
+    contract_id   UUID PRIMARY KEY,
+    requested_usd NUMERIC(18, 2) NOT NULL DEFAULT 0,
+    requested_iqd NUMERIC(20, 2) NOT NULL DEFAULT 0,
+    approved_usd  NUMERIC(18, 2) NOT NULL DEFAULT 0,
+    approved_iqd  NUMERIC(20, 2) NOT NULL DEFAULT 0,
+    paid_usd      NUMERIC(18, 2) NOT NULL DEFAULT 0,
+    paid_iqd      NUMERIC(20, 2) NOT NULL DEFAULT 0,
+    updated_at    TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+CREATE OR REPLACE FUNCTION apply_ledger_delta(
+    p_contract_id UUID, p_sign INTEGER, p_status TEXT, p_usd NUMERIC, p_iqd NUMERIC
+) RETURNS void AS $$
+DECLARE
+    usd NUMERIC := p_sign * COALESCE(p_usd, 0);
+    iqd NUMERIC := p_sign * COALESCE(p_iqd, 0);
+    is_requested BOOLEAN := lower(p_status) <> 'rejected';
+    is_approved  BOOLEAN := lower(p_status) IN ('approved', 'paid');
+    is_paid      BOOLEAN := lower(p_status) = 'paid';
+BEGIN
+    IF p_contract_id IS NULL OR (usd = 0 AND iqd = 0) THEN
+        RETURN;
+    END IF;
+    INSERT INTO contract_ledger AS l (
+        contract_id, requested_usd, requested_iqd, approved_usd, approved_iqd, paid_usd, paid_iqd
+    ) VALUES (
+        p_contract_id,
+        CASE WHEN is_requested THEN usd ELSE 0 END, CASE WHEN is_requested THEN iqd ELSE 0 END,
+        CASE WHEN is_approved  THEN usd ELSE 0 END, CASE WHEN is_approved  THEN iqd ELSE 0 END,
+        CASE WHEN is_paid      THEN usd ELSE 0 END, CASE WHEN is_paid      THEN iqd ELSE 0 END
+    )
+    ON CONFLICT (contract_id) DO UPDATE SET
+        requested_usd = l.requested_usd + EXCLUDED.requested_usd,
+        requested_iqd = l.requested_iqd + EXCLUDED.requested_iqd,
+        approved_usd  = l.approved_usd  + EXCLUDED.approved_usd,
+        approved_iqd  = l.approved_iqd  + EXCLUDED.approved_iqd,
+        paid_usd      = l.paid_usd      + EXCLUDED.paid_usd,
+        paid_iqd      = l.paid_iqd      + EXCLUDED.paid_iqd,
+        updated_at    = NOW();
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION payment_requests_ledger() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'UPDATE'
+       AND OLD.contract_id IS NOT DISTINCT FROM NEW.contract_id
+       AND OLD.status IS NOT DISTINCT FROM NEW.status
+       AND OLD.amount_usd IS NOT DISTINCT FROM NEW.amount_usd
+       AND OLD.amount_iqd IS NOT DISTINCT FROM NEW.amount_iqd THEN
+        RETURN NULL;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM apply_ledger_delta(OLD.contract_id, -1, OLD.status, OLD.amount_usd, OLD.amount_iqd);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM apply_ledger_delta(NEW.contract_id, 1, NEW.status, NEW.amount_usd, NEW.amount_iqd);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_payment_requests_ledger ON payment_requests;
+CREATE TRIGGER trg_payment_requests_ledger
+    AFTER INSERT OR UPDATE OR DELETE ON payment_requests
+    FOR EACH ROW EXECUTE FUNCTION payment_requests_ledger();
+
+-- Backfill (the trigger above is created in the same transaction, so no
+-- request can slip between the two)
+LOCK TABLE payment_requests IN SHARE MODE;
+DELETE FROM contract_ledger;
+INSERT INTO contract_ledger (
+    contract_id, requested_usd, requested_iqd, approved_usd, approved_iqd, paid_usd, paid_iqd
+)
+SELECT contract_id,
+       COALESCE(SUM(amount_usd) FILTER (WHERE lower(status) <> 'rejected'), 0),
+       COALESCE(SUM(amount_iqd) FILTER (WHERE lower(status) <> 'rejected'), 0),
+       COALESCE(SUM(amount_usd) FILTER (WHERE lower(status) IN ('approved', 'paid')), 0),
+       COALESCE(SUM(amount_iqd) FILTER (WHERE lower(status) IN ('approved', 'paid')), 0),
+       COALESCE(SUM(amount_usd) FILTER (WHERE lower(status) = 'paid'), 0),
+       COALESCE(SUM(amount_iqd) FILTER (WHERE lower(status) = 'paid'), 0)
+FROM payment_requests
+GROUP BY contract_id;
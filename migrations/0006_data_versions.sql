@@ -0,0 +1,36 @@
+-- A version counter per data domain, bumped by statement-level triggers on
+-- every write to the domain's tables. Process-wide caches key on the version
+-- and rebuild only when it moves.
+--   reference: projects, contractors, contracts
+
+CREATE TABLE IF NOT EXISTS data_versions (
+    name       TEXT PRIMARY KEY,
+    version    BIGINT NOT NULL DEFAULT 0,
+    changed_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+INSERT INTO data_versions (name) VALUES ('reference') ON CONFLICT (name) DO NOTHING;
+
+CREATE OR REPLACE FUNCTION bump_data_version() RETURNS trigger AS $$
+BEGIN
+    UPDATE data_versions
+       SET version = version + 1, changed_at = NOW()
+     WHERE name = TG_ARGV[0];
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_projects_version ON projects;
+CREATE TRIGGER trg_projects_version
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON projects
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version('reference');
+
+DROP TRIGGER IF EXISTS trg_contractors_version ON contractors;
+CREATE TRIGGER trg_contractors_version
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON contractors
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version('reference');
+
+DROP TRIGGER IF EXISTS trg_contracts_version ON contracts;
+CREATE TRIGGER trg_contracts_version
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON contracts
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version('reference');
@@ -0,0 +1,54 @@
+-- Append-only audit trail, range-partitioned by month on occurred_at. Rows
+-- are written in batches by utils/audit.py; updates and deletes are refused,
+-- old months are retired by detaching/dropping their partition.
+
+CREATE TABLE IF NOT EXISTS activity_log (
+    id          BIGSERIAL,
+    occurred_at TIMESTAMP NOT NULL,
+    user_id     UUID,
+    username    TEXT,
+    action      TEXT NOT NULL,   -- insert, update, delete, status_change, login, login_failed, download
+    entity      TEXT NOT NULL,   -- project, contractor, contract, payment_request, attachment, user, session
+    entity_id   TEXT,
+    summary     TEXT,
+    details     JSONB,
+    PRIMARY KEY (occurred_at, id)
+) PARTITION BY RANGE (occurred_at);
+
+-- Catches anything outside the monthly partitions so an event is never lost.
+CREATE TABLE IF NOT EXISTS activity_log_default PARTITION OF activity_log DEFAULT;
+
+CREATE OR REPLACE FUNCTION ensure_activity_partition(p_month DATE) RETURNS void AS $$
+DECLARE
+    first_day DATE := date_trunc('month', p_month)::date;
+    part_name TEXT := 'activity_log_' || to_char(first_day, 'YYYYMM');
+BEGIN
+    IF to_regclass(part_name) IS NULL THEN
+        EXECUTE format(
+            'CREATE TABLE IF NOT EXISTS %I PARTITION OF activity_log FOR VALUES FROM (%L) TO (%L)',
+            part_name, first_day, (first_day + INTERVAL '1 month')::date
+        );
+    END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT ensure_activity_partition((date_trunc('month', CURRENT_DATE) + make_interval(months => n))::date)
+FROM generate_series(0, 2) AS n;
+
+-- Browsing indexes: newest first overall, and per user / entity / action.
+-- (occurred_at, id) doubles as the keyset for pagination.
+CREATE INDEX IF NOT EXISTS idx_activity_log_recent ON activity_log (occurred_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_activity_log_user ON activity_log (user_id, occurred_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_activity_log_entity ON activity_log (entity, entity_id, occurred_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_activity_log_action ON activity_log (action, occurred_at DESC, id DESC);
+
+CREATE OR REPLACE FUNCTION activity_log_append_only() RETURNS trigger AS $$
+BEGIN
+    RAISE EXCEPTION 'activity_log is append-only';
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_activity_log_append_only ON activity_log;
+CREATE TRIGGER trg_activity_log_append_only
+    BEFORE UPDATE OR DELETE ON activity_log
+    FOR EACH ROW EXECUTE FUNCTION activity_log_append_only();
@@ -0,0 +1,32 @@
+-- NOTIFY on channel `payment_requests` when a request is created or its
+-- status changes. The payload carries the owning project so the listener can
+-- route it without a query. Delivered at commit; rolled-back writes send
+-- nothing.
+
+CREATE OR REPLACE FUNCTION notify_payment_request() RETURNS trigger AS $$
+DECLARE
+    v_project_id UUID;
+BEGIN
+    IF TG_OP = 'UPDATE' AND NEW.status IS NOT DISTINCT FROM OLD.status THEN
+        RETURN NULL;
+    END IF;
+    SELECT project_id INTO v_project_id FROM contracts WHERE id = NEW.contract_id;
+    PERFORM pg_notify('payment_requests', json_build_object(
+        'event',        CASE WHEN TG_OP = 'INSERT' THEN 'insert' ELSE 'status_change' END,
+        'id',           NEW.id,
+        'ref_no',       NEW.ref_no,
+        'project_id',   v_project_id,
+        'status',       NEW.status,
+        'old_status',   CASE WHEN TG_OP = 'UPDATE' THEN OLD.status END,
+        'amount_usd',   NEW.amount_usd,
+        'amount_iqd',   NEW.amount_iqd,
+        'requested_by', NEW.requested_by
+    )::text);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_payment_requests_notify ON payment_requests;
+CREATE TRIGGER trg_payment_requests_notify
+    AFTER INSERT OR UPDATE OF status ON payment_requests
+    FOR EACH ROW EXECUTE FUNCTION notify_payment_request();
@@ -0,0 +1,23 @@
+-- A `payment_requests` data version, and NOTIFY on every version bump so
+-- processes learn of changes from the listener instead of polling.
+-- Payload: "<name>:<version>" on channel `data_versions`.
+
+INSERT INTO data_versions (name) VALUES ('payment_requests') ON CONFLICT (name) DO NOTHING;
+
+CREATE OR REPLACE FUNCTION bump_data_version() RETURNS trigger AS $$
+DECLARE
+    v_version BIGINT;
+BEGIN
+    UPDATE data_versions
+       SET version = version + 1, changed_at = NOW()
+     WHERE name = TG_ARGV[0]
+    RETURNING version INTO v_version;
+    PERFORM pg_notify('data_versions', TG_ARGV[0] || ':' || v_version);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_payment_requests_version ON payment_requests;
+CREATE TRIGGER trg_payment_requests_version
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON payment_requests
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version('payment_requests');
@@ -0,0 +1,19 @@
+-- A `users` data version for the user directory cache, bumped on any write
+-- to users or user_projects, and indexes for the directory's prefix search
+-- and role filter (both ordered by username for keyset paging).
+
+INSERT INTO data_versions (name) VALUES ('users') ON CONFLICT (name) DO NOTHING;
+
+DROP TRIGGER IF EXISTS trg_users_version ON users;
+CREATE TRIGGER trg_users_version
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON users
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version('users');
+
+DROP TRIGGER IF EXISTS trg_user_projects_version ON user_projects;
+CREATE TRIGGER trg_user_projects_version
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON user_projects
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version('users');
+
+CREATE INDEX IF NOT EXISTS ix_users_username_lower ON users (lower(username) text_pattern_ops);
+CREATE INDEX IF NOT EXISTS ix_users_full_name_lower ON users (lower(full_name) text_pattern_ops);
+CREATE INDEX IF NOT EXISTS ix_users_role_username ON users (role, username);
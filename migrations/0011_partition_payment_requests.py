@@ -0,0 +1,287 @@
+"""Partition payment_requests and payment_request_attachments by requested_date year.
+
+Attachments get a requested_date column copied from their request, so a
+request and its files always share a partition year and every lookup can be
+pruned. The move runs online:
+
+1. Partitioned copies (`*_p`) are created with one partition per year in the
+   data plus the current and next year, and a default partition. Triggers on
+   the old tables mirror every write into the copies from then on.
+2. Existing rows are copied in keyset batches, one transaction each. Each
+   batch share-locks its source rows, so a concurrent update either lands
+   before the batch reads the row or waits and is mirrored after it.
+3. One short transaction locks both tables, checks the row counts, drops the
+   old tables and renames the copies into place with the original index and
+   trigger names.
+
+Later years get their partitions from ensure_payment_request_partition(),
+which the repository calls before the first write to a year.
+"""
+from datetime import date
+
+BATCH_REQUESTS = 5000
+BATCH_ATTACHMENTS = 200  # rows carry file contents
+
+TABLES = ("payment_requests", "payment_request_attachments")
+
+INDEXES = {
+    "payment_requests": [
+        ("ix_payment_requests_contract_status_date", "(contract_id, status, requested_date)"),
+        ("ix_payment_requests_status_created", "(status, created_at DESC)"),
+        ("ix_payment_requests_created", "(created_at DESC)"),
+        ("ix_payment_requests_requested_date", "(requested_date DESC)"),
+        ("ix_payment_requests_ref_no", "(lower(ref_no) text_pattern_ops)"),
+        ("ix_payment_requests_requested_by", "(requested_by)"),
+    ],
+    "payment_request_attachments": [
+        ("ix_payment_request_attachments_request_created", "(payment_request_id, created_at DESC)"),
+    ],
+}
+
+CREATE_COPIES = """
+    CREATE TABLE IF NOT EXISTS payment_requests_p
+        (LIKE payment_requests INCLUDING DEFAULTS INCLUDING CONSTRAINTS,
+         PRIMARY KEY (id, requested_date))
+        PARTITION BY RANGE (requested_date);
+    CREATE TABLE IF NOT EXISTS payment_requests_default PARTITION OF payment_requests_p DEFAULT;
+
+    CREATE TABLE IF NOT EXISTS payment_request_attachments_p
+        (LIKE payment_request_attachments INCLUDING DEFAULTS INCLUDING CONSTRAINTS,
+         requested_date TIMESTAMP NOT NULL,
+         PRIMARY KEY (id, requested_date))
+        PARTITION BY RANGE (requested_date);
+    CREATE TABLE IF NOT EXISTS payment_request_attachments_default
+        PARTITION OF payment_request_attachments_p DEFAULT;
+"""
+
+MIRROR_TRIGGERS = """
+    CREATE OR REPLACE FUNCTION payment_requests_mirror() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            DELETE FROM payment_requests_p WHERE id = OLD.id;
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            INSERT INTO payment_requests_p SELECT NEW.* ON CONFLICT DO NOTHING;
+            IF TG_OP = 'UPDATE' AND NEW.requested_date IS DISTINCT FROM OLD.requested_date THEN
+                UPDATE payment_request_attachments_p SET requested_date = NEW.requested_date
+                WHERE payment_request_id = NEW.id;
+            END IF;
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+
+    CREATE OR REPLACE FUNCTION payment_request_attachments_mirror() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            DELETE FROM payment_request_attachments_p WHERE id = OLD.id;
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            INSERT INTO payment_request_attachments_p
+            SELECT NEW.*, COALESCE(
+                (SELECT requested_date FROM payment_requests WHERE id = NEW.payment_request_id),
+                NEW.created_at)
+            ON CONFLICT DO NOTHING;
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+
+    DROP TRIGGER IF EXISTS trg_payment_requests_mirror ON payment_requests;
+    CREATE TRIGGER trg_payment_requests_mirror
+        AFTER INSERT OR UPDATE OR DELETE ON payment_requests
+        FOR EACH ROW EXECUTE FUNCTION payment_requests_mirror();
+
+    DROP TRIGGER IF EXISTS trg_payment_request_attachments_mirror ON payment_request_attachments;
+    CREATE TRIGGER trg_payment_request_attachments_mirror
+        AFTER INSERT OR UPDATE OR DELETE ON payment_request_attachments
+        FOR EACH ROW EXECUTE FUNCTION payment_request_attachments_mirror();
+"""
+
+# Orphaned attachments (no request) are filed under their own upload time.
+COPY_BATCH = {
+    "payment_requests": """
+        WITH batch AS (
+            SELECT * FROM payment_requests
+            WHERE %(after)s::uuid IS NULL OR id > %(after)s
+            ORDER BY id LIMIT %(limit)s
+            FOR SHARE
+        ), copied AS (
+            INSERT INTO payment_requests_p SELECT * FROM batch ON CONFLICT DO NOTHING
+        )
+        SELECT id FROM batch ORDER BY id DESC LIMIT 1
+    """,
+    "payment_request_attachments": """
+        WITH batch AS (
+            SELECT a.*, COALESCE(
+                (SELECT pr.requested_date FROM payment_requests pr
+                 WHERE pr.id = a.payment_request_id FOR SHARE),
+                a.created_at) AS requested_date
+            FROM payment_request_attachments a
+            WHERE %(after)s::uuid IS NULL OR a.id > %(after)s
+            ORDER BY a.id LIMIT %(limit)s
+            FOR SHARE OF a
+        ), copied AS (
+            INSERT INTO payment_request_attachments_p SELECT * FROM batch ON CONFLICT DO NOTHING
+        )
+        SELECT id FROM batch ORDER BY id DESC LIMIT 1
+    """,
+}
+
+# Creating a partition locks the parent table. Rather than queue behind a
+# long reader (and hold up every query queued behind it), the function gives
+# up after a short wait and returns false; those rows go to the default
+# partition and a later write tries again.
+ENSURE_PARTITION = """
+    CREATE OR REPLACE FUNCTION ensure_payment_request_partition(p_year INT) RETURNS boolean AS $$
+    DECLARE
+        parent  TEXT;
+        taken   BOOLEAN;
+        ready   BOOLEAN := true;
+        timeout TEXT := current_setting('lock_timeout');
+    BEGIN
+        PERFORM set_config('lock_timeout', '2s', true);
+        FOREACH parent IN ARRAY ARRAY['payment_requests', 'payment_request_attachments'] LOOP
+            IF to_regclass(parent || '_' || p_year) IS NULL THEN
+                -- Rows of this year already in the default partition stay there
+                -- (the new partition could not be attached over them).
+                EXECUTE format(
+                    'SELECT EXISTS (SELECT 1 FROM %I WHERE requested_date >= %L AND requested_date < %L)',
+                    parent || '_default', make_date(p_year, 1, 1), make_date(p_year + 1, 1, 1)
+                ) INTO taken;
+                IF taken THEN
+                    ready := false;
+                    CONTINUE;
+                END IF;
+                BEGIN
+                    EXECUTE format(
+                        'CREATE TABLE IF NOT EXISTS %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+                        parent || '_' || p_year, parent, make_date(p_year, 1, 1), make_date(p_year + 1, 1, 1)
+                    );
+                EXCEPTION WHEN lock_not_available THEN
+                    ready := false;
+                END;
+            END IF;
+        END LOOP;
+        PERFORM set_config('lock_timeout', timeout, true);
+        RETURN ready;
+    END;
+    $$ LANGUAGE plpgsql;
+"""
+
+# An update that changes requested_date to another year moves the row, which
+# Postgres runs as a delete plus an insert. The repository flags such moves
+# so they are not announced as new requests.
+NOTIFY_FUNCTION = """
+    CREATE OR REPLACE FUNCTION notify_payment_request() RETURNS trigger AS $$
+    DECLARE
+        v_project_id UUID;
+    BEGIN
+        IF TG_OP = 'UPDATE' AND NEW.status IS NOT DISTINCT FROM OLD.status THEN
+            RETURN NULL;
+        END IF;
+        IF TG_OP = 'INSERT'
+           AND current_setting('paytrack.moving_request', true) = NEW.id::text THEN
+            RETURN NULL;
+        END IF;
+        SELECT project_id INTO v_project_id FROM contracts WHERE id = NEW.contract_id;
+        PERFORM pg_notify('payment_requests', json_build_object(
+            'event',        CASE WHEN TG_OP = 'INSERT' THEN 'insert' ELSE 'status_change' END,
+            'id',           NEW.id,
+            'ref_no',       NEW.ref_no,
+            'project_id',   v_project_id,
+            'status',       NEW.status,
+            'old_status',   CASE WHEN TG_OP = 'UPDATE' THEN OLD.status END,
+            'amount_usd',   NEW.amount_usd,
+            'amount_iqd',   NEW.amount_iqd,
+            'requested_by', NEW.requested_by
+        )::text);
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+"""
+
+TRIGGERS = """
+    CREATE TRIGGER trg_payment_requests_ref_no
+        BEFORE INSERT ON payment_requests
+        FOR EACH ROW EXECUTE FUNCTION assign_request_ref();
+    CREATE TRIGGER trg_payment_requests_ledger
+        AFTER INSERT OR UPDATE OR DELETE ON payment_requests
+        FOR EACH ROW EXECUTE FUNCTION payment_requests_ledger();
+    CREATE TRIGGER trg_payment_requests_notify
+        AFTER INSERT OR UPDATE OF status ON payment_requests
+        FOR EACH ROW EXECUTE FUNCTION notify_payment_request();
+    CREATE TRIGGER trg_payment_requests_version
+        AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON payment_requests
+        FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version('payment_requests');
+"""
+
+
+def upgrade(conn):
+    cur = conn.cursor()
+    cur.execute("SELECT relkind FROM pg_class WHERE oid = 'payment_requests'::regclass")
+    if cur.fetchone()["relkind"] == "p":
+        return  # already partitioned
+
+    conn.autocommit = False
+    prepare(cur)
+    conn.commit()
+    for table, batch_size in zip(TABLES, (BATCH_REQUESTS, BATCH_ATTACHMENTS)):
+        copy_rows(conn, table, batch_size)
+    swap(cur)
+    conn.commit()
+    conn.autocommit = True
+
+
+def prepare(cur):
+    cur.execute(CREATE_COPIES)
+    cur.execute("SELECT DISTINCT EXTRACT(YEAR FROM requested_date)::int AS year FROM payment_requests")
+    this_year = date.today().year
+    years = {r["year"] for r in cur.fetchall()} | {this_year, this_year + 1}
+    for year in sorted(years):
+        for parent in TABLES:
+            cur.execute(
+                f"CREATE TABLE IF NOT EXISTS {parent}_{year} PARTITION OF {parent}_p "
+                "FOR VALUES FROM (%s) TO (%s)",
+                (date(year, 1, 1), date(year + 1, 1, 1)),
+            )
+    for parent, indexes in INDEXES.items():
+        for name, columns in indexes:
+            cur.execute(f"CREATE INDEX IF NOT EXISTS {name}_p ON {parent}_p {columns}")
+    cur.execute(MIRROR_TRIGGERS)
+
+
+def copy_rows(conn, table: str, batch_size: int):
+    cur = conn.cursor()
+    after = None
+    while True:
+        cur.execute(COPY_BATCH[table], {"after": after, "limit": batch_size})
+        row = cur.fetchone()
+        conn.commit()
+        if row is None:
+            return
+        after = row["id"]
+
+
+def swap(cur):
+    cur.execute("LOCK TABLE payment_requests, payment_request_attachments IN ACCESS EXCLUSIVE MODE")
+    for table in TABLES:
+        cur.execute(f"SELECT (SELECT COUNT(*) FROM {table}) AS old, (SELECT COUNT(*) FROM {table}_p) AS new")
+        counts = cur.fetchone()
+        if counts["old"] != counts["new"]:
+            raise RuntimeError(f"{table}: copied {counts['new']} of {counts['old']} rows")
+
+    cur.execute(
+        """
+        DROP TABLE payment_request_attachments, payment_requests;
+        DROP FUNCTION payment_requests_mirror(), payment_request_attachments_mirror();
+        """
+    )
+    for parent, indexes in INDEXES.items():
+        cur.execute(f"ALTER TABLE {parent}_p RENAME TO {parent}")
+        cur.execute(f"ALTER TABLE {parent} RENAME CONSTRAINT {parent}_p_pkey TO {parent}_pkey")
+        for name, _ in indexes:
+            cur.execute(f"ALTER INDEX {name}_p RENAME TO {name}")
+    cur.execute(NOTIFY_FUNCTION)
+    cur.execute(TRIGGERS)
+    cur.execute(ENSURE_PARTITION)
@@ -0,0 +1,63 @@
+-- Archive tier for closed payment requests. `python -m logic.archive run`
+-- moves paid and rejected requests of Completed projects, with their
+-- attachments, into the `archive` schema. Routine backups can skip that
+-- schema (pg_dump --exclude-schema=archive) and back it up after each run.
+--
+-- Archived requests keep counting in contract_ledger: the job sets
+-- paytrack.archiving for its transaction and the ledger trigger ignores
+-- those deletes.
+
+CREATE SCHEMA IF NOT EXISTS archive;
+
+CREATE TABLE IF NOT EXISTS archive.payment_requests (
+    LIKE public.payment_requests INCLUDING DEFAULTS,
+    archived_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (id)
+);
+
+CREATE TABLE IF NOT EXISTS archive.payment_request_attachments (
+    LIKE public.payment_request_attachments INCLUDING DEFAULTS,
+    archived_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (id)
+);
+
+CREATE INDEX IF NOT EXISTS ix_archive_payment_requests_requested_date
+    ON archive.payment_requests (requested_date DESC);
+CREATE INDEX IF NOT EXISTS ix_archive_payment_requests_contract
+    ON archive.payment_requests (contract_id);
+CREATE INDEX IF NOT EXISTS ix_archive_payment_requests_ref_no
+    ON archive.payment_requests (lower(ref_no) text_pattern_ops);
+-- Newest date of any archived row: queries over ranges that start after it
+-- leave the archive out.
+CREATE INDEX IF NOT EXISTS ix_archive_payment_requests_latest
+    ON archive.payment_requests ((GREATEST(requested_date, paid_date)));
+CREATE INDEX IF NOT EXISTS ix_archive_payment_request_attachments_request
+    ON archive.payment_request_attachments (payment_request_id, created_at DESC);
+
+-- Every request ever made, for all-time figures and history views
+CREATE OR REPLACE VIEW payment_request_history AS
+    SELECT pr.*, NULL::timestamp AS archived_at FROM payment_requests pr
+    UNION ALL
+    SELECT * FROM archive.payment_requests;
+
+CREATE OR REPLACE FUNCTION payment_requests_ledger() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'DELETE' AND current_setting('paytrack.archiving', true) = 'on' THEN
+        RETURN NULL;
+    END IF;
+    IF TG_OP = 'UPDATE'
+       AND OLD.contract_id IS NOT DISTINCT FROM NEW.contract_id
+       AND OLD.status IS NOT DISTINCT FROM NEW.status
+       AND OLD.amount_usd IS NOT DISTINCT FROM NEW.amount_usd
+       AND OLD.amount_iqd IS NOT DISTINCT FROM NEW.amount_iqd THEN
+        RETURN NULL;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM apply_ledger_delta(OLD.contract_id, -1, OLD.status, OLD.amount_usd, OLD.amount_iqd);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM apply_ledger_delta(NEW.contract_id, 1, NEW.status, NEW.amount_usd, NEW.amount_iqd);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
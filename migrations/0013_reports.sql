@@ -0,0 +1,30 @@
+-- Generated contractor and project statements (logic/reports.py). A report
+-- is keyed by what it covers and by the data versions it was built from, so
+-- asking again for the same statement before anything changed reuses the
+-- stored file instead of rebuilding it.
+--   status: queued -> running -> done | failed
+
+CREATE TABLE IF NOT EXISTS reports (
+    id                UUID PRIMARY KEY,
+    kind              TEXT NOT NULL,   -- contractor, project
+    entity_id         UUID NOT NULL,
+    period_start      DATE NOT NULL,
+    period_end        DATE NOT NULL,
+    format            TEXT NOT NULL,   -- xlsx, pdf
+    reference_version BIGINT NOT NULL,
+    requests_version  BIGINT NOT NULL,
+    status            TEXT NOT NULL DEFAULT 'queued',
+    requested_by      UUID,
+    requested_at      TIMESTAMP NOT NULL DEFAULT NOW(),
+    started_at        TIMESTAMP,
+    finished_at       TIMESTAMP,
+    error             TEXT,
+    file_name         TEXT,
+    content           BYTEA
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS ux_reports_key
+    ON reports (kind, entity_id, period_start, period_end, format, reference_version, requests_version);
+-- Worker pickup, oldest first
+CREATE INDEX IF NOT EXISTS ix_reports_queued ON reports (requested_at) WHERE status = 'queued';
+CREATE INDEX IF NOT EXISTS ix_reports_requested ON reports (requested_at DESC);
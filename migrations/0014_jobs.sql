@@ -0,0 +1,51 @@
+-- Background job queue (utils/jobs.py). Workers claim the most urgent due job
+-- with FOR UPDATE SKIP LOCKED, hold it under a lease while it runs and either
+-- finish it or put it back with a delay until max_attempts is used up. A new
+-- job is announced on channel `jobs` so idle workers start at once.
+--   status: queued -> running -> done | failed
+--   priority: higher runs first
+
+CREATE TABLE IF NOT EXISTS jobs (
+    id              BIGSERIAL PRIMARY KEY,
+    kind            TEXT NOT NULL,
+    payload         JSONB NOT NULL DEFAULT '{}',
+    priority        INTEGER NOT NULL DEFAULT 0,
+    status          TEXT NOT NULL DEFAULT 'queued',
+    dedupe_key      TEXT,
+    attempts        INTEGER NOT NULL DEFAULT 0,
+    max_attempts    INTEGER NOT NULL DEFAULT 3,
+    timeout_seconds INTEGER NOT NULL DEFAULT 900,  -- lease per attempt
+    run_after       TIMESTAMP NOT NULL DEFAULT NOW(),
+    lease_until     TIMESTAMP,
+    worker          TEXT,
+    last_error      TEXT,
+    result          JSONB,
+    created_at      TIMESTAMP NOT NULL DEFAULT NOW(),
+    started_at      TIMESTAMP,
+    finished_at     TIMESTAMP
+);
+
+-- Claim order among due jobs
+CREATE INDEX IF NOT EXISTS ix_jobs_queued
+    ON jobs (priority DESC, run_after, id) WHERE status = 'queued';
+-- Leases of running jobs, to hand back those of workers that died
+CREATE INDEX IF NOT EXISTS ix_jobs_running_lease
+    ON jobs (lease_until) WHERE status = 'running';
+-- At most one waiting job per dedupe key; a running one may have a successor
+CREATE UNIQUE INDEX IF NOT EXISTS ux_jobs_dedupe_queued
+    ON jobs (dedupe_key) WHERE status = 'queued';
+-- Retention sweep of finished jobs
+CREATE INDEX IF NOT EXISTS ix_jobs_finished
+    ON jobs (finished_at) WHERE status IN ('done', 'failed');
+
+CREATE OR REPLACE FUNCTION notify_job() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('jobs', NEW.kind);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_jobs_notify ON jobs;
+CREATE TRIGGER trg_jobs_notify
+    AFTER INSERT OR UPDATE OF status ON jobs
+    FOR EACH ROW WHEN (NEW.status = 'queued') EXECUTE FUNCTION notify_job();
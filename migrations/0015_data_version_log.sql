@@ -0,0 +1,58 @@
+-- Data versions without a hot counter row. Bumping data_versions.version in
+-- a statement trigger row-locked that one row until commit, so every write
+-- to payment_requests (or to the reference tables) waited for the previous
+-- writer's transaction to end. Each writing transaction now appends its own
+-- (name, xid) row instead, which takes no lock any other writer needs.
+--
+-- data_versions becomes a view with the same columns. A domain's version is
+-- the newest xid among its log rows that is older than the reader's
+-- snapshot xmin, i.e. among transactions that have all finished, so a
+-- transaction committing after a younger one is never skipped over. While an
+-- older writing transaction is still open the version may lag behind a
+-- committed change; it catches up when that transaction ends. Rows other than
+-- each domain's current one are pruned by prune_data_version_log(), which the
+-- job workers run with their hourly sweep (utils/jobs.py).
+--
+-- New domains are added to data_version_names.
+
+ALTER TABLE data_versions RENAME TO data_version_names;
+ALTER TABLE data_version_names DROP COLUMN version, DROP COLUMN changed_at;
+
+CREATE TABLE IF NOT EXISTS data_version_log (
+    name       TEXT NOT NULL,
+    xid        XID8 NOT NULL,
+    changed_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (name, xid)
+);
+
+CREATE OR REPLACE VIEW data_versions AS
+SELECT n.name,
+       COALESCE(v.xid::text::bigint, 0) AS version,
+       v.changed_at
+FROM data_version_names n
+LEFT JOIN LATERAL (
+    SELECT l.xid, l.changed_at
+    FROM data_version_log l
+    WHERE l.name = n.name AND l.xid < pg_snapshot_xmin(pg_current_snapshot())
+    ORDER BY l.xid DESC
+    LIMIT 1
+) v ON TRUE;
+
+-- Same name and arguments, so the existing statement triggers (0006, 0009,
+-- 0010, 0011) pick it up unchanged. The NOTIFY tells listeners that the
+-- domain changed; the payload's xid is informational only.
+CREATE OR REPLACE FUNCTION bump_data_version() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO data_version_log (name, xid)
+    VALUES (TG_ARGV[0], pg_current_xact_id())
+    ON CONFLICT DO NOTHING;
+    PERFORM pg_notify('data_versions', TG_ARGV[0] || ':' || pg_current_xact_id()::text);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION prune_data_version_log() RETURNS void AS $$
+    DELETE FROM data_version_log l
+    USING data_versions v
+    WHERE l.name = v.name AND l.xid::text::bigint < v.version;
+$$ LANGUAGE sql;
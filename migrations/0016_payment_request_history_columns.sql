@@ -0,0 +1,17 @@
+-- payment_request_history (0012) was `pr.*` UNION ALL `archive.*`, which
+-- matched the two tables' columns by position: a column added to one of
+-- them, or created in a different order, shifted values into the wrong
+-- columns or broke the view. Both branches now name their columns. A column
+-- added to payment_requests is added here (and to archive.payment_requests)
+-- by the migration that adds it.
+
+CREATE OR REPLACE VIEW payment_request_history AS
+    SELECT pr.id, pr.contract_id, pr.requested_by, pr.requested_date, pr.paid_date,
+           pr.amount_usd, pr.amount_iqd, pr.note, pr.status, pr.comments,
+           pr.created_at, pr.updated_at, pr.ref_no, NULL::timestamp AS archived_at
+    FROM payment_requests pr
+    UNION ALL
+    SELECT a.id, a.contract_id, a.requested_by, a.requested_date, a.paid_date,
+           a.amount_usd, a.amount_iqd, a.note, a.status, a.comments,
+           a.created_at, a.updated_at, a.ref_no, a.archived_at
+    FROM archive.payment_requests a;
@@ -0,0 +1,89 @@
+-- Data versions that advance at commit. 0015 took a domain's version from
+-- the newest logged xid below the reader's snapshot xmin, so any open
+-- transaction in the cluster, writing or not, held every version back until
+-- it ended. And the log was only pruned by the job workers' sweep, so with no
+-- worker running it grew without bound.
+--
+-- A domain's version is now the number of writing transactions that have
+-- committed to it: data_version_names.pruned plus its rows in
+-- data_version_log. A writer's row becomes visible to readers exactly when it
+-- commits, so the version moves then, and only forward. Pruning deletes a
+-- domain's rows and adds their count to pruned in the same transaction, so
+-- readers see the same version before and after.
+--
+-- Writers prune as they go: now and then bump_data_version() moves the
+-- domain's committed rows into pruned, unless another transaction holds the
+-- domain's row (SKIP LOCKED), so no writer waits on another. The workers'
+-- sweep still calls prune_data_version_log() for all domains.
+--
+-- Versions start above every xid-based version 0015 handed out, so a report
+-- stored under an old version is never mistaken for a current one.
+
+ALTER TABLE data_version_names
+    ADD COLUMN pruned     BIGINT NOT NULL DEFAULT 0,
+    ADD COLUMN changed_at TIMESTAMP;
+
+UPDATE data_version_names n
+SET pruned = COALESCE(l.newest, 0) + 1,
+    changed_at = l.changed_at
+FROM (
+    SELECT name, MAX(xid::text::bigint) AS newest, MAX(changed_at) AS changed_at
+    FROM data_version_log
+    GROUP BY name
+) l
+WHERE l.name = n.name;
+
+DELETE FROM data_version_log;
+
+CREATE OR REPLACE VIEW data_versions AS
+SELECT n.name,
+       n.pruned + l.changes AS version,
+       GREATEST(n.changed_at, l.changed_at) AS changed_at
+FROM data_version_names n
+CROSS JOIN LATERAL (
+    SELECT COUNT(*) AS changes, MAX(changed_at) AS changed_at
+    FROM data_version_log
+    WHERE name = n.name
+) l;
+
+DROP FUNCTION IF EXISTS prune_data_version_log();
+
+-- Moves the committed log rows of `domain` (all domains when NULL) into
+-- data_version_names.pruned. Domains another transaction is already
+-- pruning are skipped.
+CREATE OR REPLACE FUNCTION prune_data_version_log(domain TEXT DEFAULT NULL) RETURNS void AS $$
+DECLARE
+    n TEXT;
+BEGIN
+    FOR n IN
+        SELECT name FROM data_version_names
+        WHERE domain IS NULL OR name = domain
+        FOR UPDATE SKIP LOCKED
+    LOOP
+        WITH gone AS (
+            DELETE FROM data_version_log WHERE name = n RETURNING changed_at
+        )
+        UPDATE data_version_names
+        SET pruned = pruned + (SELECT COUNT(*) FROM gone),
+            changed_at = GREATEST(changed_at, (SELECT MAX(changed_at) FROM gone))
+        WHERE name = n;
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Same name and arguments as before, so the statement triggers pick it up
+-- unchanged. About one writing statement in 32 also prunes; only under READ
+-- COMMITTED, where locking a row another transaction updated since the
+-- statement began cannot fail.
+CREATE OR REPLACE FUNCTION bump_data_version() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO data_version_log (name, xid)
+    VALUES (TG_ARGV[0], pg_current_xact_id())
+    ON CONFLICT DO NOTHING;
+    IF random() < 1.0 / 32 AND current_setting('transaction_isolation') = 'read committed' THEN
+        PERFORM prune_data_version_log(TG_ARGV[0]);
+    END IF;
+    PERFORM pg_notify('data_versions', TG_ARGV[0] || ':' || pg_current_xact_id()::text);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
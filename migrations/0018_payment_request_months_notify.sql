@@ -0,0 +1,114 @@
+-- NOTIFY on channel `payment_request_months` with the months whose cash flow
+-- a write changed, so each server drops just those months from its
+-- closed-month store (logic/analytics.py) instead of all of them. The
+-- payload is a comma-separated list of month starts (YYYY-MM-DD), or `*` for
+-- every month (TRUNCATE, or more months than fit a payload).
+--
+-- A payment request counts in the month it was requested and the month it
+-- was paid. An update names both the old and the new months, and only when
+-- a figure the cash flow reads changed. Contracts name the months of their
+-- requests, archived ones included, when they are deleted or moved to
+-- another project.
+--
+-- Statement triggers with transition tables, so a batch (the archive move,
+-- the orphan cleanup) sends one notification. Transition tables allow one
+-- event per trigger, hence one trigger per event.
+
+CREATE OR REPLACE FUNCTION notify_months(days DATE[]) RETURNS void AS $$
+    SELECT pg_notify('payment_request_months',
+                     CASE WHEN cardinality(m) > 500 THEN '*' ELSE array_to_string(m, ',') END)
+    FROM (
+        SELECT ARRAY(
+            SELECT DISTINCT to_char(date_trunc('month', d), 'YYYY-MM-DD')
+            FROM unnest(days) d
+            WHERE d IS NOT NULL
+            ORDER BY 1
+        ) AS m
+    ) months
+    WHERE cardinality(m) > 0;
+$$ LANGUAGE sql;
+
+CREATE OR REPLACE FUNCTION notify_payment_request_months() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'TRUNCATE' THEN
+        PERFORM pg_notify('payment_request_months', '*');
+    ELSIF TG_OP = 'INSERT' THEN
+        PERFORM notify_months(ARRAY(
+            SELECT unnest(ARRAY[n.requested_date::date, n.paid_date::date]) FROM new_rows n
+        ));
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM notify_months(ARRAY(
+            SELECT unnest(ARRAY[o.requested_date::date, o.paid_date::date]) FROM old_rows o
+        ));
+    ELSE
+        PERFORM notify_months(ARRAY(
+            SELECT unnest(ARRAY[o.requested_date::date, o.paid_date::date,
+                                n.requested_date::date, n.paid_date::date])
+            FROM old_rows o
+            JOIN new_rows n ON n.id = o.id
+            WHERE (o.requested_date, o.paid_date, o.status, o.amount_usd, o.amount_iqd, o.contract_id)
+                  IS DISTINCT FROM
+                  (n.requested_date, n.paid_date, n.status, n.amount_usd, n.amount_iqd, n.contract_id)
+        ));
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION notify_contract_months() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'TRUNCATE' THEN
+        PERFORM pg_notify('payment_request_months', '*');
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM notify_months(ARRAY(
+            SELECT unnest(ARRAY[h.requested_date::date, h.paid_date::date])
+            FROM old_rows o
+            JOIN payment_request_history h ON h.contract_id = o.id
+        ));
+    ELSE
+        PERFORM notify_months(ARRAY(
+            SELECT unnest(ARRAY[h.requested_date::date, h.paid_date::date])
+            FROM old_rows o
+            JOIN new_rows n ON n.id = o.id
+            JOIN payment_request_history h ON h.contract_id = o.id
+            WHERE n.project_id IS DISTINCT FROM o.project_id
+        ));
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_payment_requests_months_insert ON payment_requests;
+CREATE TRIGGER trg_payment_requests_months_insert
+    AFTER INSERT ON payment_requests REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_payment_request_months();
+
+DROP TRIGGER IF EXISTS trg_payment_requests_months_update ON payment_requests;
+CREATE TRIGGER trg_payment_requests_months_update
+    AFTER UPDATE ON payment_requests REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_payment_request_months();
+
+DROP TRIGGER IF EXISTS trg_payment_requests_months_delete ON payment_requests;
+CREATE TRIGGER trg_payment_requests_months_delete
+    AFTER DELETE ON payment_requests REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_payment_request_months();
+
+DROP TRIGGER IF EXISTS trg_payment_requests_months_truncate ON payment_requests;
+CREATE TRIGGER trg_payment_requests_months_truncate
+    AFTER TRUNCATE ON payment_requests
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_payment_request_months();
+
+DROP TRIGGER IF EXISTS trg_contracts_months_update ON contracts;
+CREATE TRIGGER trg_contracts_months_update
+    AFTER UPDATE ON contracts REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_contract_months();
+
+DROP TRIGGER IF EXISTS trg_contracts_months_delete ON contracts;
+CREATE TRIGGER trg_contracts_months_delete
+    AFTER DELETE ON contracts REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_contract_months();
+
+DROP TRIGGER IF EXISTS trg_contracts_months_truncate ON contracts;
+CREATE TRIGGER trg_contracts_months_truncate
+    AFTER TRUNCATE ON contracts
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_contract_months();
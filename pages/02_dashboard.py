@@ -1,75 +1,33 @@
 import streamlit as st
-import psycopg2
-from psycopg2.extras import RealDictCursor
-import pandas as pd
-import plotly.express as px
+from components.header import render_header
+from logic.analytics import AGING_BUCKETS, combined_totals, dashboard_calls, load_contract_drilldown
+from logic.fx import reporting_currency
+from logic.reference import reference_store
+from logic.schema import schema_registry
+from utils.concurrency import run_parallel
 
 st.set_page_config(page_title="📊 Dashboard", layout="wide")  # MUST be first Streamlit call
 
 # ─── DEBUG: Show all DB tables/columns ──────────────────────────────
-def get_connection():
-    return psycopg2.connect(st.secrets["db_url"], cursor_factory=RealDictCursor)
-
 def show_db_structure():
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT table_name, column_name, data_type
-        FROM information_schema.columns
-        WHERE table_schema = 'public'
-        ORDER BY table_name, ordinal_position
-    """)
-    rows = cur.fetchall()
-    conn.close()
-    if rows:
-        df = pd.DataFrame(rows)
+    tables = schema_registry().tables
+    if tables:
         with st.expander("🔍 Show database tables & columns"):
-            for table, group in df.groupby("table_name"):
+            import pandas as pd
+            for table, columns in tables.items():
                 st.write(f"**Table:** `{table}`")
-                st.write(group[["column_name", "data_type"]].reset_index(drop=True))
+                st.write(pd.DataFrame(columns, columns=["column_name", "data_type"]))
     else:
         st.warning("No tables found in your database!")
 
 show_db_structure()  # Debug expander at the top
 
 st.title("📊 Dashboard")
+render_header()
 
-# ─── Detect USD/IQD columns automatically ───────────────────────────
-@st.cache_data(ttl=3600)
-def detect_money_cols():
-    conn = get_connection()
-    cur = conn.cursor()
-    try:
-        cur.execute("SELECT column_name FROM information_schema.columns WHERE table_name='contracts'")
-        c_cols = {r["column_name"] for r in cur.fetchall()}
-        usd_c = next((c for c in ["value_usd","contract_value_usd","budget_usd"] if c in c_cols), None)
-        iqd_c = next((c for c in ["value_iqd","contract_value_iqd","budget_iqd"] if c in c_cols), None)
-
-        cur.execute("SELECT column_name FROM information_schema.columns WHERE table_name='payment_requests'")
-        pr_cols = {r["column_name"] for r in cur.fetchall()}
-        usd_pr = next((c for c in ["amount_usd","paid_amount_usd"] if c in pr_cols), None)
-        iqd_pr = next((c for c in ["amount_iqd","paid_amount_iqd"] if c in pr_cols), None)
-
-        return usd_c, iqd_c, usd_pr, iqd_pr
-    except Exception as e:
-        st.error(f"DB Error: {e}")
-        return None, None, None, None
-    finally:
-        conn.close()
-
-usd_contract_col, iqd_contract_col, usd_pr_col, iqd_pr_col = detect_money_cols()
-
-# ─── Load project list for filter ───────────────────────────────────
-@st.cache_data(ttl=600)
-def load_reference_data():
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("SELECT id, name FROM projects ORDER BY name")
-    projects = cur.fetchall()
-    conn.close()
-    return projects
-
-projects = load_reference_data()
+# ─── Project list for filter ────────────────────────────────────────
+names = reference_store().project_names
+projects = [{"id": i, "name": n} for i, n in zip(names.ids.tolist(), names.labels)]
 
 project_options = ["All Projects"] + [p["name"] for p in projects]
 selected_project_name = st.selectbox("📁 Filter Dashboard by Project", project_options)
@@ -78,92 +36,13 @@ selected_project_id = (
     if selected_project_name != "All Projects" else None
 )
 
-# ─── Summary data (filtered) ────────────────────────────────────────
-@st.cache_data(ttl=30)
-def load_summary_data(project_id=None):
-    conn = get_connection()
-    cur = conn.cursor()
-    where = "WHERE c.project_id = %s" if project_id else ""
-    params = (project_id,) if project_id else ()
-
-    cur.execute(f"SELECT COUNT(*) AS c FROM contracts c {where}", params)
-    total_contracts = cur.fetchone()["c"]
-
-    cur.execute(f"SELECT COUNT(DISTINCT c.contractor_id) AS c FROM contracts c {where}", params)
-    total_contractors = cur.fetchone()["c"]
-
-    cur.execute(f"SELECT COUNT(*) AS c FROM payment_requests pr JOIN contracts c ON pr.contract_id = c.id {where}", params)
-    total_requests = cur.fetchone()["c"]
-
-    cur.execute(
-        f"SELECT pr.status, COUNT(*) AS c "
-        f"FROM payment_requests pr JOIN contracts c ON pr.contract_id = c.id {where} "
-        "GROUP BY pr.status",
-        params
-    )
-    rows = cur.fetchall()
-    status = {r["status"].lower(): r["c"] for r in rows}
-    pending = status.get("pending", 0)
-    approved = status.get("approved", 0)
-    rejected = status.get("rejected", 0)
-    paid_cnt = status.get("paid", 0)
-
-    # Budget sums
-    if usd_contract_col:
-        cur.execute(f"SELECT COALESCE(SUM(c.{usd_contract_col}),0) AS s FROM contracts c {where}", params)
-        budget_usd = cur.fetchone()["s"]
-    else:
-        budget_usd = 0
-    if iqd_contract_col:
-        cur.execute(f"SELECT COALESCE(SUM(c.{iqd_contract_col}),0) AS s FROM contracts c {where}", params)
-        budget_iqd = cur.fetchone()["s"]
-    else:
-        budget_iqd = 0
-
-    # Paid sums
-    if usd_pr_col:
-        cur.execute(
-            f"SELECT COALESCE(SUM(pr.{usd_pr_col}),0) AS s "
-            f"FROM payment_requests pr JOIN contracts c ON pr.contract_id = c.id {where} AND pr.status='paid'",
-            params
-        )
-        paid_usd = cur.fetchone()["s"]
-    else:
-        paid_usd = 0
-    if iqd_pr_col:
-        cur.execute(
-            f"SELECT COALESCE(SUM(pr.{iqd_pr_col}),0) AS s "
-            f"FROM payment_requests pr JOIN contracts c ON pr.contract_id = c.id {where} AND pr.status='paid'",
-            params
-        )
-        paid_iqd = cur.fetchone()["s"]
-    else:
-        paid_iqd = 0
-
-    cur.execute(
-        f"SELECT AVG(EXTRACT(EPOCH FROM (paid_date - requested_date))/86400) AS avg_days "
-        f"FROM payment_requests pr JOIN contracts c ON pr.contract_id = c.id {where} AND paid_date IS NOT NULL",
-        params
-    )
-    avg_days = cur.fetchone()["avg_days"] or 0
-
-    conn.close()
-    return {
-        "contracts": total_contracts,
-        "contractors": total_contractors,
-        "requests": total_requests,
-        "pending": pending,
-        "approved": approved,
-        "rejected": rejected,
-        "paid_cnt": paid_cnt,
-        "budget_usd": budget_usd,
-        "budget_iqd": budget_iqd,
-        "paid_usd": paid_usd,
-        "paid_iqd": paid_iqd,
-        "avg_days": avg_days
-    }
-
-data = load_summary_data(project_id=selected_project_id)
+# ─── Parallel fetch: the loaders are independent, so page latency is ─
+# ─── the slowest query rather than the sum of all three ─────────────
+with st.spinner("Loading dashboard…"):
+    fetched = run_parallel(dashboard_calls(
+        selected_project_id, st.session_state.get("cashflow_months", 36)
+    ))
+data = fetched["summary"]
 
 # ─── Show filter context ────────────────────────────────────────────
 if selected_project_id:
@@ -188,100 +67,241 @@ c1, c2 = st.columns(2)
 c1.metric("Budget (USD)", f"{data['budget_usd']:,.2f}")
 c2.metric("Budget (IQD)", f"{data['budget_iqd']:,.0f}")
 
+# ─── Combined view in the reporting currency (dated exchange rates) ─
+ccy = reporting_currency()
+combined = combined_totals(fetched["daily"], ccy)
+if combined is None:
+    st.warning(
+        f"No exchange rates loaded, so totals in {ccy} equivalent are not shown. "
+        "Load rates with `python -m logic.fx rates.csv` or set `default_iqd_per_usd`."
+    )
+else:
+    c3, c4, c5 = st.columns(3)
+    c3.metric(f"Total Budget ({ccy} eq.)", f"{combined['budget']:,.0f}")
+    c4.metric(f"Total Paid ({ccy} eq.)", f"{combined['paid']:,.0f}")
+    c5.metric(
+        "Paid vs Budget",
+        f"{combined['paid'] / combined['budget']:.1%}" if combined["budget"] else "—",
+    )
+
+# ─── Charts and tables ─────────────────────────────────────────────
+# pandas and plotly are imported inside the functions that draw with them,
+# so the filters and metrics above render before those libraries load.
+def budget_vs_actual_chart(data):
+    import pandas as pd
+    import plotly.express as px
+
+    ba_df = pd.DataFrame([
+        {"Type": "Budget USD", "Amount": data["budget_usd"]},
+        {"Type": "Paid USD",   "Amount": data["paid_usd"]},
+        {"Type": "Budget IQD", "Amount": data["budget_iqd"]},
+        {"Type": "Paid IQD",   "Amount": data["paid_iqd"]}
+    ])
+    fig = px.bar(ba_df, x="Type", y="Amount", text="Amount", title="Budget vs Actual (Filtered)")
+    fig.update_traces(texttemplate="%{text:,.0f}", textposition="outside")
+    st.plotly_chart(fig, use_container_width=True)
+
+
+def cashflow_chart(cashflow, currency, project_names):
+    import pandas as pd
+    import plotly.express as px
+
+    ccy = currency.lower()
+    df_cf = pd.DataFrame(cashflow)
+    df_cf["Project"] = df_cf["project_id"].map(project_names).fillna("—")
+    df_cf[[f"paid_{ccy}", f"requested_{ccy}"]] = df_cf[[f"paid_{ccy}", f"requested_{ccy}"]].astype(float)
+
+    paid = df_cf.groupby(["month", "Project"], as_index=False)[f"paid_{ccy}"].sum()
+    requested = df_cf.groupby("month", as_index=False)[f"requested_{ccy}"].sum()
+    fig_cf = px.area(
+        paid, x="month", y=f"paid_{ccy}", color="Project",
+        labels={"month": "Month", f"paid_{ccy}": f"Paid ({currency})"},
+        title=f"Paid per Month by Project vs Requested ({currency})",
+    )
+    fig_cf.add_scatter(
+        x=requested["month"], y=requested[f"requested_{ccy}"],
+        mode="lines+markers", name="Requested", line=dict(color="black", dash="dot"),
+    )
+    st.plotly_chart(fig_cf, use_container_width=True)
+
+
+def aging_chart_and_table(aging_rows, project_names):
+    import pandas as pd
+    import plotly.express as px
+
+    df_a = pd.DataFrame(aging_rows)
+    df_a["Project"] = df_a["project_id"].map(project_names).fillna("—")
+    df_a["Contractor"] = df_a["contractor_name"].fillna("—")
+
+    by_project = df_a.groupby("Project", as_index=False)[AGING_BUCKETS].sum()
+    fig_a = px.bar(
+        by_project.melt(id_vars="Project", var_name="Age", value_name="Open Requests"),
+        x="Project", y="Open Requests", color="Age",
+        category_orders={"Age": AGING_BUCKETS},
+        title="Open Requests by Age",
+    )
+    st.plotly_chart(fig_a, use_container_width=True)
+
+    df_a = df_a.rename(columns={
+        "open_count": "Open", "open_usd": "Open USD", "open_iqd": "Open IQD",
+        "oldest_days": "Oldest (days)", "share_of_project_pct": "% of Project",
+    })
+    st.dataframe(
+        df_a[["Project", "Contractor", *AGING_BUCKETS, "Open", "Open USD", "Open IQD",
+              "Oldest (days)", "% of Project"]],
+        use_container_width=True, hide_index=True,
+    )
+
+
+def time_to_pay_table(time_to_pay_rows, project_names):
+    import pandas as pd
+
+    df_t = pd.DataFrame([r for r in time_to_pay_rows if not r["is_total"]])
+    df_t["Project"] = df_t["project_id"].map(project_names).fillna("—")
+    df_t = df_t.rename(columns={
+        "paid_count": "Paid", "p50_days": "p50 (days)", "p90_days": "p90 (days)",
+    })
+    st.dataframe(
+        df_t[["Project", "Paid", "p50 (days)", "p90 (days)"]].round(1),
+        use_container_width=True, hide_index=True,
+    )
+
+
+def yearly_trend_chart(trend, project_names):
+    import pandas as pd
+    import plotly.express as px
+
+    df_y = pd.DataFrame(trend)
+    df_y["Project"] = df_y["project_id"].map(project_names).fillna("—")
+    df_y[["requested_usd", "paid_usd"]] = df_y[["requested_usd", "paid_usd"]].astype(float)
+    fig_y = px.bar(
+        df_y, x="year", y="paid_usd", color="Project",
+        labels={"year": "Year", "paid_usd": "Paid (USD)"},
+        title="Paid per Year by Project (USD)",
+    )
+    fig_y.update_xaxes(type="category")
+    st.plotly_chart(fig_y, use_container_width=True)
+
+
+def ranking_table(ranking):
+    import pandas as pd
+
+    df_k = pd.DataFrame(ranking)
+    df_k["avg_days_to_pay"] = df_k["avg_days_to_pay"].astype(float).round(1)
+    st.dataframe(
+        df_k.drop(columns=["contractor_id"]).rename(columns={
+            "rank": "Rank", "contractor": "Contractor", "contracts": "Contracts",
+            "requests": "Requests", "paid_usd": "Paid USD", "paid_iqd": "Paid IQD",
+            "avg_days_to_pay": "Avg Days to Pay",
+        }).set_index("Rank"),
+        use_container_width=True,
+    )
+
+
+def drilldown_table(contracts_rows, project_names):
+    import pandas as pd
+
+    df_d = pd.DataFrame(contracts_rows)
+    df_d["Project"] = df_d["project_id"].map(project_names).fillna("—")
+    st.dataframe(
+        df_d.drop(columns=["contract_id", "project_id"]),
+        use_container_width=True, hide_index=True,
+    )
+
+
+def requests_table(rows, dates, timestamps, drop):
+    import pandas as pd
+
+    df = pd.DataFrame(rows)
+    for col in dates:
+        df[col] = pd.to_datetime(df[col]).dt.date
+    for col in timestamps:
+        df[col] = pd.to_datetime(df[col]).dt.strftime("%Y-%m-%d %H:%M")
+    df.insert(0, "Ref No", df.pop("ref_no"))
+    df.drop(columns=drop, inplace=True, errors="ignore")
+    st.dataframe(df, use_container_width=True)
+
+
+project_names = {p["id"]: p["name"] for p in projects}
+
 # ─── Budget vs Actual Chart (filtered) ─────────────────────────────
-ba_df = pd.DataFrame([
-    {"Type": "Budget USD", "Amount": data["budget_usd"]},
-    {"Type": "Paid USD",   "Amount": data["paid_usd"]},
-    {"Type": "Budget IQD", "Amount": data["budget_iqd"]},
-    {"Type": "Paid IQD",   "Amount": data["paid_iqd"]}
-])
-fig = px.bar(ba_df, x="Type", y="Amount", text="Amount", title="Budget vs Actual (Filtered)")
-fig.update_traces(texttemplate="%{text:,.0f}", textposition="outside")
-st.plotly_chart(fig, use_container_width=True)
-
-# ─── Pending Payment Requests (filtered) ───────────────────────────
-@st.cache_data(ttl=30)
-def load_pending_requests(project_id=None):
-    conn = get_connection(); cur = conn.cursor()
-    where = "AND c.project_id = %s" if project_id else ""
-    params = (project_id,) if project_id else ()
-    cur.execute(
-        f"""
-        SELECT pr.*, c.title AS contract_title,
-               p.name AS project_name,
-               co.name AS contractor_name,
-               u.username AS requested_by
-        FROM payment_requests pr
-        JOIN contracts c ON pr.contract_id=c.id
-        JOIN projects p ON c.project_id=p.id
-        JOIN contractors co ON c.contractor_id=co.id
-        JOIN users u ON pr.requested_by=u.id
-        WHERE pr.status='pending' {where}
-        ORDER BY pr.created_at DESC
-        """,
-        params
+budget_vs_actual_chart(data)
+
+# ─── Monthly Cash Flow (filtered) ──────────────────────────────────
+st.subheader("📈 Monthly Cash Flow")
+cf1, cf2 = st.columns(2)
+cf1.selectbox(
+    "Period", [12, 24, 36, 60, 120], index=2,
+    format_func=lambda n: f"Last {n} months", key="cashflow_months"
+)
+currency = cf2.radio("Currency", ["USD", "IQD"], horizontal=True, key="cashflow_currency")
+
+cashflow = fetched["cashflow"]
+if cashflow:
+    cashflow_chart(cashflow, currency, project_names)
+else:
+    st.info("No payment activity in this period.")
+
+# ─── Payment Aging & Time-to-Pay (computed in SQL) ─────────────────
+st.subheader("⏳ Payment Aging")
+aging = fetched["aging"]
+
+ttp = {r["project_id"] if not r["is_total"] else None: r for r in aging["time_to_pay"]}
+scope_ttp = ttp.get(selected_project_id)
+t1, t2, t3 = st.columns(3)
+t1.metric("Time to Pay p50", f"{scope_ttp['p50_days']:.1f} days" if scope_ttp else "—")
+t2.metric("Time to Pay p90", f"{scope_ttp['p90_days']:.1f} days" if scope_ttp else "—")
+t3.metric("Paid Requests Measured", scope_ttp["paid_count"] if scope_ttp else 0)
+
+if aging["aging"]:
+    aging_chart_and_table(aging["aging"], project_names)
+    if not selected_project_id and len(ttp) > 1:
+        time_to_pay_table(aging["time_to_pay"], project_names)
+else:
+    st.info("No open payment requests.")
+
+# ─── Long-range Analytics (Parquet snapshot + DuckDB when enabled) ─
+st.subheader("🔬 Long-range Analytics")
+ranking, snapshot = fetched["ranking"]
+trend, _ = fetched["trend"]
+st.caption(
+    f"Source: analytics snapshot `{snapshot}`" if snapshot else "Source: live database"
+)
+
+if trend:
+    yearly_trend_chart(trend, project_names)
+
+if ranking:
+    ranking_table(ranking)
+
+    contractor_ids = {r["contractor"]: r["contractor_id"] for r in ranking}
+    drill = st.selectbox(
+        "Drill down into a contractor", ["—"] + list(contractor_ids), key="drilldown_contractor"
     )
-    rows = cur.fetchall()
-    conn.close()
-    return rows
+    if drill != "—":
+        contracts_rows, _ = load_contract_drilldown(contractor_ids[drill], project_id=selected_project_id)
+        drilldown_table(contracts_rows, project_names)
+else:
+    st.info("No contractor activity yet.")
 
+# ─── Pending Payment Requests ──────────────────────────────────────
 st.subheader("📝 Pending Payment Requests")
-pending_list = load_pending_requests(project_id=selected_project_id)
+pending_list = fetched["pending"]
 if pending_list:
-    df_p = pd.DataFrame(pending_list)
-    df_p["requested_date"] = pd.to_datetime(df_p["requested_date"]).dt.date
-    df_p["created_at"]     = pd.to_datetime(df_p["created_at"]).dt.strftime("%Y-%m-%d %H:%M")
-    short_ids = [
-        f"{row['project_name']}-{row['contractor_name'][:3].upper()}-{i+1}"
-        for i, row in df_p.iterrows()
-    ]
-    df_p.insert(0, "Short ID", short_ids)
-    df_p.drop(columns=["id","updated_at","paid_date"], inplace=True, errors="ignore")
-    st.dataframe(df_p, use_container_width=True)
+    requests_table(
+        pending_list, dates=["requested_date"], timestamps=["created_at"],
+        drop=["id", "updated_at", "paid_date"],
+    )
 else:
     st.info("No pending payment requests.")
 
-# ─── Recent Payment Requests (filtered) ────────────────────────────
-@st.cache_data(ttl=30)
-def load_recent_payment_requests(limit=5, project_id=None):
-    conn = get_connection(); cur = conn.cursor()
-    where = "AND c.project_id = %s" if project_id else ""
-    params = (project_id,) if project_id else ()
-    cur.execute(
-        f"""
-        SELECT pr.*, c.title    AS contract_title,
-               p.name     AS project_name,
-               co.name    AS contractor_name,
-               u.username AS requested_by
-        FROM payment_requests pr
-        JOIN contracts c ON pr.contract_id=c.id
-        JOIN projects p ON c.project_id=p.id
-        JOIN contractors co ON c.contractor_id=co.id
-        JOIN users u ON pr.requested_by=u.id
-        WHERE TRUE {where}
-        ORDER BY pr.created_at DESC
-        LIMIT {limit}
-        """,
-        params
-    )
-    rows = cur.fetchall()
-    conn.close()
-    return rows
-
+# ─── Recent Payment Requests ───────────────────────────────────────
 st.subheader("💸 Recent Payment Requests")
-recent = load_recent_payment_requests(limit=5, project_id=selected_project_id)
+recent = fetched["recent"]
 if recent:
-    df_r = pd.DataFrame(recent)
-    df_r["requested_date"] = pd.to_datetime(df_r["requested_date"]).dt.date
-    df_r["paid_date"]      = pd.to_datetime(df_r["paid_date"]).dt.date
-    df_r["created_at"]     = pd.to_datetime(df_r["created_at"]).dt.strftime("%Y-%m-%d %H:%M")
-    df_r["updated_at"]     = pd.to_datetime(df_r["updated_at"]).dt.strftime("%Y-%m-%d %H:%M")
-    short_ids = [
-        f"{row['project_name']}-{row['contractor_name'][:3].upper()}-{i+1}"
-        for i, row in df_r.iterrows()
-    ]
-    df_r.insert(0, "Short ID", short_ids)
-    df_r.drop(columns=["id"], inplace=True)
-    st.dataframe(df_r, use_container_width=True)
+    requests_table(
+        recent, dates=["requested_date", "paid_date"], timestamps=["created_at", "updated_at"],
+        drop=["id"],
+    )
 else:
     st.info("No recent payment requests found.")
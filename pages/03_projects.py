@@ -1,14 +1,12 @@
 import streamlit as st
-import psycopg2
-from psycopg2.extras import RealDictCursor
-import uuid
-from datetime import date, datetime
+from datetime import date
+from logic import repository
+from logic.cleanup import request_cleanup
+from logic.reference import reference_changed
+from utils.audit import changes, record
 
 st.title("🏗️ Projects")
 
-def get_connection():
-    return psycopg2.connect(st.secrets["db_url"], cursor_factory=RealDictCursor)
-
 def get_access_flags(user: dict, page: str) -> tuple[bool, bool, bool, bool]:
     role = user.get("role", "")
     can_view = can_add = can_edit = can_delete = False
@@ -79,17 +77,12 @@ if can_add:
                     st.warning("Project name is required.")
                 else:
                     try:
-                        conn = get_connection()
-                        cur = conn.cursor()
-                        cur.execute("""
-                            INSERT INTO projects (id, name, location, start_date, end_date, status, created_by, created_at)
-                            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-                        """, (
-                            str(uuid.uuid4()), name, location, start_date, end_date, status,
-                            user.get("username", "unknown"), datetime.utcnow()
-                        ))
-                        conn.commit()
-                        conn.close()
+                        project_id = repository.insert_project(
+                            name, location, start_date, end_date, status, user.get("username", "unknown")
+                        )
+                        reference_changed()
+                        record("insert", "project", project_id, f"Added project {name}",
+                               location=location, status=status)
                         st.success("✅ Project added successfully!")
                         st.rerun()
                     except Exception as e:
@@ -98,24 +91,11 @@ if can_add:
 # === Load Projects ===
 st.markdown("### 📋 Project List")
 try:
-    conn = get_connection()
-    cur = conn.cursor()
-
     if user.get("role") in ["Superadmin", "HQ Admin", "HQ Accountant"]:
-        cur.execute("SELECT * FROM projects ORDER BY created_at DESC")
-        projects = cur.fetchall()
+        projects = repository.list_projects()
     else:
         # Show only assigned projects
-        cur.execute("""
-            SELECT p.*
-            FROM projects p
-            JOIN project_assignments pa ON p.id = pa.project_id
-            WHERE pa.user_id = %s
-            ORDER BY p.created_at DESC
-        """, (user.get("id"),))
-        projects = cur.fetchall()
-
-    conn.close()
+        projects = repository.list_projects(user_id=user.get("id"))
 
     search_term = st.text_input("🔍 Search projects by name or location").strip().lower()
     filtered = [
@@ -143,15 +123,14 @@ try:
                                                 key=f"st_{p['id']}")
                             if st.form_submit_button("💾 Save Changes"):
                                 try:
-                                    conn2 = get_connection()
-                                    cur2 = conn2.cursor()
-                                    cur2.execute("""
-                                        UPDATE projects
-                                        SET name=%s, location=%s, start_date=%s, end_date=%s, status=%s
-                                        WHERE id=%s
-                                    """, (name, loc, s_date, e_date, stat, p['id']))
-                                    conn2.commit()
-                                    conn2.close()
+                                    repository.update_project(p["id"], name, loc, s_date, e_date, stat)
+                                    reference_changed()
+                                    record(
+                                        "status_change" if stat != p["status"] else "update",
+                                        "project", p["id"], f"Updated project {name}",
+                                        **changes(p, {"name": name, "location": loc, "start_date": s_date,
+                                                      "end_date": e_date, "status": stat}),
+                                    )
                                     st.success("✅ Project updated successfully")
                                     st.rerun()
                                 except Exception as e:
@@ -165,11 +144,10 @@ try:
                 with col2:
                     if can_delete and st.button("🗑️ Delete", key=f"del_{p['id']}"):
                         try:
-                            conn2 = get_connection()
-                            cur2 = conn2.cursor()
-                            cur2.execute("DELETE FROM projects WHERE id = %s", (p['id'],))
-                            conn2.commit()
-                            conn2.close()
+                            repository.delete_project(p["id"])
+                            request_cleanup()
+                            reference_changed()
+                            record("delete", "project", p["id"], f"Deleted project {p['name']}")
                             st.success("✅ Deleted successfully")
                             st.rerun()
                         except Exception as e:
@@ -1,15 +1,10 @@
 import streamlit as st
-import psycopg2
-from psycopg2.extras import RealDictCursor
-import uuid
-from datetime import datetime
+from logic import repository
+from logic.reference import reference_changed
+from utils.audit import changes, record
 
 st.title("👷 Contractors")
 
-# === DB connection ===
-def get_connection():
-    return psycopg2.connect(st.secrets["db_url"], cursor_factory=RealDictCursor)
-
 # === Inline role-based access logic ===
 def get_access_flags(user: dict, page: str) -> tuple[bool, bool, bool, bool]:
     role = user.get("role", "")
@@ -83,17 +78,9 @@ if can_add:
                     st.warning("Contractor name is required.")
                 else:
                     try:
-                        conn = get_connection()
-                        cur = conn.cursor()
-                        cur.execute(
-                            """
-                            INSERT INTO contractors (id, name, contact_person, email, phone, address, created_at)
-                            VALUES (%s, %s, %s, %s, %s, %s, %s)
-                            """,
-                            (str(uuid.uuid4()), name, contact_person, email, phone, address, datetime.utcnow())
-                        )
-                        conn.commit()
-                        conn.close()
+                        contractor_id = repository.insert_contractor(name, contact_person, email, phone, address)
+                        reference_changed()
+                        record("insert", "contractor", contractor_id, f"Added contractor {name}")
                         st.success("✅ Contractor added successfully!")
                         st.rerun()
                     except Exception as e:
@@ -104,11 +91,7 @@ if can_add:
 st.markdown("### 📋 Contractor List")
 
 try:
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("SELECT * FROM contractors ORDER BY created_at DESC")
-    contractors = cur.fetchall()
-    conn.close()
+    contractors = repository.list_contractors()
 
     search_term = st.text_input("🔍 Search contractors by name, contact, or email").strip().lower()
 
@@ -138,18 +121,16 @@ try:
                             address = st.text_area("Address", contractor["address"] or "", key=f"addr_{contractor['id']}")
                             if st.form_submit_button("💾 Save Changes"):
                                 try:
-                                    conn2 = get_connection()
-                                    cur2 = conn2.cursor()
-                                    cur2.execute(
-                                        """
-                                        UPDATE contractors
-                                        SET name=%s, contact_person=%s, email=%s, phone=%s, address=%s
-                                        WHERE id=%s
-                                        """,
-                                        (name, contact, email, phone, address, contractor['id'])
+                                    repository.update_contractor(
+                                        contractor["id"], name, contact, email, phone, address
+                                    )
+                                    reference_changed()
+                                    record(
+                                        "update", "contractor", contractor["id"], f"Updated contractor {name}",
+                                        **changes(contractor, {"name": name, "contact_person": contact,
+                                                               "email": email, "phone": phone,
+                                                               "address": address}),
                                     )
-                                    conn2.commit()
-                                    conn2.close()
                                     st.success("✅ Updated successfully")
                                     st.rerun()
                                 except Exception as e:
@@ -163,11 +144,10 @@ try:
                 with col2:
                     if can_delete and st.button("🗑️ Delete", key=f"del_{contractor['id']}"):
                         try:
-                            conn2 = get_connection()
-                            cur2 = conn2.cursor()
-                            cur2.execute("DELETE FROM contractors WHERE id = %s", (contractor['id'],))
-                            conn2.commit()
-                            conn2.close()
+                            repository.delete_contractor(contractor["id"])
+                            reference_changed()
+                            record("delete", "contractor", contractor["id"],
+                                   f"Deleted contractor {contractor['name']}")
                             st.success("✅ Deleted successfully")
                             st.rerun()
                         except Exception as e:
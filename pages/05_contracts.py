@@ -1,17 +1,14 @@
 # 05_contracts.py
 
 import streamlit as st
-import psycopg2
-from psycopg2.extras import RealDictCursor
-import uuid
-from datetime import date, datetime
+from datetime import date
+from logic import repository
+from logic.cleanup import request_cleanup
+from logic.reference import reference_changed, reference_store
+from utils.audit import record
 
 st.title("📄 Contracts")
 
-# === DB Connection ===
-def get_connection():
-    return psycopg2.connect(st.secrets["db_url"], cursor_factory=RealDictCursor)
-
 # === Access Flags ===
 def get_access_flags(user: dict, page: str) -> tuple[bool, bool, bool, bool]:
     role = user.get("role", "")
@@ -65,46 +62,26 @@ if not can_view:
     """, unsafe_allow_html=True)
     st.stop()
 
-# === Helper: Load Projects and Contractors ===
-@st.cache_data(ttl=120)
-def load_projects_for_user(user_id: str, role: str):
-    conn = get_connection()
-    cur = conn.cursor()
-    if role in ["Superadmin", "HQ Admin", "HQ Accountant"]:
-        cur.execute("SELECT id, name FROM projects ORDER BY name;")
-    else:
-        cur.execute("""
-            SELECT p.id, p.name
-            FROM projects p
-            JOIN project_assignments pa ON p.id = pa.project_id
-            WHERE pa.user_id = %s
-            ORDER BY p.name;
-        """, (user_id,))
-    rows = cur.fetchall()
-    conn.close()
-    return rows
-
+# === Helper: Projects visible to the user (choices come from the shared reference store) ===
 @st.cache_data(ttl=120)
-def load_contractors():
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("SELECT id, name FROM contractors ORDER BY name;")
-    rows = cur.fetchall()
-    conn.close()
-    return rows
+def load_projects_for_user(user_id: str):
+    return repository.projects_for_user(user_id)
 
-projects_list = load_projects_for_user(user.get("id"), user.get("role"))
-contractors_list = load_contractors()
+ref = reference_store()
+if user.get("role") in ["Superadmin", "HQ Admin", "HQ Accountant"]:
+    project_choices = ref.project_names
+else:
+    project_choices = ref.project_names.subset(
+        p["id"] for p in load_projects_for_user(user.get("id"))
+    )
 
 # === Add New Contract Form ===
 if can_add:
     with st.expander("➕ Add New Contract", expanded=True):
         with st.form("add_contract_form"):
             title = st.text_input("Contract Title", max_chars=100)
-            project_map = {p["name"]: p["id"] for p in projects_list}
-            contractor_map = {c["name"]: c["id"] for c in contractors_list}
-            selected_proj = st.selectbox("Project", list(project_map.keys()))
-            selected_contractor = st.selectbox("Contractor", list(contractor_map.keys()))
+            selected_proj = st.selectbox("Project", project_choices.labels)
+            selected_contractor = st.selectbox("Contractor", ref.contractors.labels)
             value_usd = st.number_input("Value in USD ($)", min_value=0.0, step=100.0, format="%.2f")
             value_iqd = st.number_input("Value in IQD (ع.د)", min_value=0.0, step=100000.0, format="%.0f")
             start_date = st.date_input("Start Date", value=date.today())
@@ -117,23 +94,16 @@ if can_add:
                     st.warning("Title, Project, and Contractor are required.")
                 else:
                     try:
-                        conn = get_connection()
-                        cur = conn.cursor()
-                        cur.execute("""
-                            INSERT INTO contracts (
-                                id, title, project_id, contractor_id,
-                                contract_value_usd, contract_value_iqd,
-                                start_date, end_date, status, scope, created_at
-                            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                        """, (
-                            str(uuid.uuid4()), title,
-                            project_map[selected_proj],
-                            contractor_map[selected_contractor],
-                            value_usd or None, value_iqd or None,
-                            start_date, end_date, status, scope, datetime.utcnow()
-                        ))
-                        conn.commit()
-                        conn.close()
+                        contract_id = repository.insert_contract(
+                            title,
+                            project_choices.id_by_label[selected_proj],
+                            ref.contractors.id_by_label[selected_contractor],
+                            value_usd, value_iqd, start_date, end_date, status, scope,
+                        )
+                        reference_changed()
+                        record("insert", "contract", contract_id, f"Added contract {title}",
+                               project=selected_proj, contractor=selected_contractor,
+                               value_usd=value_usd, value_iqd=value_iqd, status=status)
                         st.success("✅ Contract added successfully!")
                         st.rerun()
                     except Exception as e:
@@ -142,28 +112,10 @@ if can_add:
 # === Contract List ===
 st.markdown("### 📋 Contract List")
 try:
-    conn = get_connection()
-    cur = conn.cursor()
     if user.get("role") in ["Superadmin", "HQ Admin", "HQ Accountant"]:
-        cur.execute("""
-            SELECT c.*, p.name AS project_name, t.name AS contractor_name
-            FROM contracts c
-            JOIN projects p ON c.project_id = p.id
-            JOIN contractors t ON c.contractor_id = t.id
-            ORDER BY c.created_at DESC
-        """)
+        contracts = repository.list_contracts()
     else:
-        cur.execute("""
-            SELECT c.*, p.name AS project_name, t.name AS contractor_name
-            FROM contracts c
-            JOIN projects p ON c.project_id = p.id
-            JOIN contractors t ON c.contractor_id = t.id
-            JOIN project_assignments pa ON p.id = pa.project_id
-            WHERE pa.user_id = %s
-            ORDER BY c.created_at DESC
-        """, (user.get("id"),))
-    contracts = cur.fetchall()
-    conn.close()
+        contracts = repository.list_contracts(user_id=user.get("id"))
 
     search_term = st.text_input("🔍 Search by project, contractor, or title").strip().lower()
     filtered = [
@@ -201,22 +153,13 @@ try:
                             )
                             if st.form_submit_button("Upload") and uploaded_files:
                                 try:
-                                    conn2 = get_connection()
-                                    cur2 = conn2.cursor()
+                                    repository.add_contract_attachments(
+                                        c["id"], [(f.name, f.read(), f.type) for f in uploaded_files]
+                                    )
                                     for uploaded_file in uploaded_files:
-                                        cur2.execute("""
-                                            INSERT INTO contract_attachments (
-                                                id, contract_id, file_name, file_type, file_data
-                                            ) VALUES (%s, %s, %s, %s, %s)
-                                        """, (
-                                            str(uuid.uuid4()),
-                                            c["id"],
-                                            uploaded_file.name,
-                                            uploaded_file.type,
-                                            uploaded_file.read()
-                                        ))
-                                    conn2.commit()
-                                    conn2.close()
+                                        record("insert", "attachment", c["id"],
+                                               f"Uploaded {uploaded_file.name} to contract {c['title']}",
+                                               file_name=uploaded_file.name)
                                     st.success("✅ File(s) uploaded successfully!")
                                     st.rerun()
                                 except Exception as e:
@@ -224,32 +167,12 @@ try:
 
                     # === List Existing Attachments (no nested expanders) ===
                     try:
-                        conn3 = get_connection()
-                        cur3 = conn3.cursor()
-                        cur3.execute("""
-                            SELECT id, file_name, file_type, uploaded_at
-                            FROM contract_attachments
-                            WHERE contract_id = %s
-                            ORDER BY uploaded_at DESC
-                        """, (c["id"],))
-                        attachments = cur3.fetchall()
-                        conn3.close()
+                        attachments = repository.contract_attachments(c["id"])
 
                         if attachments:
                             st.markdown("**📁 Attachments:**")
                             for file in attachments:
-                                # Retrieve binary data as memoryview, then convert to bytes
-                                conn4 = get_connection()
-                                cur4 = conn4.cursor()
-                                cur4.execute(
-                                    "SELECT file_data FROM contract_attachments WHERE id = %s",
-                                    (file["id"],)
-                                )
-                                raw = cur4.fetchone()["file_data"]
-                                conn4.close()
-
-                                # Convert memoryview to raw bytes
-                                data_bytes = bytes(raw)
+                                data_bytes = repository.contract_attachment_content(file["id"]) or b""
 
                                 st.markdown(
                                     f"📄 **{file['file_name']}** "
@@ -261,7 +184,10 @@ try:
                                     data=data_bytes,
                                     file_name=file["file_name"],
                                     mime=file["file_type"],
-                                    key=f"dl_{file['id']}"
+                                    key=f"dl_{file['id']}",
+                                    on_click=record,
+                                    args=("download", "attachment", file["id"],
+                                          f"Downloaded {file['file_name']} from contract {c['title']}"),
                                 )
 
                                 # 🗑 Delete Attachment Button
@@ -269,14 +195,9 @@ try:
                                     "🗑️ Delete Attachment", key=f"del_att_{file['id']}"
                                 ):
                                     try:
-                                        conn5 = get_connection()
-                                        cur5 = conn5.cursor()
-                                        cur5.execute(
-                                            "DELETE FROM contract_attachments WHERE id = %s",
-                                            (file["id"],)
-                                        )
-                                        conn5.commit()
-                                        conn5.close()
+                                        repository.delete_contract_attachment(file["id"])
+                                        record("delete", "attachment", file["id"],
+                                               f"Deleted {file['file_name']} from contract {c['title']}")
                                         st.success("🗑️ Attachment deleted")
                                         st.rerun()
                                     except Exception as e:
@@ -290,11 +211,10 @@ try:
                 with col2:
                     if can_delete and st.button("🗑️ Delete Contract", key=f"del_{c['id']}"):
                         try:
-                            conn2 = get_connection()
-                            cur2 = conn2.cursor()
-                            cur2.execute("DELETE FROM contracts WHERE id = %s", (c["id"],))
-                            conn2.commit()
-                            conn2.close()
+                            repository.delete_contract(c["id"])
+                            request_cleanup()
+                            reference_changed()
+                            record("delete", "contract", c["id"], f"Deleted contract {c['title']}")
                             st.success("✅ Contract deleted successfully")
                             st.rerun()
                         except Exception as e:
@@ -1,20 +1,25 @@
 import streamlit as st
-import psycopg2
-from psycopg2.extras import RealDictCursor
 from datetime import datetime, date
 import uuid
-import pandas as pd
 import io
+from components.header import render_header
+from logic import repository
+from logic.analytics import invalidate_months
+from logic.archive import reaches_archive
+from logic.cleanup import request_cleanup
+from logic.fx import normalize_frame, reporting_currency
+from logic.reference import reference_store
+from utils.audit import changes, record
 
 st.set_page_config(page_title="💸 Payment Requests", layout="wide")
 st.title("💸 Payment Requests")
+render_header()
 
 
 # ────────────────────────────────────────────────────────────────────────────────
-# 1) Database connection helper
+# 1) Database access goes through logic/repository.py (prepared statements on
+#    pooled connections; reads may use the read replica)
 # ────────────────────────────────────────────────────────────────────────────────
-def get_connection():
-    return psycopg2.connect(st.secrets["db_url"], cursor_factory=RealDictCursor)
 
 
 # ────────────────────────────────────────────────────────────────────────────────
@@ -83,97 +88,32 @@ if not can_view:
 
 
 # ────────────────────────────────────────────────────────────────────────────────
-# 4) Helper functions to load “foreign‐key” data
+# 4) “Foreign‐key” choices come from the process-wide reference store
+#    (logic/reference.py), shared read-only by every session
 # ────────────────────────────────────────────────────────────────────────────────
-@st.cache_data
-def load_projects():
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("SELECT id, name, location FROM projects ORDER BY name")
-    rows = cur.fetchall()
-    conn.close()
-    return rows
-
-
-@st.cache_data
-def load_contractors():
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("SELECT id, name FROM contractors ORDER BY name")
-    rows = cur.fetchall()
-    conn.close()
-    return rows
-
-
-@st.cache_data
-def load_contracts():
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        SELECT
-            c.id,
-            c.title AS contract_title,
-            p.id AS project_id,
-            p.name AS project_name,
-            co.id AS contractor_id,
-            co.name AS contractor_name
-        FROM contracts c
-        LEFT JOIN projects p ON c.project_id = p.id
-        LEFT JOIN contractors co ON c.contractor_id = co.id
-        ORDER BY p.name, c.title
-        """
-    )
-    rows = cur.fetchall()
-    conn.close()
-    return rows
-
 
 # ────────────────────────────────────────────────────────────────────────────────
 # 5) Payment requests loader (no caching, so new inserts/updates appear immediately)
+#    Every filter runs in SQL; the requested-date range limits the query to
+#    the yearly partitions it covers, and the archive is added only when the
+#    range reaches back to archived requests.
 # ────────────────────────────────────────────────────────────────────────────────
-def load_payment_requests(status_filter: str | None, start_date_filter: date | None):
-    conn = get_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-
-    cur.execute(
-        """
-        SELECT
-            pr.id,
-            pr.requested_date,
-            pr.paid_date,
-            pr.amount_usd,
-            pr.amount_iqd,
-            pr.note,
-            pr.status,
-            pr.requested_by,
-            pr.comments,
-            pr.created_at,
-            u.username AS requested_by_name,
-            c.title AS contract_title,
-            p.name AS project_name,
-            co.name AS contractor_name
-        FROM payment_requests pr
-        LEFT JOIN users u ON pr.requested_by = u.id
-        LEFT JOIN contracts c ON pr.contract_id = c.id
-        LEFT JOIN projects p ON c.project_id = p.id
-        LEFT JOIN contractors co ON c.contractor_id = co.id
-        ORDER BY pr.requested_date DESC
-        """
+def load_payment_requests(
+    status_filter: str | None,
+    start_date_filter: date | None,
+    ref_search: str | None = None,
+    end_date_filter: date | None = None,
+):
+    filters = dict(
+        status=None if status_filter in (None, "All") else status_filter,
+        since=start_date_filter,
+        until=end_date_filter,
     )
-    rows = cur.fetchall()
-    conn.close()
-
-    # Apply in‐Python filtering
-    filtered = []
-    for r in rows:
-        if status_filter and status_filter != "All" and r["status"] != status_filter:
-            continue
-        if start_date_filter and r["requested_date"].date() < start_date_filter:
-            continue
-        filtered.append(r)
-
-    return filtered
+    rows = repository.list_payment_requests(ref_search, **filters)
+    if reaches_archive(start_date_filter):
+        rows += repository.list_payment_requests(ref_search, archived=True, **filters)
+        rows.sort(key=lambda r: r["requested_date"], reverse=True)
+    return rows
 
 
 # ────────────────────────────────────────────────────────────────────────────────
@@ -191,30 +131,14 @@ def insert_payment_request(
     status: str,
     comments: str | None,
 ):
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        INSERT INTO payment_requests
-          (id, contract_id, requested_by, requested_date, paid_date,
-           amount_usd, amount_iqd, note, status, comments, created_at, updated_at)
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, NOW(), NOW())
-        """,
-        (
-            request_id,
-            contract_id,
-            requested_by,
-            requested_date,
-            paid_date if paid_date else None,
-            amount_usd if amount_usd else None,
-            amount_iqd if amount_iqd else None,
-            note if note else None,
-            status,
-            comments if comments else None,
-        ),
+    ref_no = repository.insert_payment_request(
+        request_id, contract_id, requested_by, requested_date, paid_date,
+        amount_usd, amount_iqd, note, status, comments,
     )
-    conn.commit()
-    conn.close()
+    invalidate_months(requested_date, paid_date)
+    record("insert", "payment_request", request_id, f"Submitted {ref_no}",
+           contract_id=contract_id, amount_usd=amount_usd, amount_iqd=amount_iqd, status=status)
+    return ref_no
 
 
 # ────────────────────────────────────────────────────────────────────────────────
@@ -222,6 +146,7 @@ def insert_payment_request(
 # ────────────────────────────────────────────────────────────────────────────────
 def update_payment_request(
     request_id: str,
+    stored_date: datetime,
     amount_usd: float | None,
     amount_iqd: float | None,
     note: str | None,
@@ -230,124 +155,121 @@ def update_payment_request(
     status: str,
     comments: str | None,
 ):
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        UPDATE payment_requests
-        SET
-          amount_usd = %s,
-          amount_iqd = %s,
-          note = %s,
-          requested_date = %s,
-          paid_date = %s,
-          status = %s,
-          comments = %s,
-          updated_at = NOW()
-        WHERE id = %s
-        """,
-        (
-            amount_usd if amount_usd else None,
-            amount_iqd if amount_iqd else None,
-            note if note else None,
-            requested_date,
-            paid_date if paid_date else None,
-            status,
-            comments if comments else None,
-            request_id,
+    old = repository.update_payment_request(
+        request_id, stored_date, requested_date, paid_date, amount_usd, amount_iqd, note, status, comments,
+    )
+    if not old:
+        return
+    # Closed months of the monthly cash flow that this edit moved money in or out of
+    invalidate_months(requested_date, paid_date, old["requested_date"], old["paid_date"])
+    record(
+        "status_change" if status != old["status"] else "update",
+        "payment_request", request_id, f"Updated {old['ref_no']}",
+        **changes(
+            {k: (float(v) if k.startswith("amount") and v is not None else v) for k, v in old.items()},
+            {"status": status, "amount_usd": amount_usd, "amount_iqd": amount_iqd},
         ),
     )
-    conn.commit()
-    conn.close()
 
 
 # ────────────────────────────────────────────────────────────────────────────────
 # 8) Upload attachments for a given payment_request_id
 # ────────────────────────────────────────────────────────────────────────────────
-def upload_attachments(request_id: str, files):
+def upload_attachments(request_id: str, requested_date: datetime, files):
     if not files:
         return
-    conn = get_connection()
-    cur = conn.cursor()
+    repository.add_request_attachments(
+        request_id, requested_date, [(f.name, f.getvalue(), f.type) for f in files]
+    )
     for f in files:
-        file_id = str(uuid.uuid4())
-        file_bytes = f.getvalue()
-        mime_type = f.type
-        filename = f.name
-        cur.execute(
-            """
-            INSERT INTO payment_request_attachments
-              (id, payment_request_id, filename, content, mime_type, created_at)
-            VALUES (%s, %s, %s, %s, %s, NOW())
-            """,
-            (
-                file_id,
-                request_id,
-                filename,
-                psycopg2.Binary(file_bytes),
-                mime_type,
-            ),
-        )
-    conn.commit()
-    conn.close()
+        record("insert", "attachment", request_id, f"Uploaded {f.name}", file_name=f.name)
 
 
 # ────────────────────────────────────────────────────────────────────────────────
 # 9) Load attachments for a given request_id
 # ────────────────────────────────────────────────────────────────────────────────
-def load_request_attachments(request_id: str):
-    conn = get_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-    cur.execute(
-        """
-        SELECT
-          id,
-          filename,
-          mime_type,
-          created_at
-        FROM payment_request_attachments
-        WHERE payment_request_id = %s
-        ORDER BY created_at DESC
-        """,
-        (request_id,),
-    )
-    rows = cur.fetchall()
-    conn.close()
-    return rows
+def load_request_attachments(request_id: str, requested_date: datetime):
+    return repository.request_attachments(request_id, requested_date)
 
 
 # ────────────────────────────────────────────────────────────────────────────────
 # 10) Delete a single attachment by its ID
 # ────────────────────────────────────────────────────────────────────────────────
-def delete_attachment(attachment_id: str):
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute(
-        "DELETE FROM payment_request_attachments WHERE id = %s",
-        (attachment_id,),
-    )
-    conn.commit()
-    conn.close()
+def delete_attachment(attachment_id: str, requested_date: datetime):
+    filename = repository.delete_request_attachment(attachment_id, requested_date)
+    if filename:
+        record("delete", "attachment", attachment_id, f"Deleted {filename}")
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# 10b) Contract balance – single-row lookup in contract_ledger, which a trigger
+#      keeps in step with every payment request change
+# ────────────────────────────────────────────────────────────────────────────────
+def load_contract_balance(contract_id: str) -> dict | None:
+    row = repository.contract_balance(contract_id)
+    if not row:
+        return None
+    balance = dict(row)
+    for ccy in ("usd", "iqd"):
+        value = balance[f"contract_value_{ccy}"]
+        balance[f"remaining_{ccy}"] = (
+            float(value) - float(balance[f"requested_{ccy}"]) if value is not None else None
+        )
+    return balance
+
+
+def over_budget(balance: dict, amount_usd: float, amount_iqd: float) -> list[str]:
+    over = []
+    if balance["remaining_usd"] is not None and amount_usd > balance["remaining_usd"]:
+        over.append(f"USD {amount_usd:,.2f} > remaining {balance['remaining_usd']:,.2f}")
+    if balance["remaining_iqd"] is not None and amount_iqd > balance["remaining_iqd"]:
+        over.append(f"IQD {amount_iqd:,.0f} > remaining {balance['remaining_iqd']:,.0f}")
+    return over
 
 
 # ────────────────────────────────────────────────────────────────────────────────
-# 11) “Export Buttons” – CSV for ALL payment_requests
+# 11) “Export Buttons” – CSV of payment_requests, one year or all years
 # ────────────────────────────────────────────────────────────────────────────────
 st.markdown("---")
-st.subheader("📥 Export Payment Requests (All Records)")
+st.subheader("📥 Export Payment Requests")
 
-all_requests = load_payment_requests(status_filter=None, start_date_filter=None)
-df_all = pd.DataFrame(all_requests)
+this_year = date.today().year
+export_years = list(range(this_year, (repository.first_request_year() or this_year) - 1, -1))
+export_year = st.selectbox("Requested in", ["All years"] + export_years)  # everything, as before
+if export_year == "All years":
+    all_requests = load_payment_requests(status_filter=None, start_date_filter=None)
+else:
+    all_requests = load_payment_requests(
+        status_filter=None,
+        start_date_filter=date(export_year, 1, 1),
+        end_date_filter=date(export_year + 1, 1, 1),
+    )
+
+
+def export_csv(rows: list[dict]) -> str:
+    # pandas is imported here, not at the top: the rest of the page works on
+    # the plain rows, so the form and list render before it loads
+    import pandas as pd
+
+    df_all = pd.DataFrame(rows)
+    # Both amounts normalized to the reporting currency at the requested date's rate
+    df_all[f"amount_{reporting_currency().lower()}_equivalent"] = normalize_frame(
+        df_all, "amount_usd", "amount_iqd", "requested_date"
+    ).round(2)
 
-if not df_all.empty:
-    # CSV buffer
     csv_buffer = io.StringIO()
     df_all.to_csv(csv_buffer, index=False)
+    return csv_buffer.getvalue()
+
+
+if all_requests:
     st.download_button(
         label="📄 Download as CSV",
-        data=csv_buffer.getvalue(),
-        file_name="payment_requests.csv",
+        data=export_csv(all_requests),
+        file_name=f"payment_requests_{str(export_year).replace(' ', '_').lower()}.csv",
         mime="text/csv",
+        on_click=record,
+        args=("download", "payment_request", None, f"Exported {len(all_requests)} requests as CSV"),
     )
 else:
     st.info("No payment requests available for export.")
@@ -359,111 +281,83 @@ else:
 st.markdown("---")
 st.subheader("🔍 Filter Payment Requests")
 status_filter = st.selectbox("Filter by Status", ["All", "submitted", "pending", "paid", "rejected"])
-start_date_filter = st.date_input("Show requests after", value=None)
-
-# Reload all, then apply Python‐side filtering
-requests_list = load_payment_requests(status_filter=None, start_date_filter=None)
-df = pd.DataFrame(requests_list)
-
-if not df.empty:
-    # Convert requested_date column to actual date
-    df["requested_date"] = pd.to_datetime(df["requested_date"]).dt.date
-
-    # Filter by status
-    if status_filter != "All":
-        df = df[df["status"] == status_filter]
+# Empty by default, i.e. every year; pick a date to limit the list (and the query)
+start_date_filter = st.date_input("Show requests from", value=None)
+ref_search = st.text_input("🔎 Find by reference number", placeholder="e.g. Tower A-ABC-12")
 
-    # Filter by start_date
-    if start_date_filter:
-        df = df[df["requested_date"] >= start_date_filter]
+requests_list = load_payment_requests(
+    status_filter=status_filter, start_date_filter=start_date_filter, ref_search=ref_search or None
+)
 
+if requests_list:
     st.markdown("### 📊 Summary by Status (Filtered)")
-    if df.empty:
-        st.info("No payment requests match the current filters.")
-    else:
-        # Count per status in a fixed order
-        status_counts = df["status"].value_counts().reindex(
-            ["submitted", "pending", "paid", "rejected"], fill_value=0
-        )
-        st.bar_chart(
-            status_counts.rename_axis("status").reset_index(name="count"),
-            x="status",
-            y="count",
-        )
+    # Count per status in a fixed order
+    statuses = ["submitted", "pending", "paid", "rejected"]
+    st.bar_chart(
+        {"status": statuses, "count": [sum(r["status"] == s for r in requests_list) for s in statuses]},
+        x="status",
+        y="count",
+    )
 else:
-    st.info("No payment requests found in the database.")
+    st.info("No payment requests match the current filters.")
 
 
 # ────────────────────────────────────────────────────────────────────────────────
 # 13) “New Payment Request” Expander (if can_add)
 # ────────────────────────────────────────────────────────────────────────────────
+CONTRACT_CHOICES = 50  # contracts offered in the picker at a time
+
 if can_add:
     with st.expander("➕ New Payment Request", expanded=False):
-        with st.form("add_payment_request_form"):
-            # Load Projects, Contractors, Contracts
-            projects = load_projects()
-            project_map = {f"{p['name']} ({p['location']})": p["id"] for p in projects}
-            project_labels = sorted(project_map.keys())
-
-            contractors = load_contractors()
-            contractor_map = {c["name"]: c["id"] for c in contractors}
-            contractor_labels = sorted(contractor_map.keys())
-
-            contracts = load_contracts()
-            contract_map = {
-                f"{c['contract_title']} ({c['project_name']}) — {c['contractor_name']}": c["id"]
-                for c in contracts
-            }
+        # The pickers sit outside the form so each change narrows the next
+        # one immediately; every lookup is served by the shared contract index.
+        ref = reference_store()
 
-            # Select Project (optional)
-            selected_project_label = st.selectbox(
-                "Select Project (optional)", ["All"] + project_labels
-            )
-            selected_project_id = None
-            if selected_project_label != "All":
-                selected_project_id = project_map[selected_project_label]
-
-            # Filter contracts by project (if chosen)
-            if selected_project_id:
-                filtered_contracts = [
-                    c for c in contracts if c["project_id"] == selected_project_id
-                ]
-            else:
-                filtered_contracts = contracts
-
-            # Build filtered map
-            contract_map_filtered = {
-                f"{c['contract_title']} ({c['project_name']}) — {c['contractor_name']}": c["id"]
-                for c in filtered_contracts
-            }
+        pc1, pc2 = st.columns(2)
+        selected_project_label = pc1.selectbox(
+            "Select Project (optional)", ("All",) + ref.projects.labels, key="new_pr_project"
+        )
+        selected_project_id = ref.projects.id_by_label.get(selected_project_label)
+        selected_contractor_label = pc2.selectbox(
+            "Select Contractor (optional)", ("All",) + ref.contractors.labels, key="new_pr_contractor"
+        )
+        selected_contractor_id = ref.contractors.id_by_label.get(selected_contractor_label)
 
-            # Select Contractor (optional)
-            selected_contractor_label = st.selectbox(
-                "Select Contractor (optional)", ["All"] + contractor_labels
-            )
-            selected_contractor_id = None
-            if selected_contractor_label != "All":
-                selected_contractor_id = contractor_map[selected_contractor_label]
-
-            # Further filter by contractor
-            if selected_contractor_id:
-                filtered_contracts = [
-                    c for c in filtered_contracts if c["contractor_id"] == selected_contractor_id
-                ]
-                contract_map_filtered = {
-                    f"{c['contract_title']} ({c['project_name']}) — {c['contractor_name']}": c["id"]
-                    for c in filtered_contracts
-                }
-
-            # Final “Select Contract” dropdown
-            final_contract_labels = sorted(contract_map_filtered.keys())
-            selected_contract_label = st.selectbox(
-                "Select Contract", [""] + final_contract_labels
+        contract_query = st.text_input(
+            "🔎 Search contracts",
+            key="new_pr_contract_query",
+            placeholder="Start of a word in the title, project or contractor",
+        )
+        contract_candidates, more_contracts = ref.search_contracts(
+            contract_query, selected_project_id, selected_contractor_id, limit=CONTRACT_CHOICES
+        )
+        selected_contract_label = st.selectbox(
+            "Select Contract", ("",) + contract_candidates, key="new_pr_contract"
+        )
+        if more_contracts:
+            st.caption(f"Showing the best {len(contract_candidates)} matches — keep typing to narrow.")
+        elif not contract_candidates:
+            st.caption("No contracts match.")
+        selected_contract_id = ref.contracts.id_by_label.get(selected_contract_label)
+
+        # Remaining balance of the selected contract
+        balance = load_contract_balance(selected_contract_id) if selected_contract_id else None
+        if balance:
+            parts = []
+            if balance["remaining_usd"] is not None:
+                parts.append(
+                    f"USD {balance['remaining_usd']:,.2f} of {balance['contract_value_usd']:,.2f}"
+                )
+            if balance["remaining_iqd"] is not None:
+                parts.append(
+                    f"IQD {balance['remaining_iqd']:,.0f} of {balance['contract_value_iqd']:,.0f}"
+                )
+            st.caption(
+                f"💼 Remaining balance: {' · '.join(parts) or 'no contract value set'} "
+                f"(paid so far: USD {balance['paid_usd']:,.2f} · IQD {balance['paid_iqd']:,.0f})"
             )
-            selected_contract_id = None
-            if selected_contract_label:
-                selected_contract_id = contract_map_filtered[selected_contract_label]
 
+        with st.form("add_payment_request_form"):
             # Amounts
             amount_usd = st.number_input("Amount (USD)", min_value=0.0, format="%.2f")
             amount_iqd = st.number_input("Amount (IQD)", min_value=0.0, format="%.2f")
@@ -494,13 +388,24 @@ if can_add:
                 type=["pdf", "jpg", "jpeg", "png", "docx"],
             )
 
+            allow_over_budget = st.checkbox("Allow a request above the remaining balance")
+
             if st.form_submit_button("Submit Request"):
+                over = over_budget(balance, amount_usd, amount_iqd) if balance else []
                 if not selected_contract_id:
                     st.warning("Please select a contract before submitting.")
+                elif paid_date and paid_date < requested_date:
+                    st.warning("The paid date cannot be before the requested date.")
+                elif over and not allow_over_budget:
+                    st.warning(
+                        "⚠️ This request exceeds the contract's remaining balance ("
+                        + "; ".join(over)
+                        + "). Tick “Allow a request above the remaining balance” to submit anyway."
+                    )
                 else:
                     try:
                         new_request_id = str(uuid.uuid4())
-                        insert_payment_request(
+                        ref_no = insert_payment_request(
                             request_id=new_request_id,
                             contract_id=selected_contract_id,
                             requested_by=user.get("id"),
@@ -513,8 +418,8 @@ if can_add:
                             comments=comments if comments else None,
                         )
 
-                        upload_attachments(new_request_id, attachments)
-                        st.success("✅ Payment request submitted successfully!")
+                        upload_attachments(new_request_id, requested_date, attachments)
+                        st.success(f"✅ Payment request **{ref_no}** submitted successfully!")
                         st.rerun()
                     except Exception as e:
                         st.error(f"❌ Failed to submit request: {e}")
@@ -527,13 +432,16 @@ if can_add:
 # ────────────────────────────────────────────────────────────────────────────────
 st.markdown("### 📄 Payment Request List")
 
-if df.empty:
+if not requests_list:
     st.info("No payment requests found for the selected filters.")
 else:
-    for idx, req in df.iterrows():
+    for req in requests_list:
+        # Archived requests (logic/archive.py) are shown read-only
+        archived = req["archived_at"] is not None
+        row_can_edit, row_can_delete = can_edit and not archived, can_delete and not archived
         header = (
-            f"{req['contract_title']} — {req['status'].capitalize()} — "
-            f"{pd.to_datetime(req['created_at']).strftime('%Y-%m-%d')}"
+            f"{'🗄️ ' if archived else ''}{req['ref_no'] or '—'} · {req['contract_title']} — "
+            f"{req['status'].capitalize()} — {req['created_at']:%Y-%m-%d}"
         )
         with st.expander(header, expanded=False):
             col1, col2 = st.columns([2, 1])
@@ -547,14 +455,10 @@ else:
                 st.markdown(f"**Contractor:** {req['contractor_name']}")
                 st.markdown(f"**Requested By:** {req['requested_by_name'] or '—'}")
                 st.markdown(
-                    f"**Requested Date:** {pd.to_datetime(req['requested_date']).strftime('%Y-%m-%d')}"
+                    f"**Requested Date:** {req['requested_date']:%Y-%m-%d}"
                 )
 
-                # Only attempt to format paid_date if it is not NaT/NaN
-                if not pd.isna(req["paid_date"]):
-                    paid_date_display = pd.to_datetime(req["paid_date"]).strftime("%Y-%m-%d")
-                else:
-                    paid_date_display = "—"
+                paid_date_display = f"{req['paid_date']:%Y-%m-%d}" if req["paid_date"] else "—"
 
                 st.markdown(f"**Paid Date:** {paid_date_display}")
                 st.markdown(f"**Amount (USD):** {req['amount_usd'] or '—'}")
@@ -564,7 +468,7 @@ else:
                 st.markdown(f"**Status:** {req['status'].capitalize()}")
 
                 # Inline Edit Form (only if can_edit)
-                if can_edit:
+                if row_can_edit:
                     with st.form(f"edit_form_{req['id']}"):
                         st.markdown("### ✏️ Edit This Request")
                         new_amount_usd = st.number_input(
@@ -588,16 +492,12 @@ else:
                         )
                         new_requested_date = st.date_input(
                             "Requested Date",
-                            value=pd.to_datetime(req["requested_date"]).date(),
+                            value=req["requested_date"],
                             key=f"req_date_edit_{req['id']}",
                         )
                         new_paid_date = st.date_input(
                             "Paid Date (optional)",
-                            value=(
-                                pd.to_datetime(req["paid_date"]).date()
-                                if not pd.isna(req["paid_date"])
-                                else None
-                            ),
+                            value=req["paid_date"],
                             key=f"paid_date_edit_{req['id']}",
                         )
                         new_status = st.selectbox(
@@ -615,34 +515,41 @@ else:
                         )
 
                         if st.form_submit_button("💾 Save Changes"):
-                            try:
-                                update_payment_request(
-                                    request_id=req["id"],
-                                    amount_usd=(
-                                        new_amount_usd if new_amount_usd > 0 else None
-                                    ),
-                                    amount_iqd=(
-                                        new_amount_iqd if new_amount_iqd > 0 else None
-                                    ),
-                                    note=new_note if new_note else None,
-                                    requested_date=new_requested_date,
-                                    paid_date=(
-                                        new_paid_date if new_paid_date else None
-                                    ),
-                                    status=new_status,
-                                    comments=new_comments if new_comments else None,
-                                )
-                                st.success("✅ Changes saved successfully.")
-                                st.rerun()
-                            except Exception as e:
-                                st.error(f"❌ Failed to save changes: {e}")
+                            if new_paid_date and new_paid_date < new_requested_date:
+                                st.warning("The paid date cannot be before the requested date.")
+                            else:
+                                try:
+                                    update_payment_request(
+                                        request_id=req["id"],
+                                        stored_date=req["requested_date"],
+                                        amount_usd=(
+                                            new_amount_usd if new_amount_usd > 0 else None
+                                        ),
+                                        amount_iqd=(
+                                            new_amount_iqd if new_amount_iqd > 0 else None
+                                        ),
+                                        note=new_note if new_note else None,
+                                        requested_date=new_requested_date,
+                                        paid_date=(
+                                            new_paid_date if new_paid_date else None
+                                        ),
+                                        status=new_status,
+                                        comments=new_comments if new_comments else None,
+                                    )
+                                    st.success("✅ Changes saved successfully.")
+                                    st.rerun()
+                                except Exception as e:
+                                    st.error(f"❌ Failed to save changes: {e}")
 
             # ──────────────────────────────────
             # Right column: Attachments + Actions
             # ──────────────────────────────────
             with col2:
                 st.markdown("### 📎 Attachments")
-                attachments = load_request_attachments(req["id"])
+                if archived:
+                    attachments = repository.archived_request_attachments(req["id"])
+                else:
+                    attachments = load_request_attachments(req["id"], req["requested_date"])
                 if not attachments:
                     st.info("No attachments.")
                 else:
@@ -655,38 +562,38 @@ else:
                             )
                             # Fetch content for download
                             try:
-                                conn_download = get_connection()
-                                cur_download = conn_download.cursor(cursor_factory=RealDictCursor)
-                                cur_download.execute(
-                                    "SELECT content FROM payment_request_attachments WHERE id = %s",
-                                    (att["id"],),
-                                )
-                                data_row = cur_download.fetchone()
-                                conn_download.close()
-                                if data_row:
-                                    file_bytes = data_row["content"].tobytes()
+                                if archived:
+                                    file_bytes = repository.archived_attachment_content(att["id"])
+                                else:
+                                    file_bytes = repository.request_attachment_content(
+                                        att["id"], req["requested_date"]
+                                    )
+                                if file_bytes is not None:
                                     st.download_button(
                                         label="Download",
                                         data=file_bytes,
                                         file_name=att["filename"],
                                         mime=att["mime_type"],
                                         key=f"download_{att['id']}",
+                                        on_click=record,
+                                        args=("download", "attachment", att["id"],
+                                              f"Downloaded {att['filename']} from {req['ref_no']}"),
                                     )
                             except Exception:
                                 pass
 
                         with a_col2:
-                            if can_delete:
+                            if row_can_delete:
                                 if st.button("🗑️", key=f"del_att_{att['id']}"):
                                     try:
-                                        delete_attachment(att["id"])
+                                        delete_attachment(att["id"], req["requested_date"])
                                         st.success("Attachment deleted.")
                                         st.rerun()
                                     except Exception as e:
                                         st.error(f"❌ Could not delete attachment: {e}")
 
                 # Upload more attachments if can_edit
-                if can_edit:
+                if row_can_edit:
                     st.markdown("➕ Add More Attachments")
                     more_files = st.file_uploader(
                         "Upload more files",
@@ -697,7 +604,7 @@ else:
                     if st.button("Upload", key=f"upload_more_{req['id']}"):
                         if more_files:
                             try:
-                                upload_attachments(req["id"], more_files)
+                                upload_attachments(req["id"], req["requested_date"], more_files)
                                 st.success("New attachments uploaded!")
                                 st.rerun()
                             except Exception as e:
@@ -708,44 +615,28 @@ else:
                 st.markdown("---")
 
                 # Mark as Paid (only if can_edit and status == 'submitted')
-                if can_edit and req["status"] == "submitted":
+                if row_can_edit and req["status"] == "submitted":
                     if st.button("✅ Mark as Paid", key=f"mark_paid_{req['id']}"):
                         try:
-                            conn3 = get_connection()
-                            cur3 = conn3.cursor()
-                            cur3.execute(
-                                """
-                                UPDATE payment_requests
-                                SET status = %s, paid_date = %s, updated_at = NOW()
-                                WHERE id = %s
-                                """,
-                                ("paid", datetime.utcnow(), req["id"]),
+                            repository.mark_payment_request_paid(
+                                req["id"], req["requested_date"], datetime.utcnow()
                             )
-                            conn3.commit()
-                            conn3.close()
+                            record("status_change", "payment_request", req["id"],
+                                   f"Marked {req['ref_no']} as paid", status=[req["status"], "paid"])
                             st.success("✅ Request marked as paid.")
                             st.rerun()
                         except Exception as e:
                             st.error(f"❌ Failed to mark as paid: {e}")
 
                 # Delete entire request (only if can_delete)
-                if can_delete:
+                if row_can_delete:
                     if st.button("🗑️ Delete Entire Request", key=f"del_req_{req['id']}"):
                         try:
-                            conn2 = get_connection()
-                            cur2 = conn2.cursor()
-                            # Delete attachments first
-                            cur2.execute(
-                                "DELETE FROM payment_request_attachments WHERE payment_request_id = %s",
-                                (req["id"],),
-                            )
-                            # Delete the request
-                            cur2.execute(
-                                "DELETE FROM payment_requests WHERE id = %s",
-                                (req["id"],),
-                            )
-                            conn2.commit()
-                            conn2.close()
+                            # Attachments are removed afterwards by a background cleanup
+                            deleted = repository.delete_payment_request(req["id"], req["requested_date"])
+                            request_cleanup()
+                            invalidate_months(*(deleted.values() if deleted else ()))
+                            record("delete", "payment_request", req["id"], f"Deleted {req['ref_no']}")
                             st.success("✅ Payment request deleted.")
                             st.rerun()
                         except Exception as e:
@@ -1,10 +1,11 @@
 import streamlit as st
-import psycopg2
-from psycopg2.extras import RealDictCursor
-import uuid
-import hashlib
-import pandas as pd
-from datetime import datetime
+from logic.reference import reference_store
+from logic.user_admin import (
+    ALL_ROLES, PROJECT_ROLES, ProvisioningConflict, count_users, create_user, delete_user,
+    load_user_page, load_users_export, provision_users, provisioning_template,
+    read_provisioning_csv, reset_password, update_user, validate_provisioning,
+)
+from utils.audit import record
 
 st.set_page_config(page_title="👥 User Management", layout="wide")
 st.title("👥 User Management")
@@ -16,42 +17,9 @@ if role not in ["Superadmin", "HQ Admin"]:
     st.error("⛔ You do not have permission to view this page.")
     st.stop()
 
-# === DB Connection ===
-def get_connection():
-    return psycopg2.connect(st.secrets["db_url"], cursor_factory=RealDictCursor)
-
-# === Load Projects (always fresh) ===
-def load_projects():
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("SELECT id, name FROM projects ORDER BY name")
-    rows = cur.fetchall()
-    conn.close()
-    return rows
-
-# === Load Users as DataFrame ===
-@st.cache_data
-def load_users_df():
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        SELECT u.id, u.username, u.full_name, u.role,
-               COALESCE(string_agg(p.name, ', '), '') AS projects,
-               u.created_at
-        FROM users u
-        LEFT JOIN user_projects up ON u.id = up.user_id
-        LEFT JOIN projects p ON up.project_id = p.id
-        GROUP BY u.id
-        ORDER BY u.username
-        """
-    )
-    rows = cur.fetchall()
-    conn.close()
-    return pd.DataFrame(rows, columns=["id", "username", "full_name", "role", "projects", "created_at"])
-
-# === Role List ===
-ALL_ROLES = ["Superadmin", "HQ Admin", "HQ Accountant", "Site Accountant", "Site PM"]
+# === Reference data (process-wide, version-keyed) ===
+ref = reference_store()
+project_map = dict(ref.project_names.id_by_label)
 
 # === Add New User ===
 st.subheader("➕ Add New User")
@@ -61,10 +29,8 @@ with st.form("add_user_form"):
     password = st.text_input("Password", type="password")
     new_role = st.selectbox("Role", ALL_ROLES, index=ALL_ROLES.index("Site PM"))
 
-    projects = load_projects()
-    project_map = {p['name']: p['id'] for p in projects}
     assign_projects = []
-    if new_role in ["Site PM", "Site Accountant"]:
+    if new_role in PROJECT_ROLES:
         assign_projects = st.multiselect("Assign Projects", list(project_map.keys()))
 
     if st.form_submit_button("Create User"):
@@ -72,114 +38,199 @@ with st.form("add_user_form"):
             st.warning("Username and password are required.")
         else:
             try:
-                hashed_password = hashlib.sha256(password.encode()).hexdigest()
-                user_id = str(uuid.uuid4())
-                conn = get_connection()
-                cur = conn.cursor()
-                # Insert user
-                cur.execute(
-                    """
-                    INSERT INTO users (id, username, full_name, hashed_password, role, created_at)
-                    VALUES (%s, %s, %s, %s, %s, %s)
-                    """,
-                    (user_id, username, full_name, hashed_password, new_role, datetime.utcnow())
+                user_id = create_user(
+                    username, full_name, password, new_role, [project_map[p] for p in assign_projects]
                 )
-                # Assign projects
-                for proj in assign_projects:
-                    cur.execute(
-                        "INSERT INTO user_projects (user_id, project_id) VALUES (%s, %s)",
-                        (user_id, project_map[proj])
-                    )
-                conn.commit()
-                conn.close()
+                record("insert", "user", user_id, f"Created user {username}",
+                       role=new_role, projects=assign_projects)
                 st.success("✅ User created successfully.")
                 st.rerun()
             except Exception as e:
                 st.error(f"❌ Failed to create user: {e}")
 
+# === Bulk Provisioning (CSV) ===
+UPLOAD_KEY = "provision_upload"
+with st.expander("📥 Bulk provisioning from CSV"):
+    st.caption(
+        "Columns: username, full_name, role, password, projects "
+        "(project names separated by ';', for Site PM and Site Accountant only)."
+    )
+    st.download_button("📄 Download template", provisioning_template(),
+                       file_name="users_template.csv", mime="text/csv")
+    st.session_state.setdefault(UPLOAD_KEY, 0)
+    upload = st.file_uploader("Users CSV", type=["csv"], key=f"{UPLOAD_KEY}_{st.session_state[UPLOAD_KEY]}")
+    if upload is not None:
+        try:
+            checked = validate_provisioning(read_provisioning_csv(upload))
+        except Exception as e:
+            st.error(f"❌ Could not read the file: {e}")
+            checked = None
+        if checked is not None:
+            valid = checked[checked["problems"] == ""]
+            report = checked.drop(columns=["password", "project_ids"]).assign(
+                status=lambda d: d["problems"].map(lambda p: "❌ " + p if p else "✅ ready")
+            ).drop(columns=["problems"])
+            st.dataframe(report.rename_axis("line"), use_container_width=True)
+            st.caption(f"{len(valid)} of {len(checked)} rows can be created.")
+            if st.button(f"Create {len(valid)} users", disabled=valid.empty, key="provision_submit"):
+                try:
+                    created = provision_users(valid)
+                    for (user_id, name), r in zip(created, valid.itertuples()):
+                        record("insert", "user", user_id, f"Created user {name} (bulk import)",
+                               role=r.role, projects=[p.strip() for p in r.projects.split(";") if p.strip()])
+                    st.session_state[UPLOAD_KEY] += 1
+                    st.success(f"✅ Created {len(created)} users.")
+                    st.rerun()
+                except ProvisioningConflict as e:
+                    st.error(f"❌ Nothing was created. {e}")
+                except Exception as e:
+                    st.error(f"❌ Failed to create users: {e}")
+
 # === Export Users ===
 st.markdown("---")
 st.subheader("📤 Export Users")
-try:
-    df = load_users_df()
-    csv_data = df.to_csv(index=False)
-    st.download_button(
-        label="📥 Download Users as CSV",
-        data=csv_data,
-        file_name="users_export.csv",
-        mime="text/csv"
-    )
-except Exception as e:
-    st.error(f"❌ Failed to export users: {e}")
+if st.toggle("Prepare CSV export", key="prepare_user_export"):
+    try:
+        df = load_users_export()
+        st.download_button(
+            label="📥 Download Users as CSV",
+            data=df.to_csv(index=False),
+            file_name="users_export.csv",
+            mime="text/csv",
+            on_click=record,
+            args=("download", "user", None, f"Exported {len(df)} users as CSV"),
+        )
+    except Exception as e:
+        st.error(f"❌ Failed to export users: {e}")
 
-# === List & Inline Edit Users ===
+# === User Directory ===
 st.markdown("---")
-st.subheader("📋 All Users")
+st.subheader("📋 Users")
 
-projects = load_projects()
-project_map = {p['name']: p['id'] for p in projects}
+CURSOR_KEY = "user_dir_cursors"
+FILTER_KEY = "user_dir_filters"
 
+f1, f2, f3, f4 = st.columns([3, 2, 2, 1])
+search = f1.text_input("Search", placeholder="Username or full name starts with…").strip()
+role_filter = f2.selectbox("Role", ["All"] + ALL_ROLES)
+project_filter = f3.selectbox("Project", ["All"] + list(ref.project_names.labels))
+page_size = f4.selectbox("Per page", [25, 50, 100], index=1)
+
+filters = {
+    "search": search,
+    "role": None if role_filter == "All" else role_filter,
+    "project_id": project_map.get(project_filter),
+}
+
+# A change of filters starts again from the first page
+if st.session_state.get(FILTER_KEY) != (filters, page_size):
+    st.session_state[FILTER_KEY] = (filters, page_size)
+    st.session_state[CURSOR_KEY] = [None]
+
+cursors = st.session_state[CURSOR_KEY]
 try:
-    df_list = load_users_df()
-    for row in df_list.itertuples(index=False):
-        with st.expander(f"👤 {row.username} ({row.role})"):
-            col1, col2 = st.columns([3, 1])
-            with col1:
-                with st.form(f"edit_user_{row.id}"):
-                    edit_full_name = st.text_input("Full Name", row.full_name)
-                    edit_role = st.selectbox("Role", ALL_ROLES, index=ALL_ROLES.index(row.role))
-                    edit_projects = st.multiselect(
-                        "Projects", list(project_map.keys()),
-                        default=row.projects.split(', ') if row.projects else []
-                    )
-                    if st.form_submit_button("💾 Save Changes"):
-                        try:
-                            conn2 = get_connection()
-                            cur2 = conn2.cursor()
-                            cur2.execute(
-                                "UPDATE users SET full_name = %s, role = %s WHERE id = %s",
-                                (edit_full_name, edit_role, row.id)
-                            )
-                            cur2.execute("DELETE FROM user_projects WHERE user_id = %s", (row.id,))
-                            for proj in edit_projects:
-                                cur2.execute(
-                                    "INSERT INTO user_projects (user_id, project_id) VALUES (%s, %s)",
-                                    (row.id, project_map[proj])
-                                )
-                            conn2.commit()
-                            conn2.close()
-                            st.success("✅ User updated.")
-                            st.rerun()
-                        except Exception as e:
-                            st.error(f"❌ Failed to update user: {e}")
-            with col2:
-                new_pw = st.text_input("Reset Password", type="password", key=f"pw_{row.id}")
-                if st.button("🔑 Reset", key=f"reset_{row.id}"):
-                    if new_pw:
-                        try:
-                            new_hash = hashlib.sha256(new_pw.encode()).hexdigest()
-                            conn3 = get_connection()
-                            cur3 = conn3.cursor()
-                            cur3.execute("UPDATE users SET hashed_password = %s WHERE id = %s", (new_hash, row.id))
-                            conn3.commit()
-                            conn3.close()
-                            st.success("✅ Password updated.")
-                            st.rerun()
-                        except Exception as e:
-                            st.error(f"❌ Failed to update password: {e}")
-                    else:
-                        st.warning("Enter a new password to reset.")
-                if role == "Superadmin" and st.button("🗑️ Delete", key=f"del_{row.id}"):
+    users, has_next = load_user_page(**filters, after=cursors[-1], limit=page_size)
+    total = count_users(**filters)
+except Exception as e:
+    st.error(f"❌ Failed to load users: {e}")
+    st.stop()
+
+table_key = f"user_table_{len(cursors)}"
+
+
+def user_table(users: list[dict]):
+    import pandas as pd
+
+    return pd.DataFrame([
+        {
+            "Username": u["username"],
+            "Full Name": u["full_name"],
+            "Role": u["role"],
+            "Active": u["is_active"],
+            "Projects": ", ".join(sorted(
+                ref.project_names.label_by_id.get(p, "—") for p in u["project_ids"]
+            )),
+            "Created": u["created_at"],
+        }
+        for u in users
+    ])
+
+
+if users:
+    selection = st.dataframe(
+        user_table(users), use_container_width=True, hide_index=True, key=table_key,
+        on_select="rerun", selection_mode="single-row",
+    )
+else:
+    selection = None
+    st.info("No users match these filters.")
+
+p1, p2, p3 = st.columns([1, 1, 4])
+if p1.button("⬅️ Previous", disabled=len(cursors) == 1):
+    cursors.pop()
+    st.rerun()
+if p2.button("Next ➡️", disabled=not has_next):
+    cursors.append(users[-1]["username"])
+    st.rerun()
+first = (len(cursors) - 1) * page_size
+p3.caption(f"Users {first + 1 if users else 0}–{first + len(users)} of {total} · select a row to edit")
+
+# === Selected user: built only for the row that is open ===
+rows = selection["selection"]["rows"] if selection else []
+if rows and rows[0] < len(users):
+    row = users[rows[0]]
+    row_projects = [ref.project_names.label_by_id[p] for p in row["project_ids"]
+                    if p in ref.project_names.label_by_id]
+    st.markdown(f"#### 👤 {row['username']} ({row['role']})")
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        with st.form(f"edit_user_{row['id']}"):
+            edit_full_name = st.text_input("Full Name", row["full_name"] or "")
+            edit_role = st.selectbox("Role", ALL_ROLES, index=ALL_ROLES.index(row["role"]))
+            edit_projects = st.multiselect(
+                "Projects", list(project_map.keys()), default=row_projects
+            )
+            if st.form_submit_button("💾 Save Changes"):
+                unchanged = (
+                    edit_full_name == (row["full_name"] or "")
+                    and edit_role == row["role"]
+                    and sorted(edit_projects) == sorted(row_projects)
+                )
+                if unchanged:
+                    st.info("No changes to save.")
+                else:
                     try:
-                        conn4 = get_connection()
-                        cur4 = conn4.cursor()
-                        cur4.execute("DELETE FROM user_projects WHERE user_id = %s", (row.id,))
-                        cur4.execute("DELETE FROM users WHERE id = %s", (row.id,))
-                        conn4.commit()
-                        conn4.close()
-                        st.success("✅ User deleted.")
+                        diff = update_user(
+                            row["id"], edit_full_name, edit_role, [project_map[p] for p in edit_projects]
+                        )
+                        if diff:
+                            for key in ("projects_added", "projects_removed"):
+                                if key in diff:
+                                    diff[key] = [ref.project_names.label_by_id.get(p, p) for p in diff[key]]
+                            record("update", "user", row["id"], f"Updated user {row['username']}", **diff)
+                        st.success("✅ User updated.")
                         st.rerun()
                     except Exception as e:
-                        st.error(f"❌ Failed to delete user: {e}")
-except Exception as e:
-    st.error(f"❌ Failed to load users: {e}")
+                        st.error(f"❌ Failed to update user: {e}")
+    with col2:
+        new_pw = st.text_input("Reset Password", type="password", key=f"pw_{row['id']}")
+        if st.button("🔑 Reset", key=f"reset_{row['id']}"):
+            if new_pw:
+                try:
+                    reset_password(row["id"], new_pw)
+                    record("update", "user", row["id"], f"Reset password of {row['username']}")
+                    st.success("✅ Password updated.")
+                    st.rerun()
+                except Exception as e:
+                    st.error(f"❌ Failed to update password: {e}")
+            else:
+                st.warning("Enter a new password to reset.")
+        if role == "Superadmin" and st.button("🗑️ Delete", key=f"del_{row['id']}"):
+            try:
+                delete_user(row["id"])
+                record("delete", "user", row["id"], f"Deleted user {row['username']}")
+                st.session_state.pop(table_key, None)
+                st.success("✅ User deleted.")
+                st.rerun()
+            except Exception as e:
+                st.error(f"❌ Failed to delete user: {e}")
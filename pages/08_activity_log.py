@@ -0,0 +1,132 @@
+import streamlit as st
+from datetime import date, datetime, time, timedelta
+from utils.audit import get_audit_writer
+from utils.db import read_connection
+
+st.set_page_config(page_title="🕓 Activity Log", layout="wide")
+st.title("🕓 Activity Log")
+
+# === Permissions ===
+user = st.session_state.get("user", {})
+role = user.get("role", "")
+if role not in ["Superadmin", "HQ Admin"]:
+    st.error("⛔ You do not have permission to view this page.")
+    st.stop()
+
+ACTIONS = ["insert", "update", "delete", "status_change", "login", "login_failed", "download"]
+ENTITIES = ["project", "contractor", "contract", "payment_request", "attachment", "user", "session", "report"]
+CURSOR_KEY = "activity_cursors"
+FILTER_KEY = "activity_filters"
+
+
+# === Users for the filter ===
+@st.cache_data(ttl=300)
+def load_usernames():
+    with read_connection() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT id, username FROM users ORDER BY username")
+        return cur.fetchall()
+
+
+# === One page of events, newest first ===
+# Every filter maps onto an index on activity_log, and paging continues from
+# the last (occurred_at, id) seen instead of using OFFSET, so any page costs
+# the same as the first.
+def load_events(filters: dict, after: tuple | None, limit: int) -> list[dict]:
+    where = ["occurred_at >= %(start)s", "occurred_at < %(end)s"]
+    if filters["user_id"]:
+        where.append("user_id = %(user_id)s")
+    if filters["actions"]:
+        where.append("action = ANY(%(actions)s)")
+    if filters["entity"]:
+        where.append("entity = %(entity)s")
+        if filters["entity_id"]:
+            where.append("entity_id = %(entity_id)s")
+    if after:
+        where.append("(occurred_at, id) < (%(after_at)s, %(after_id)s)")
+    params = {
+        **filters,
+        "start": datetime.combine(filters["start"], time.min),
+        "end": datetime.combine(filters["end"] + timedelta(days=1), time.min),
+        "after_at": after[0] if after else None,
+        "after_id": after[1] if after else None,
+        "limit": limit + 1,
+    }
+    with read_connection() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            f"""
+            SELECT id, occurred_at, username, action, entity, entity_id, summary, details
+            FROM activity_log
+            WHERE {' AND '.join(where)}
+            ORDER BY occurred_at DESC, id DESC
+            LIMIT %(limit)s
+            """,
+            params,
+        )
+        return cur.fetchall()
+
+
+# === Filters ===
+users = load_usernames()
+user_labels = {u["username"]: str(u["id"]) for u in users}
+
+f1, f2, f3 = st.columns(3)
+period = f1.date_input("Period", value=(date.today() - timedelta(days=30), date.today()))
+selected_user = f2.selectbox("User", ["All"] + list(user_labels))
+page_size = f3.selectbox("Rows per page", [25, 50, 100], index=1)
+
+f4, f5, f6 = st.columns(3)
+actions = f4.multiselect("Action", ACTIONS)
+entity = f5.selectbox("Entity", ["All"] + ENTITIES)
+entity_id = f6.text_input("Entity ID", disabled=entity == "All").strip()
+
+start, end = (period if len(period) == 2 else (period[0], period[0])) if period else (date.today(),) * 2
+filters = {
+    "start": start,
+    "end": end,
+    "user_id": user_labels.get(selected_user),
+    "actions": actions,
+    "entity": None if entity == "All" else entity,
+    "entity_id": entity_id or None,
+}
+
+# A change of filters starts again from the newest page
+if st.session_state.get(FILTER_KEY) != (filters, page_size):
+    st.session_state[FILTER_KEY] = (filters, page_size)
+    st.session_state[CURSOR_KEY] = [None]
+
+# Events queued in this process are written before reading
+get_audit_writer().flush()
+
+cursors = st.session_state[CURSOR_KEY]
+rows = load_events(filters, cursors[-1], page_size)
+has_next = len(rows) > page_size
+rows = rows[:page_size]
+
+# === Results ===
+def events_table(rows: list[dict]):
+    import pandas as pd  # not needed for an empty page
+
+    df = pd.DataFrame(rows)
+    df["occurred_at"] = pd.to_datetime(df["occurred_at"]).dt.strftime("%Y-%m-%d %H:%M:%S")
+    df = df.rename(columns={
+        "occurred_at": "When", "username": "User", "action": "Action", "entity": "Entity",
+        "entity_id": "Entity ID", "summary": "Summary", "details": "Details",
+    })
+    st.dataframe(df.drop(columns=["id"]), use_container_width=True, hide_index=True)
+
+
+if rows:
+    events_table(rows)
+else:
+    st.info("No activity matches these filters.")
+
+p1, p2, p3 = st.columns([1, 1, 4])
+if p1.button("⬅️ Newer", disabled=len(cursors) == 1):
+    cursors.pop()
+    st.rerun()
+if p2.button("Older ➡️", disabled=not has_next):
+    cursors.append((rows[-1]["occurred_at"], rows[-1]["id"]))
+    st.rerun()
+p3.caption(f"Page {len(cursors)}")
@@ -0,0 +1,96 @@
+import streamlit as st
+from datetime import date
+from logic.reference import load_data_version, reference_store
+from logic.reports import FORMATS, request_report
+from logic import repository
+from utils.audit import record
+
+st.set_page_config(page_title="📑 Statements", layout="wide")
+st.title("📑 Statements")
+
+# === Permissions ===
+user = st.session_state.get("user", {})
+role = user.get("role", "")
+if role not in ["Superadmin", "HQ Admin", "HQ Accountant"]:
+    st.error("⛔ You do not have permission to view this page.")
+    st.stop()
+
+BUILDING_KEY = "reports_building"
+STATUS_ICONS = {"queued": "⏳ Queued", "running": "⚙️ Building", "done": "✅ Ready", "failed": "❌ Failed"}
+
+# === New statement ===
+# Statements are built in the background (logic/reports.py); asking for one
+# that already exists for the current data returns the stored file.
+ref = reference_store()
+with st.form("new_report"):
+    c1, c2, c3 = st.columns([1, 2, 1])
+    kind = c1.radio("Statement for", ["project", "contractor"], format_func=str.title, horizontal=True)
+    choices = ref.projects if kind == "project" else ref.contractors
+    entity = c2.selectbox("Project / contractor", choices.labels)
+    fmt = c3.radio("Format", list(FORMATS), format_func=str.upper, horizontal=True)
+    today = date.today()
+    period = st.date_input("Period", value=(date(today.year, 1, 1), today))
+    if st.form_submit_button("📑 Generate"):
+        if not entity or not isinstance(period, tuple) or len(period) != 2:
+            st.error("Choose a project or contractor and both ends of the period.")
+        else:
+            entity_id = choices.id_by_label[entity]
+            report_id = request_report(kind, entity_id, period[0], period[1], fmt, user.get("id"))
+            record("insert", "report", report_id, f"Requested {kind} statement for {entity}",
+                   period_start=period[0], period_end=period[1], format=fmt)
+            st.session_state[BUILDING_KEY] = True
+            st.success("Statement queued; it appears below when ready.")
+
+
+# === Recent statements ===
+# Re-read every few seconds while any statement is still being built; once
+# none is, one full rerun turns the polling off again.
+def recent_statements():
+    reports = repository.recent_reports()
+    building = any(r["status"] in ("queued", "running") for r in reports)
+    if building != st.session_state.get(BUILDING_KEY, False):
+        st.session_state[BUILDING_KEY] = building
+        st.rerun()
+    if not reports:
+        st.info("No statements yet.")
+        return
+
+    import pandas as pd  # only once there are statements to list
+
+    versions = (load_data_version("reference"), load_data_version("payment_requests"))
+    df = pd.DataFrame(reports)
+    df["status"] = df["status"].map(STATUS_ICONS)
+    df["data"] = [
+        "current" if (r["reference_version"], r["requests_version"]) == versions else "older data"
+        for r in reports
+    ]
+    df["period"] = df["period_start"].astype(str) + " → " + df["period_end"].astype(str)
+    st.dataframe(
+        df[["entity_name", "kind", "period", "format", "status", "data", "requested_by_name",
+            "requested_at", "finished_at", "error"]],
+        hide_index=True, use_container_width=True,
+        column_config={
+            "entity_name": "Project / contractor", "kind": "Statement", "period": "Period",
+            "format": "Format", "status": "Status", "data": "Built from",
+            "requested_by_name": "Requested by", "requested_at": "Requested", "finished_at": "Finished",
+            "error": "Error",
+        },
+    )
+
+    ready = {
+        f"{r['file_name']} ({r['size'] / 1024:.0f} KB)": r["id"] for r in reports if r["status"] == "done"
+    }
+    if ready:
+        c1, c2 = st.columns([3, 1])
+        selected = c1.selectbox("Download", list(ready), key="report_download")
+        report = repository.report_content(ready[selected])
+        if report:
+            c2.download_button(
+                "⬇️ Download", data=report["content"], file_name=report["file_name"],
+                mime=FORMATS[report["format"]], key="report_download_button",
+                on_click=record, args=("download", "report", ready[selected],
+                                       f"Downloaded {report['file_name']}"),
+            )
+
+
+st.fragment(recent_statements, run_every=3 if st.session_state.get(BUILDING_KEY) else None)()
@@ -0,0 +1,63 @@
+"""Fixtures for the tests that need Postgres.
+
+They run against a scratch database created next to the one PAYTRACK_DB_URL
+points to and migrated from scratch; tests that need a database are skipped
+when the variable is not set.
+
+    PAYTRACK_DB_URL=postgresql://localhost/postgres python -m pytest
+"""
+
+import os
+import sys
+from pathlib import Path
+
+import psycopg2
+import pytest
+import streamlit
+from psycopg2.extensions import make_dsn
+from psycopg2.extras import RealDictCursor
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from utils.migrations import upgrade  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def dsn():
+    server = os.environ.get("PAYTRACK_DB_URL")
+    if not server:
+        pytest.skip("PAYTRACK_DB_URL is not set")
+    name = f"paytrack_test_{os.getpid()}"
+    admin = psycopg2.connect(server)
+    admin.autocommit = True
+    admin.cursor().execute(f"CREATE DATABASE {name} TEMPLATE template0")
+    try:
+        test_dsn = make_dsn(server, dbname=name)
+        upgrade(test_dsn)
+        yield test_dsn
+    finally:
+        admin.cursor().execute(f"DROP DATABASE IF EXISTS {name} WITH (FORCE)")
+        admin.close()
+
+
+@pytest.fixture
+def secrets(monkeypatch, dsn):
+    """st.secrets for code that reads it outside a Streamlit run."""
+    values = {"db_url": dsn, "db_prepared_statements": False}
+    monkeypatch.setattr(streamlit, "secrets", values)
+    return values
+
+
+@pytest.fixture
+def conn(dsn):
+    """A connection like the workers' (RealDictCursor, not autocommit), with
+    the tables the tests write to emptied."""
+    conn = psycopg2.connect(dsn, cursor_factory=RealDictCursor)
+    conn.cursor().execute(
+        "TRUNCATE jobs, users, user_projects, projects, contractors, contracts, contract_attachments,"
+        " contract_ledger, payment_requests, payment_request_attachments,"
+        " archive.payment_requests, archive.payment_request_attachments RESTART IDENTITY"
+    )
+    conn.commit()
+    yield conn
+    conn.close()
@@ -0,0 +1,62 @@
+from datetime import date
+
+import pytest
+import streamlit
+
+from logic import analytics
+from logic.analytics import load_closed_months
+
+JAN, FEB, MAR, APR = (date(2025, m, 1) for m in (1, 2, 3, 4))
+
+
+# ─── Closed-month store ────────────────────────────────────────────────────────
+@pytest.fixture
+def queries(monkeypatch):
+    """Month stamps the test sets, and the cash flow ranges queried."""
+    stamps, queried = {}, []
+
+    def query_cashflow(start, end, project_id=None):
+        queried.append((start, end))
+        return [{"month": m, "project_id": project_id, "primary": analytics.reads_from_primary()}
+                for m in (JAN, FEB, MAR) if start <= m < end]
+
+    analytics._closed_month_store.clear()
+    monkeypatch.setattr(streamlit, "secrets", {"closed_months_max_entries": 4})
+    monkeypatch.setattr(analytics, "month_stamp", lambda m: stamps.get(m, 0))
+    monkeypatch.setattr(analytics, "reads_from_primary", lambda: False)
+    monkeypatch.setattr(analytics, "query_cashflow", query_cashflow)
+    yield stamps, queried
+    analytics._closed_month_store.clear()
+
+
+def test_only_changed_months_are_queried_again(queries):
+    stamps, queried = queries
+    rows = load_closed_months(JAN, APR)
+
+    stamps[FEB] = 1
+    assert load_closed_months(JAN, APR) == rows
+    assert queried == [(JAN, APR), (FEB, MAR)]
+
+
+def test_store_keeps_the_most_recently_used_entries(queries):
+    stamps, queried = queries
+    load_closed_months(JAN, APR, "a")
+    load_closed_months(JAN, FEB, "b")
+    load_closed_months(JAN, APR, "a")  # still there; "b" is now the oldest
+    load_closed_months(JAN, FEB, "c")
+    queried.clear()
+
+    load_closed_months(JAN, APR, "a")
+    load_closed_months(JAN, FEB, "b")
+
+    assert queried == [(JAN, FEB)]
+
+
+def test_primary_readers_get_their_own_entries(queries, monkeypatch):
+    stamps, queried = queries
+    load_closed_months(JAN, FEB)
+
+    monkeypatch.setattr(analytics, "reads_from_primary", lambda: True)
+
+    assert [r["primary"] for r in load_closed_months(JAN, FEB)] == [True]
+    assert queried == [(JAN, FEB), (JAN, FEB)]
@@ -0,0 +1,60 @@
+import uuid
+from datetime import datetime
+
+from logic.archive import archive_closed_requests
+
+REQUESTED = datetime(2020, 3, 1)
+
+
+def add_request(cur, project_status: str) -> str:
+    project_id, contract_id, request_id = (str(uuid.uuid4()) for _ in range(3))
+    cur.execute("INSERT INTO projects (id, name, status) VALUES (%s, 'P', %s)", (project_id, project_status))
+    cur.execute(
+        "INSERT INTO contracts (id, title, project_id, contractor_id) VALUES (%s, 'C', %s, %s)",
+        (contract_id, project_id, str(uuid.uuid4())),
+    )
+    cur.execute(
+        """
+        INSERT INTO payment_requests (id, contract_id, requested_date, paid_date, amount_usd,
+                                      amount_iqd, note, status, ref_no)
+        VALUES (%s, %s, %s, %s, 10.5, 13000, 'note', 'paid', 'P-1')
+        """,
+        (request_id, contract_id, REQUESTED, datetime(2020, 4, 1)),
+    )
+    cur.execute(
+        """
+        INSERT INTO payment_request_attachments (id, payment_request_id, requested_date, filename,
+                                                 content, mime_type)
+        VALUES (%s, %s, %s, 'invoice.pdf', 'abc', 'application/pdf')
+        """,
+        (str(uuid.uuid4()), request_id, REQUESTED),
+    )
+    return request_id
+
+
+HISTORY = """
+    SELECT id::text, status, amount_usd, amount_iqd, note, ref_no, requested_date, archived_at
+    FROM payment_request_history WHERE id = %s
+"""
+
+
+def test_archived_request_keeps_its_columns(conn):
+    cur = conn.cursor()
+    archived, kept = add_request(cur, "Completed"), add_request(cur, "Ongoing")
+    conn.commit()
+    cur.execute(HISTORY, (archived,))
+    before = cur.fetchone()
+
+    assert archive_closed_requests(conn) == (1, 1)
+
+    cur.execute(HISTORY, (archived,))
+    after = cur.fetchone()
+    assert after["archived_at"] is not None
+    assert {**after, "archived_at": None} == before
+    cur.execute(HISTORY, (kept,))
+    assert cur.fetchone()["archived_at"] is None
+    cur.execute(
+        "SELECT filename, convert_from(content, 'UTF8') AS content, mime_type FROM archive.payment_request_attachments"
+        " WHERE payment_request_id = %s", (archived,)
+    )
+    assert cur.fetchone() == {"filename": "invoice.pdf", "content": "abc", "mime_type": "application/pdf"}
@@ -0,0 +1,92 @@
+import uuid
+
+import pytest
+
+from logic.cleanup import ORPHANS, _batch_sql, delete_orphans, format_report
+
+STEPS = {o.table: o for o in ORPHANS}
+
+
+def add_contract(cur, project_id: str, file_data: bytes | None = None) -> str:
+    contract_id = str(uuid.uuid4())
+    cur.execute(
+        "INSERT INTO contracts (id, title, project_id, contractor_id) VALUES (%s, 'c', %s, %s)",
+        (contract_id, project_id, str(uuid.uuid4())),
+    )
+    if file_data is not None:
+        cur.execute(
+            "INSERT INTO contract_attachments (id, contract_id, file_name, file_data) VALUES (%s, %s, 'f', %s)",
+            (str(uuid.uuid4()), contract_id, file_data),
+        )
+    return contract_id
+
+
+# ─── Batch statements ──────────────────────────────────────────────────────────
+@pytest.mark.parametrize("orphans", ORPHANS, ids=lambda o: o.table)
+def test_batch_statement_runs_on_every_table(conn, orphans):
+    cur = conn.cursor()
+    cur.execute(_batch_sql(orphans), {"limit": 10})
+
+    assert cur.fetchone() == {"rows": 0, "bytes": 0}
+    conn.rollback()
+
+
+def test_batch_deletes_at_most_limit_orphans(conn):
+    cur = conn.cursor()
+    project_id = str(uuid.uuid4())
+    cur.execute("INSERT INTO projects (id, name) VALUES (%s, 'Kept')", (project_id,))
+    kept = add_contract(cur, project_id)
+    for _ in range(3):
+        add_contract(cur, str(uuid.uuid4()))
+    conn.commit()
+
+    cur.execute(_batch_sql(STEPS["contracts"]), {"limit": 2})
+    assert cur.fetchone()["rows"] == 2
+    cur.execute(_batch_sql(STEPS["contracts"]), {"limit": 2})
+    assert cur.fetchone()["rows"] == 1
+    cur.execute("SELECT id::text FROM contracts")
+    assert [r["id"] for r in cur.fetchall()] == [kept]
+    conn.rollback()
+
+
+def test_batch_reports_payload_bytes(conn):
+    cur = conn.cursor()
+    add_contract(cur, str(uuid.uuid4()), file_data=b"x" * 4000)
+    cur.execute("DELETE FROM contracts")
+
+    cur.execute(_batch_sql(STEPS["contract_attachments"]), {"limit": 10})
+
+    row = cur.fetchone()
+    assert row["rows"] == 1 and row["bytes"] > 0
+    conn.rollback()
+
+
+def test_cascade_runs_top_down(conn):
+    cur = conn.cursor()
+    add_contract(cur, str(uuid.uuid4()), file_data=b"x")
+    conn.commit()
+
+    deleted = delete_orphans(conn, batch_size=1)
+
+    assert {t: rows for t, (rows, _) in deleted.items()} == {"contracts": 1, "contract_attachments": 1}
+
+
+# ─── Report ────────────────────────────────────────────────────────────────────
+def test_report_lists_tables_with_orphans():
+    report = format_report({
+        "contracts": (2, 0),
+        "payment_requests": (0, 0),
+        "contract_attachments": (3, 3 * 1024 * 1024),
+        "reports": (1, 512),
+    })
+
+    assert report.splitlines() == [
+        "contracts: 2 rows",
+        "contract_attachments: 3 rows, 3.0 MB",
+        "reports: 1 rows, 512 B",
+        "file payload: 3.0 MB",
+    ]
+
+
+def test_report_without_orphans():
+    assert format_report({"contracts": (0, 0)}) == "no orphans"
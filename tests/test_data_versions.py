@@ -0,0 +1,71 @@
+import psycopg2
+import pytest
+
+
+def version(conn, name: str = "reference") -> int:
+    cur = conn.cursor()
+    cur.execute("SELECT version FROM data_versions WHERE name = %s", (name,))
+    value = cur.fetchone()["version"]
+    conn.commit()
+    return value
+
+
+def log_rows(conn, name: str = "reference") -> int:
+    cur = conn.cursor()
+    cur.execute("SELECT COUNT(*) AS n FROM data_version_log WHERE name = %s", (name,))
+    value = cur.fetchone()["n"]
+    conn.commit()
+    return value
+
+
+def touch(conn):
+    """A committed write to the `reference` domain."""
+    conn.cursor().execute("UPDATE contractors SET name = name WHERE FALSE")
+    conn.commit()
+
+
+@pytest.fixture
+def other(dsn):
+    other = psycopg2.connect(dsn)
+    yield other
+    other.close()
+
+
+def test_version_advances_at_commit(conn, other):
+    before = version(conn)
+    other.cursor().execute("UPDATE contractors SET name = name WHERE FALSE")
+
+    assert version(conn) == before
+    other.commit()
+    assert version(conn) == before + 1
+
+
+def test_open_transaction_does_not_hold_versions_back(conn, other):
+    before = version(conn)
+    other.cursor().execute("SELECT pg_current_xact_id()")  # older, still open
+
+    touch(conn)
+
+    assert version(conn) == before + 1
+    other.rollback()
+
+
+def test_pruning_keeps_the_version(conn):
+    for _ in range(3):
+        touch(conn)
+    before = version(conn)
+
+    conn.cursor().execute("SELECT prune_data_version_log()")
+    conn.commit()
+
+    assert log_rows(conn) == 0
+    assert version(conn) == before
+
+
+def test_writers_prune_the_log(conn):
+    before = version(conn)
+    for _ in range(500):
+        touch(conn)
+
+    assert version(conn) == before + 500
+    assert log_rows(conn) < 500
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+import streamlit
+
+from logic.fx import RateTable, rates_available, to_reporting
+
+RATES = RateTable(
+    dates=np.array(["2024-01-01", "2024-06-01", "2025-01-01"], dtype="datetime64[D]"),
+    iqd_per_usd=np.array([1300.0, 1310.0, 1320.0]),
+)
+EMPTY = RateTable(dates=np.array([], dtype="datetime64[D]"), iqd_per_usd=np.array([]))
+
+
+@pytest.fixture
+def no_default_rate(monkeypatch):
+    monkeypatch.setattr(streamlit, "secrets", {})
+
+
+# ─── Lookup ────────────────────────────────────────────────────────────────────
+def test_lookup_uses_latest_rate_on_or_before_each_date():
+    dates = ["2024-01-01", "2024-05-31", "2024-06-01", "2024-12-31", "2030-01-01"]
+
+    assert RATES.lookup(dates).tolist() == [1300.0, 1300.0, 1310.0, 1310.0, 1320.0]
+
+
+def test_lookup_before_first_rate_uses_first_rate():
+    assert RATES.lookup(["2020-01-01"]).tolist() == [1300.0]
+
+
+def test_lookup_accepts_datetimes():
+    dates = np.array(["2024-06-01T23:59:59"], dtype="datetime64[s]")
+
+    assert RATES.lookup(dates).tolist() == [1310.0]
+
+
+def test_lookup_without_rates_uses_default_rate(monkeypatch):
+    monkeypatch.setattr(streamlit, "secrets", {"default_iqd_per_usd": "1500"})
+
+    assert EMPTY.lookup(["2024-01-01", "2025-01-01"]).tolist() == [1500.0, 1500.0]
+
+
+def test_lookup_without_any_rate_is_nan(no_default_rate):
+    assert np.isnan(EMPTY.lookup(["2024-01-01"])).all()
+
+
+def test_rates_available(no_default_rate):
+    assert rates_available(RATES)
+    assert not rates_available(EMPTY)
+
+
+# ─── Conversion ────────────────────────────────────────────────────────────────
+def test_to_reporting_in_usd_and_iqd():
+    usd, iqd, dates = [100.0, None], [131000.0, 2640.0], ["2024-07-01", "2025-02-01"]
+
+    assert to_reporting(usd, iqd, dates, "USD", RATES).tolist() == [200.0, 2.0]
+    assert to_reporting(usd, iqd, dates, "IQD", RATES).tolist() == [262000.0, 2640.0]
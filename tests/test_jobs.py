@@ -0,0 +1,273 @@
+import psycopg2
+import pytest
+from psycopg2.extras import RealDictCursor
+
+from utils import jobs
+from utils.jobs import RETRY_BASE_SECONDS, Handler, Worker, enqueue
+
+
+class Calls:
+    """A job handler that records its payloads and raises while `fail` is set."""
+
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.payloads = []
+        self.failures = []
+
+    def run(self, conn, payload):
+        self.payloads.append(payload)
+        if self.fail:
+            raise RuntimeError("boom")
+        return {"n": payload.get("n")}
+
+    def on_failure(self, conn, payload, error):
+        self.failures.append((payload, error))
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    calls = Calls()
+    monkeypatch.setitem(jobs.HANDLERS, "test", Handler(calls.run, calls.on_failure))
+    return calls
+
+
+@pytest.fixture
+def worker(dsn):
+    return Worker(dsn, "test-worker")
+
+
+def queue(conn, *args, **options) -> int:
+    job_id = enqueue(conn, *args, **options)
+    conn.commit()
+    return job_id
+
+
+def job(conn, job_id: int) -> dict:
+    cur = conn.cursor()
+    cur.execute(
+        "SELECT *, EXTRACT(EPOCH FROM run_after - NOW()) AS due_in FROM jobs WHERE id = %s", (job_id,)
+    )
+    row = cur.fetchone()
+    conn.commit()
+    return row
+
+
+def make_due(conn, job_id: int):
+    conn.cursor().execute("UPDATE jobs SET run_after = NOW() WHERE id = %s", (job_id,))
+    conn.commit()
+
+
+# ─── Claim ─────────────────────────────────────────────────────────────────────
+def test_claims_highest_priority_then_oldest(conn, worker, calls):
+    queue(conn, "test", {"n": 1})
+    queue(conn, "test", {"n": 2}, priority=jobs.PRIORITY_INTERACTIVE)
+    queue(conn, "test", {"n": 3})
+    queue(conn, "test", {"n": 4}, priority=jobs.PRIORITY_MAINTENANCE)
+
+    while worker.run_one(conn):
+        pass
+
+    assert [p["n"] for p in calls.payloads] == [2, 1, 3, 4]
+
+
+def test_delayed_job_waits_until_due(conn, worker, calls):
+    job_id = queue(conn, "test", {"n": 1}, delay=60)
+
+    assert not worker.run_one(conn)
+    make_due(conn, job_id)
+    assert worker.run_one(conn)
+    assert job(conn, job_id)["status"] == "done"
+
+
+def test_finished_job_keeps_result(conn, worker, calls):
+    job_id = queue(conn, "test", {"n": 7})
+
+    assert worker.run_one(conn)
+
+    row = job(conn, job_id)
+    assert (row["status"], row["attempts"], row["result"]) == ("done", 1, {"n": 7})
+    assert row["lease_until"] is None and row["finished_at"] is not None
+
+
+# ─── Retry and backoff ─────────────────────────────────────────────────────────
+def test_failed_attempt_is_retried_with_exponential_delay(conn, worker, calls):
+    calls.fail = True
+    job_id = queue(conn, "test", {"n": 1}, max_attempts=3)
+
+    worker.run_one(conn)
+    row = job(conn, job_id)
+    assert (row["status"], row["attempts"]) == ("queued", 1)
+    assert row["last_error"] == "RuntimeError: boom"
+    assert row["due_in"] == pytest.approx(RETRY_BASE_SECONDS, abs=5)
+
+    make_due(conn, job_id)
+    worker.run_one(conn)
+    row = job(conn, job_id)
+    assert (row["status"], row["attempts"]) == ("queued", 2)
+    assert row["due_in"] == pytest.approx(2 * RETRY_BASE_SECONDS, abs=5)
+    assert calls.failures == []
+
+
+def test_last_attempt_fails_the_job(conn, worker, calls):
+    calls.fail = True
+    job_id = queue(conn, "test", {"n": 1}, max_attempts=2)
+
+    worker.run_one(conn)
+    make_due(conn, job_id)
+    worker.run_one(conn)
+
+    row = job(conn, job_id)
+    assert (row["status"], row["attempts"]) == ("failed", 2)
+    assert row["finished_at"] is not None
+    assert calls.failures == [({"n": 1}, "RuntimeError: boom")]
+
+
+def test_retry_succeeds(conn, worker, calls):
+    calls.fail = True
+    job_id = queue(conn, "test", {"n": 1})
+    worker.run_one(conn)
+
+    calls.fail = False
+    make_due(conn, job_id)
+    worker.run_one(conn)
+
+    row = job(conn, job_id)
+    assert (row["status"], row["attempts"], row["last_error"]) == ("done", 2, None)
+
+
+def test_unknown_kind_is_retried_as_an_error(conn, worker):
+    job_id = queue(conn, "no-such-kind", max_attempts=1)
+
+    worker.run_one(conn)
+
+    row = job(conn, job_id)
+    assert row["status"] == "failed"
+    assert row["last_error"] == "LookupError: no handler for job kind 'no-such-kind'"
+
+
+# ─── Lease expiry ──────────────────────────────────────────────────────────────
+def claim_elsewhere(conn, job_id: int, worker: str = "busy-worker"):
+    """Claims the job as another worker, which keeps it running."""
+    cur = conn.cursor()
+    cur.execute(jobs.CLAIM, {"worker": worker})
+    assert cur.fetchone()["id"] == job_id
+    conn.commit()
+
+
+def claim_and_die(conn, job_id: int):
+    """Claims the job as a worker that then disappears, its lease run out."""
+    claim_elsewhere(conn, job_id, "dead-worker")
+    conn.cursor().execute(
+        "UPDATE jobs SET lease_until = NOW() - INTERVAL '1 second' WHERE id = %s", (job_id,)
+    )
+    conn.commit()
+
+
+def test_expired_lease_is_handed_out_again(conn, worker, calls):
+    job_id = queue(conn, "test", {"n": 1})
+    claim_and_die(conn, job_id)
+
+    assert worker.run_one(conn)
+
+    row = job(conn, job_id)
+    assert (row["status"], row["attempts"], row["worker"]) == ("done", 2, "test-worker")
+    assert calls.payloads == [{"n": 1}]
+
+
+def test_running_job_within_its_lease_is_left_alone(conn, worker, calls):
+    job_id = queue(conn, "test", {"n": 1})
+    claim_elsewhere(conn, job_id)
+
+    assert not worker.run_one(conn)
+    assert job(conn, job_id)["status"] == "running"
+
+
+def test_expired_lease_on_last_attempt_fails_the_job(conn, worker, calls):
+    job_id = queue(conn, "test", {"n": 1}, max_attempts=1)
+    claim_and_die(conn, job_id)
+
+    assert not worker.run_one(conn)
+
+    row = job(conn, job_id)
+    assert row["status"] == "failed"
+    assert row["last_error"] == "lease expired: worker dead-worker lost"
+    assert calls.failures == [({"n": 1}, "lease expired: worker dead-worker lost")]
+
+
+# ─── Dedupe ────────────────────────────────────────────────────────────────────
+def test_waiting_job_is_not_queued_twice(conn, worker, calls):
+    first = queue(conn, "test", {"n": 1}, dedupe_key="k")
+    second = queue(conn, "test", {"n": 2}, dedupe_key="k", priority=jobs.PRIORITY_INTERACTIVE)
+
+    assert first == second
+    assert job(conn, first)["priority"] == jobs.PRIORITY_INTERACTIVE
+    while worker.run_one(conn):
+        pass
+    assert calls.payloads == [{"n": 1}]
+
+
+def test_lower_priority_duplicate_keeps_priority(conn):
+    first = queue(conn, "test", dedupe_key="k", priority=jobs.PRIORITY_INTERACTIVE)
+    queue(conn, "test", dedupe_key="k", priority=jobs.PRIORITY_MAINTENANCE)
+
+    assert job(conn, first)["priority"] == jobs.PRIORITY_INTERACTIVE
+
+
+def test_running_job_gets_a_successor(conn):
+    first = queue(conn, "test", {"n": 1}, dedupe_key="k")
+    claim_elsewhere(conn, first)
+
+    successor = queue(conn, "test", {"n": 2}, dedupe_key="k")
+
+    assert successor != first
+    assert job(conn, successor)["status"] == "queued"
+
+
+def test_failed_attempt_with_a_waiting_successor_is_not_retried(conn, worker, calls, monkeypatch):
+    first = queue(conn, "test", {"n": 1}, dedupe_key="k", max_attempts=3)
+    successors = []
+
+    def run(conn, payload):
+        # Queued from another connection while this one runs
+        other = psycopg2.connect(worker.dsn, cursor_factory=RealDictCursor)
+        try:
+            successors.append(queue(other, "test", {"n": 2}, dedupe_key="k"))
+        finally:
+            other.close()
+        raise RuntimeError("boom")
+
+    monkeypatch.setitem(jobs.HANDLERS, "test", Handler(run, calls.on_failure))
+    worker.run_one(conn)
+
+    row = job(conn, first)
+    assert (row["status"], row["attempts"]) == ("failed", 1)
+    assert row["finished_at"] is not None
+    assert job(conn, successors[0])["status"] == "queued"
+    assert calls.failures == [({"n": 1}, "RuntimeError: boom")]
+
+
+def test_expired_lease_with_a_waiting_successor_is_not_handed_out(conn, worker, calls):
+    first = queue(conn, "test", {"n": 1}, dedupe_key="k", max_attempts=3)
+    claim_and_die(conn, first)
+    successor = queue(conn, "test", {"n": 2}, dedupe_key="k")
+
+    assert worker.run_one(conn)
+
+    row = job(conn, first)
+    assert row["status"] == "failed" and row["finished_at"] is not None
+    assert job(conn, successor)["status"] == "done"
+    assert calls.payloads == [{"n": 2}]
+    assert calls.failures == [({"n": 1}, "lease expired: worker dead-worker lost")]
+
+
+def test_superseded_job_is_swept(conn, worker, calls):
+    first = queue(conn, "test", {"n": 1}, dedupe_key="k", max_attempts=3)
+    claim_and_die(conn, first)
+    queue(conn, "test", {"n": 2}, dedupe_key="k")
+    worker.run_one(conn)
+    conn.cursor().execute("UPDATE jobs SET finished_at = NOW() - INTERVAL '365 days' WHERE id = %s", (first,))
+    conn.commit()
+
+    worker.sweep(conn)
+
+    assert job(conn, first) is None
@@ -0,0 +1,101 @@
+import time
+import uuid
+from datetime import date
+
+import pytest
+
+from utils.notifications import NotificationHub
+
+MARCH, APRIL, MAY = date(2025, 3, 1), date(2025, 4, 1), date(2025, 5, 1)
+
+
+def wait_for(condition, timeout: float = 5):
+    deadline = time.time() + timeout
+    while not condition():
+        if time.time() > deadline:
+            raise AssertionError("timed out")
+        time.sleep(0.02)
+
+
+@pytest.fixture
+def hub(dsn, conn):
+    hub = NotificationHub(dsn, inbox_size=10, idle_seconds=60)
+    wait_for(lambda: hub.month_version(date(2025, 1, 1)) is not None)
+    return hub
+
+
+@pytest.fixture
+def request_id(hub, conn):
+    """A payment request requested in March 2025 and paid in April, its
+    notification already received."""
+    march = hub.month_version(MARCH)
+    cur = conn.cursor()
+    project, contractor, contract, request = (str(uuid.uuid4()) for _ in range(4))
+    cur.execute("INSERT INTO projects (id, name) VALUES (%s, 'Tower')", (project,))
+    cur.execute("INSERT INTO contractors (id, name) VALUES (%s, 'Builder')", (contractor,))
+    cur.execute(
+        "INSERT INTO contracts (id, title, project_id, contractor_id) VALUES (%s, 'Works', %s, %s)",
+        (contract, project, contractor),
+    )
+    cur.execute(
+        "INSERT INTO payment_requests (id, contract_id, requested_date, paid_date, amount_usd, status)"
+        " VALUES (%s, %s, '2025-03-05', '2025-04-02', 100, 'paid')",
+        (request, contract),
+    )
+    conn.commit()
+    wait_for(lambda: hub.month_version(MARCH) != march)
+    return request
+
+
+def versions(hub) -> list:
+    return [hub.month_version(m) for m in (MARCH, APRIL, MAY)]
+
+
+def test_change_moves_only_its_months(hub, request_id, conn):
+    march, april, may = versions(hub)
+
+    conn.cursor().execute("UPDATE payment_requests SET amount_usd = 120 WHERE id = %s", (request_id,))
+    conn.commit()
+
+    wait_for(lambda: hub.month_version(MARCH) != march)
+    assert hub.month_version(APRIL) != april
+    assert hub.month_version(MAY) == may
+
+
+def test_moved_date_names_old_and_new_month(hub, request_id, conn):
+    before = versions(hub)
+
+    conn.cursor().execute("UPDATE payment_requests SET paid_date = '2025-05-20' WHERE id = %s", (request_id,))
+    conn.commit()
+
+    wait_for(lambda: hub.month_version(MAY) != before[2])
+    assert hub.month_version(APRIL) != before[1]
+
+
+def test_unrelated_column_changes_no_month(hub, request_id, conn):
+    before = versions(hub)
+
+    cur = conn.cursor()
+    cur.execute("UPDATE payment_requests SET note = 'checked' WHERE id = %s", (request_id,))
+    conn.commit()
+    cur.execute("UPDATE payment_requests SET amount_usd = 130 WHERE id = %s", (request_id,))
+    conn.commit()
+
+    # Notifications arrive in commit order, so once the second is in, the
+    # first would have been too
+    wait_for(lambda: hub.month_version(MARCH) != before[0])
+    assert hub.month_version(MARCH)[2] == before[0][2] + 1
+
+
+def test_moving_a_contract_names_its_months(hub, request_id, conn):
+    before = versions(hub)
+
+    cur = conn.cursor()
+    other = str(uuid.uuid4())
+    cur.execute("INSERT INTO projects (id, name) VALUES (%s, 'Depot')", (other,))
+    cur.execute("UPDATE contracts SET project_id = %s", (other,))
+    conn.commit()
+
+    wait_for(lambda: hub.month_version(MARCH) != before[0])
+    assert hub.month_version(APRIL) != before[1]
+    assert hub.month_version(MAY) == before[2]
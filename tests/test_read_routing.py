@@ -0,0 +1,86 @@
+"""Caches shared by every session while each session reads the primary or
+the replica. The replica here is a second database that has not seen the
+primary's latest write."""
+
+import psycopg2
+import pytest
+import streamlit
+from psycopg2.extensions import make_dsn
+
+from logic import reference
+from logic.reference import forget_data_versions, load_data_version
+from utils import cache, db
+from utils.cache import change_cached
+from utils.db import read_connection
+from utils.migrations import upgrade
+
+
+@pytest.fixture(scope="module")
+def replica_dsn(dsn):
+    name = f"{psycopg2.extensions.parse_dsn(dsn)['dbname']}_replica"
+    admin = psycopg2.connect(dsn)
+    admin.autocommit = True
+    admin.cursor().execute(f"CREATE DATABASE {name} TEMPLATE template0")
+    try:
+        replica = make_dsn(dsn, dbname=name)
+        upgrade(replica)
+        yield replica
+    finally:
+        admin.cursor().execute(f"DROP DATABASE IF EXISTS {name} WITH (FORCE)")
+        admin.close()
+
+
+@pytest.fixture
+def routing(monkeypatch, conn, dsn, replica_dsn):
+    """Sets which server sessions read from: routing["primary"]."""
+    monkeypatch.setattr(streamlit, "secrets", {
+        "db_url": dsn, "db_read_url": replica_dsn, "db_prepared_statements": False,
+    })
+    state = {"primary": False}
+    for module in (reference, cache, db):
+        monkeypatch.setattr(module, "reads_from_primary", lambda: state["primary"])
+    # A write the replica has not caught up with
+    conn.cursor().execute("INSERT INTO contractors (id, name) VALUES (gen_random_uuid(), 'New')")
+    conn.commit()
+    forget_data_versions()
+    yield state
+    forget_data_versions()
+
+
+def version_on(dsn: str) -> int:
+    conn = psycopg2.connect(dsn)
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT version FROM data_versions WHERE name = 'reference'")
+        return cur.fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_data_version_is_cached_per_server(routing, dsn, replica_dsn):
+    assert version_on(dsn) != version_on(replica_dsn)
+
+    assert load_data_version("reference") == version_on(replica_dsn)
+    routing["primary"] = True
+    assert load_data_version("reference") == version_on(dsn)
+    routing["primary"] = False
+    assert load_data_version("reference") == version_on(replica_dsn)
+
+
+def test_reference_store_follows_the_session_server(routing):
+    assert "New" not in reference.reference_store().contractors.labels
+    routing["primary"] = True
+    assert "New" in reference.reference_store().contractors.labels
+
+
+def test_change_cached_entries_are_kept_per_server(routing):
+    @change_cached("reference")
+    def contractor_count():
+        with read_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT COUNT(*) AS n FROM contractors")
+            return cur.fetchone()["n"]
+
+    assert contractor_count() == 0
+    routing["primary"] = True
+    assert contractor_count() == 1
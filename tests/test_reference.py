@@ -0,0 +1,69 @@
+import pytest
+
+from logic import reference
+from logic.reference import ReferenceStore
+
+
+def store(contracts_per_project: dict[str, list[str]]) -> ReferenceStore:
+    projects = [{"id": p, "name": p, "location": "-"} for p in contracts_per_project]
+    contracts = [
+        {"id": f"{p}-{i}", "title": title, "project_id": p, "contractor_id": "co",
+         "project_name": p, "contractor_name": "Builder"}
+        for p, titles in contracts_per_project.items()
+        for i, title in enumerate(titles)
+    ]
+    return ReferenceStore.build(1, projects, [{"id": "co", "name": "Builder"}], contracts)
+
+
+def test_search_ranks_title_matches_first():
+    s = store({"Tower": ["Roof works", "Tower roof"], "Bridge": ["Deck"]})
+
+    labels, more = s.search_contracts("roof")
+
+    assert labels == ("Roof works (Tower) — Builder", "Tower roof (Tower) — Builder")
+    assert not more
+
+
+def test_search_needs_every_term():
+    s = store({"Tower": ["Roof works", "Roof repair"]})
+
+    assert s.search_contracts("roof rep") == (("Roof repair (Tower) — Builder",), False)
+
+
+def test_search_limit_sets_more():
+    s = store({"Tower": [f"Roof {i:02}" for i in range(5)]})
+
+    labels, more = s.search_contracts("roof", limit=3)
+
+    assert len(labels) == 3 and more
+
+
+def test_scoped_search_is_not_cut_by_other_projects(monkeypatch):
+    monkeypatch.setattr(reference, "SEARCH_SCAN_MAX", 10)
+    # "Bridge" sorts first, so its 20 contracts fill the first 10 slots of the
+    # "roof" prefix list
+    s = store({"Bridge": [f"Roof {i:02}" for i in range(20)], "Tower": ["Roof main"]})
+
+    labels, more = s.search_contracts("roof", project_id="Tower")
+
+    assert labels == ("Roof main (Tower) — Builder",)
+    assert not more
+
+
+def test_truncated_scan_reports_more(monkeypatch):
+    monkeypatch.setattr(reference, "SEARCH_SCAN_MAX", 10)
+    s = store({"Tower": [f"Roof {i:02}" for i in range(15)] + ["Roof target"]})
+
+    labels, more = s.search_contracts("roof target")
+
+    assert labels == ()
+    assert more
+
+
+@pytest.mark.parametrize("project_id, expected", [("Tower", 2), ("Bridge", 1), (None, 3)])
+def test_search_without_query_lists_scope(project_id, expected):
+    s = store({"Tower": ["A", "B"], "Bridge": ["C"]})
+
+    labels, more = s.search_contracts("", project_id=project_id)
+
+    assert len(labels) == expected and not more
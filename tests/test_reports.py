@@ -0,0 +1,36 @@
+from datetime import date
+
+import pandas as pd
+
+from logic.reports import TOTALS, Statement, file_name
+
+
+def statement(entity_name: str = "Tower A", contracts: list[dict] | None = None) -> Statement:
+    contracts = pd.DataFrame(contracts or [], columns=["contract", *TOTALS])
+    return Statement("project", entity_name, date(2025, 1, 1), date(2025, 12, 31),
+                     contracts, pd.DataFrame())
+
+
+def test_file_name():
+    assert file_name(statement(), "pdf") == "project_Tower_A_20250101-20251231.pdf"
+
+
+def test_file_name_replaces_unsafe_characters():
+    name = file_name(statement("  Al-Rashid / Phase 2: Ø  "), "xlsx")
+
+    assert name == "project_Al_Rashid___Phase_2__Ø_20250101-20251231.xlsx"
+
+
+def test_totals_treat_missing_amounts_as_zero():
+    lines = [
+        {"contract": "A", **{col: 1.5 for col in TOTALS}},
+        {"contract": "B", **{col: None for col in TOTALS}, "requests": 2},
+    ]
+
+    totals = statement(contracts=lines).totals()
+
+    assert totals == {**{col: 1.5 for col in TOTALS}, "requests": 3.5}
+
+
+def test_totals_of_an_empty_statement():
+    assert statement().totals() == {col: 0 for col in TOTALS}
@@ -0,0 +1,77 @@
+import uuid
+
+import pytest
+
+from logic import repository
+
+MONEY_COLUMNS = ("contract_value_usd", "contract_value_iqd", "amount_usd", "amount_iqd")
+
+
+@pytest.fixture
+def contracts(conn, secrets):
+    """Two projects with one contract each; the first has a paid and a
+    pending request."""
+    cur = conn.cursor()
+    contractor = str(uuid.uuid4())
+    cur.execute("INSERT INTO contractors (id, name) VALUES (%s, 'Builder')", (contractor,))
+    ids = {}
+    for name, value in (("Project A", 1000), ("Project B", 500)):
+        project, contract = str(uuid.uuid4()), str(uuid.uuid4())
+        cur.execute("INSERT INTO projects (id, name) VALUES (%s, %s)", (project, name))
+        cur.execute(
+            "INSERT INTO contracts (id, title, project_id, contractor_id, contract_value_usd)"
+            " VALUES (%s, %s, %s, %s, %s)",
+            (contract, f"{name} works", project, contractor, value),
+        )
+        ids[name] = project
+    cur.execute(
+        "INSERT INTO payment_requests (id, contract_id, requested_date, paid_date, amount_usd, status)"
+        " SELECT gen_random_uuid(), c.id, DATE '2025-03-01', r.paid, 100, r.status"
+        " FROM contracts c, (VALUES (DATE '2025-03-11', 'paid'), (NULL, 'pending')) r(paid, status)"
+        " WHERE c.project_id = %s",
+        (ids["Project A"],),
+    )
+    conn.commit()
+    return ids
+
+
+# ─── Dashboard summary ─────────────────────────────────────────────────────────
+def test_summary_of_all_projects(contracts):
+    summary = repository.dashboard_summary(MONEY_COLUMNS)
+
+    assert (summary["contracts"], summary["contractors"], summary["requests"]) == (2, 1, 2)
+    assert (summary["pending"], summary["paid_cnt"], summary["rejected"]) == (1, 1, 0)
+    assert (summary["budget_usd"], summary["paid_usd"], summary["avg_days"]) == (1500, 100, 10)
+
+
+def test_summary_of_one_project(contracts):
+    summary = repository.dashboard_summary(MONEY_COLUMNS, contracts["Project B"])
+
+    assert (summary["contracts"], summary["requests"], summary["budget_usd"]) == (1, 0, 500)
+
+
+def test_missing_money_column_sums_to_zero(contracts):
+    summary = repository.dashboard_summary((None, None, "amount_usd", None))
+
+    assert (summary["budget_usd"], summary["budget_iqd"], summary["paid_usd"]) == (0, 0, 100)
+
+
+# ─── Projects and contractors ──────────────────────────────────────────────────
+def test_project_round_trip(conn, secrets):
+    project = repository.insert_project("Tower", "Erbil", None, None, "Planned", "admin")
+    repository.update_project(project, "Tower A", "Erbil", None, None, "Ongoing")
+
+    assert [(p["name"], p["status"], p["created_by"]) for p in repository.list_projects()] == [
+        ("Tower A", "Ongoing", "admin"),
+    ]
+    repository.delete_project(project)
+    assert repository.list_projects() == []
+
+
+def test_contractor_round_trip(conn, secrets):
+    contractor = repository.insert_contractor("Builder", email="a@b.c")
+    repository.update_contractor(contractor, "Builders Ltd", "Sam", "a@b.c", None, None)
+
+    assert [(c["name"], c["contact_person"]) for c in repository.list_contractors()] == [("Builders Ltd", "Sam")]
+    repository.delete_contractor(contractor)
+    assert repository.list_contractors() == []
@@ -0,0 +1,154 @@
+import io
+import uuid
+
+import pytest
+
+from logic import user_admin
+from logic.user_admin import (
+    PROVISION_COLUMNS, provisioning_template, read_provisioning_csv, update_user, validate_provisioning,
+)
+
+
+def csv_file(*lines: str) -> io.StringIO:
+    return io.StringIO("\n".join(lines) + "\n")
+
+
+HEADER = ",".join(PROVISION_COLUMNS)
+
+
+# ─── Reading the CSV ───────────────────────────────────────────────────────────
+def test_reads_columns_in_any_order_and_case():
+    df = read_provisioning_csv(csv_file(
+        " Projects ,PASSWORD,role,full_name,Username,extra",
+        "Project A, secret ,Site PM, Site PM 01 , pm01 ,ignored",
+    ))
+
+    assert list(df.columns) == PROVISION_COLUMNS
+    assert df.loc[2].to_dict() == {
+        "username": "pm01", "full_name": "Site PM 01", "role": "Site PM",
+        "password": "secret", "projects": "Project A",
+    }
+
+
+def test_rows_are_indexed_by_csv_line():
+    df = read_provisioning_csv(csv_file(HEADER, "a,,HQ Admin,x,", "b,,HQ Admin,x,"))
+
+    assert list(df.index) == [2, 3]
+
+
+def test_empty_cells_stay_empty_strings():
+    df = read_provisioning_csv(csv_file(HEADER, "a,,HQ Admin,x,"))
+
+    assert df.loc[2, "full_name"] == "" and df.loc[2, "projects"] == ""
+
+
+def test_missing_columns_are_reported():
+    with pytest.raises(ValueError, match="Missing column\\(s\\): role, projects"):
+        read_provisioning_csv(csv_file("username,full_name,password", "a,b,c"))
+
+
+def test_template_reads_back():
+    df = read_provisioning_csv(io.StringIO(provisioning_template()))
+
+    assert len(df) == 1 and df.loc[2, "role"] == "Site PM"
+
+
+# ─── Validation ────────────────────────────────────────────────────────────────
+@pytest.fixture
+def directory(conn, secrets):
+    """Project A and B, and an existing user `taken`."""
+    cur = conn.cursor()
+    ids = {}
+    for name in ("Project A", "Project B"):
+        ids[name] = str(uuid.uuid4())
+        cur.execute("INSERT INTO projects (id, name) VALUES (%s, %s)", (ids[name], name))
+    cur.execute(
+        "INSERT INTO users (id, username, hashed_password, role) VALUES (%s, 'taken', 'x', 'HQ Admin')",
+        (str(uuid.uuid4()),),
+    )
+    conn.commit()
+    return ids
+
+
+def problems(*rows: str) -> dict[int, str]:
+    result = validate_provisioning(read_provisioning_csv(csv_file(HEADER, *rows)))
+    return result["problems"].to_dict()
+
+
+def test_valid_rows_have_no_problems(directory):
+    result = validate_provisioning(read_provisioning_csv(csv_file(
+        HEADER,
+        "pm01,PM 01,Site PM,secret,Project A; Project B",
+        "hq01,HQ 01,HQ Admin,secret,",
+    )))
+
+    assert result["problems"].to_dict() == {2: "", 3: ""}
+    assert result.loc[2, "project_ids"] == sorted(directory.values())
+    assert result.loc[3, "project_ids"] == []
+
+
+def test_required_fields(directory):
+    assert problems(",,HQ Admin,,") == {2: "username is required; password is required"}
+
+
+def test_existing_and_repeated_usernames(directory):
+    assert problems(
+        "taken,,HQ Admin,pw,",
+        "twice,,HQ Admin,pw,",
+        "twice,,HQ Admin,pw,",
+    ) == {
+        2: "username already exists",
+        3: "username repeated in this file",
+        4: "username repeated in this file",
+    }
+
+
+def test_unknown_role_and_projects(directory):
+    assert problems("a,,Janitor,pw,Project A;Project Z") == {
+        2: "unknown role 'Janitor'; unknown project(s): Project Z",
+    }
+
+
+def test_projects_only_for_project_roles(directory):
+    assert problems("a,,HQ Accountant,pw,Project A") == {
+        2: "HQ Accountant is not assigned to projects",
+    }
+
+
+# ─── Edits ─────────────────────────────────────────────────────────────────────
+@pytest.fixture
+def user(directory, conn):
+    user_id = str(uuid.uuid4())
+    cur = conn.cursor()
+    cur.execute(
+        "INSERT INTO users (id, username, full_name, hashed_password, role)"
+        " VALUES (%s, 'pm', 'PM', 'x', 'Site PM')",
+        (user_id,),
+    )
+    cur.execute(
+        "INSERT INTO user_projects (user_id, project_id) VALUES (%s, %s)", (user_id, directory["Project A"])
+    )
+    conn.commit()
+    return user_id
+
+
+def test_unchanged_edit_writes_nothing(user, directory, monkeypatch):
+    def no_write():
+        raise AssertionError("write_connection() used for an unchanged user")
+
+    monkeypatch.setattr(user_admin, "write_connection", no_write)
+
+    assert update_user(user, "PM", "Site PM", [directory["Project A"]]) == {}
+
+
+def test_edit_applies_only_the_difference(user, directory, conn):
+    diff = update_user(user, "PM", "Site Accountant", [directory["Project B"]])
+
+    assert diff == {
+        "role": ["Site PM", "Site Accountant"],
+        "projects_removed": [directory["Project A"]],
+        "projects_added": [directory["Project B"]],
+    }
+    cur = conn.cursor()
+    cur.execute("SELECT project_id::text FROM user_projects WHERE user_id = %s", (user,))
+    assert [r["project_id"] for r in cur.fetchall()] == [directory["Project B"]]
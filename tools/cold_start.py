@@ -0,0 +1,128 @@
+"""Time-to-first-render of the PayTrack pages in a fresh server process.
+
+Every page is rendered through Streamlit's AppTest in its own freshly spawned
+interpreter, so module imports and every @st.cache_data / change_cached
+loader start cold, exactly as for the first user after a deploy. Reports the
+first and second render of each page, the heavy libraries the page pulled
+in, and with --warm the same after utils.warmup.warm_up() has run (what a
+user sees once the boot-time warm-up has finished).
+
+    python tools/cold_start.py --dsn postgresql://localhost/paytrack --warm --repeat 3
+"""
+
+import argparse
+import json
+import multiprocessing as mp
+import statistics
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from utils.migrations import default_dsn  # noqa: E402
+
+DEFAULT_PAGES = [
+    "02_dashboard",
+    "03_projects",
+    "04_contractors",
+    "05_contracts",
+    "06_payment_requests",
+    "07_user_management",
+    "08_activity_log",
+    "09_reports",
+]
+HEAVY = ("pandas", "pyarrow", "plotly.express", "openpyxl", "reportlab", "duckdb")
+USER = {"id": None, "username": "cold_start", "role": "Superadmin", "assigned_projects": []}
+
+
+# ─── One cold process ──────────────────────────────────────────────────────────
+def _warm_script():
+    from utils.warmup import warm_up
+    warm_up()
+
+
+def _app(at, dsn):
+    at.secrets["db_url"] = dsn
+    at.secrets["cookie_password"] = "cold-start"
+    at.secrets["warmup"] = False  # warm runs call warm_up() up front instead
+    return at
+
+
+def measure(page: str, dsn: str, warm: bool, timeout: float, results):
+    started = time.perf_counter()
+    from streamlit.testing.v1 import AppTest
+    sample = {"page": page, "warm": warm, "boot_s": time.perf_counter() - started, "warmup_s": None}
+
+    if warm:
+        started = time.perf_counter()
+        at = _app(AppTest.from_function(_warm_script, default_timeout=timeout), dsn)
+        at.run()
+        sample["warmup_s"] = time.perf_counter() - started
+        sample["warmup_failed"] = bool(at.exception)
+
+    path = ROOT / "app.py" if page == "app" else ROOT / "pages" / f"{page}.py"
+    at = _app(AppTest.from_file(str(path), default_timeout=timeout), dsn)
+    at.session_state["user"] = USER
+    for run in ("first_s", "second_s"):
+        started = time.perf_counter()
+        at.run()
+        sample[run] = time.perf_counter() - started
+    sample["failed"] = bool(at.exception)
+    sample["heavy"] = [m for m in HEAVY if m in sys.modules]
+    results.put(sample)
+
+
+# ─── Main ──────────────────────────────────────────────────────────────────────
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dsn", default=default_dsn())
+    parser.add_argument("--pages", default=",".join(DEFAULT_PAGES), help="page files; 'app' for app.py")
+    parser.add_argument("--repeat", type=int, default=3, help="fresh processes per page and mode")
+    parser.add_argument("--warm", action="store_true", help="also measure after the boot warm-up")
+    parser.add_argument("--timeout", type=float, default=60.0, help="per-render timeout")
+    parser.add_argument("--json", help="write the samples to this file")
+    args = parser.parse_args()
+    if not args.dsn:
+        parser.error("no DSN: pass --dsn or set PAYTRACK_DB_URL")
+
+    # spawn, not fork: a forked child would inherit this process's imports
+    ctx = mp.get_context("spawn")
+    results = ctx.Queue()
+    pages = [p.strip() for p in args.pages.split(",") if p.strip()]
+    modes = [False, True] if args.warm else [False]
+    samples = []
+    for page in pages:
+        for warm in modes:
+            for _ in range(args.repeat):
+                p = ctx.Process(target=measure, args=(page, args.dsn, warm, args.timeout, results))
+                p.start()
+                samples.append(results.get())
+                p.join()
+
+    def median_ms(page, warm, key):
+        values = [s[key] for s in samples if s["page"] == page and s["warm"] == warm]
+        return round(statistics.median(values) * 1000) if values else None
+
+    header = f"{'page':<22}{'first ms':>10}{'second ms':>11}"
+    if args.warm:
+        header += f"{'warm first':>12}{'warm-up ms':>12}"
+    print(header + "  errors  heavy imports")
+    for page in pages:
+        line = f"{page:<22}{median_ms(page, False, 'first_s'):>10}{median_ms(page, False, 'second_s'):>11}"
+        if args.warm:
+            line += f"{median_ms(page, True, 'first_s'):>12}{median_ms(page, True, 'warmup_s'):>12}"
+        cold = [s for s in samples if s["page"] == page and not s["warm"]]
+        errors = sum(s["failed"] or s.get("warmup_failed", False) for s in samples if s["page"] == page)
+        print(f"{line}  {errors:>6}  {', '.join(cold[-1]['heavy']) or '—'}")
+    boot = statistics.median(s["boot_s"] for s in samples)
+    print(f"\nStreamlit + AppTest import per process (not included above): {boot * 1000:.0f} ms")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(samples, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+"""Concurrent-session load test for the PayTrack pages.
+
+Drives pages/02–07 through Streamlit's AppTest from N simulated sessions with
+a mix of roles, against a local Postgres, and reports rerun latency
+percentiles, DB connections opened and process RSS over time. Each session
+runs in its own process because AppTest keeps global runtime state.
+
+    python tools/load_test.py --dsn postgresql://localhost/paytrack \
+        --sessions 20 --duration 60 --roles "Site PM:4,HQ Accountant:2,HQ Admin:1"
+"""
+
+import argparse
+import json
+import math
+import multiprocessing as mp
+import os
+import queue
+import random
+import sys
+import time
+import tomllib
+from collections import defaultdict
+from itertools import cycle
+from pathlib import Path
+
+import psycopg2
+from psycopg2.extras import RealDictCursor
+from streamlit.testing.v1 import AppTest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+DEFAULT_PAGES = [
+    "02_dashboard",
+    "03_projects",
+    "04_contractors",
+    "05_contracts",
+    "06_payment_requests",
+    "07_user_management",
+]
+DEFAULT_ROLES = "Site PM:4,Site Accountant:2,HQ Accountant:2,HQ Admin:1,Superadmin:1"
+
+
+# ─── Config ────────────────────────────────────────────────────────────────────
+def default_dsn() -> str | None:
+    if os.environ.get("PAYTRACK_DB_URL"):
+        return os.environ["PAYTRACK_DB_URL"]
+    secrets = ROOT / ".streamlit" / "secrets.toml"
+    if secrets.is_file():
+        with open(secrets, "rb") as f:
+            return tomllib.load(f).get("db_url")
+    return None
+
+
+def parse_roles(spec: str) -> list[str]:
+    roles = []
+    for part in spec.split(","):
+        name, _, weight = part.partition(":")
+        roles += [name.strip()] * int(weight or 1)
+    return roles
+
+
+# ─── Instrumentation ───────────────────────────────────────────────────────────
+def install_connection_counter(counter):
+    """Counts every psycopg2.connect() made by the pages under test."""
+    connect = psycopg2.connect
+
+    def counting_connect(*args, **kwargs):
+        with counter.get_lock():
+            counter.value += 1
+        return connect(*args, **kwargs)
+
+    psycopg2.connect = counting_connect
+
+
+def rss_mb(pid: int | str = "self") -> float:
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError):
+        return 0.0
+
+
+def server_backends(cur) -> int:
+    cur.execute(
+        "SELECT COUNT(*) AS n FROM pg_stat_activity WHERE datname = current_database()"
+    )
+    return cur.fetchone()["n"]
+
+
+def percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = math.ceil(pct / 100 * len(ordered)) - 1
+    return ordered[max(0, min(rank, len(ordered) - 1))]
+
+
+# ─── Sessions ──────────────────────────────────────────────────────────────────
+def load_users(dsn: str, roles: set[str]) -> dict[str, list[dict]]:
+    conn = psycopg2.connect(dsn, cursor_factory=RealDictCursor)
+    cur = conn.cursor()
+    cur.execute(
+        """
+        SELECT u.id, u.username, u.role,
+               COALESCE(array_agg(up.project_id) FILTER (WHERE up.project_id IS NOT NULL), '{}')
+                   AS assigned_projects
+        FROM users u
+        LEFT JOIN user_projects up ON up.user_id = u.id
+        WHERE u.role = ANY(%s) AND u.is_active = TRUE
+        GROUP BY u.id
+        """,
+        (list(roles),),
+    )
+    by_role = defaultdict(list)
+    for r in cur.fetchall():
+        by_role[r["role"]].append({
+            "id": str(r["id"]),
+            "username": r["username"],
+            "role": r["role"],
+            "assigned_projects": [str(p) for p in r["assigned_projects"]],
+        })
+    conn.close()
+    return by_role
+
+
+def run_session(n, user, pages, dsn, think, timeout, deadline, counter, reruns, results):
+    # AppTest keeps global runtime state, so every simulated session gets its
+    # own process; st.cache_data is therefore per session (worst case).
+    # Whatever happens, the samples are posted: the parent waits for them.
+    samples = []
+    try:
+        install_connection_counter(counter)
+        rng = random.Random(n)
+        apps = {}
+        while time.time() < deadline:
+            page = rng.choice(pages)
+            started = time.perf_counter()
+            try:
+                at = apps.get(page)
+                if at is None:
+                    at = AppTest.from_file(str(ROOT / "pages" / f"{page}.py"), default_timeout=timeout)
+                    at.secrets["db_url"] = dsn
+                    at.secrets["cookie_password"] = "load-test"
+                    at.session_state["user"] = user
+                    apps[page] = at
+                at.run()
+                failed = bool(at.exception)
+            except Exception:
+                failed = True
+            samples.append((page, time.perf_counter() - started, failed))
+            with reruns.get_lock():
+                reruns.value += 1
+            time.sleep(rng.uniform(0, think * 2))
+    finally:
+        results.put((n, samples))
+
+
+# ─── Main ──────────────────────────────────────────────────────────────────────
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dsn", default=default_dsn())
+    parser.add_argument("--sessions", type=int, default=10)
+    parser.add_argument("--duration", type=float, default=60.0, help="seconds")
+    parser.add_argument("--pages", default=",".join(DEFAULT_PAGES))
+    parser.add_argument("--roles", default=DEFAULT_ROLES, help="role:weight,...")
+    parser.add_argument("--think", type=float, default=0.5, help="mean think time between reruns")
+    parser.add_argument("--timeout", type=float, default=60.0, help="per-rerun timeout")
+    parser.add_argument("--sample-interval", type=float, default=1.0)
+    parser.add_argument("--json", help="write the full report to this file")
+    args = parser.parse_args()
+    if not args.dsn:
+        parser.error("no DSN: pass --dsn or set PAYTRACK_DB_URL")
+
+    pages = [p.strip() for p in args.pages.split(",") if p.strip()]
+    roles = parse_roles(args.roles)
+    users = load_users(args.dsn, set(roles))
+
+    monitor = psycopg2.connect(args.dsn, cursor_factory=RealDictCursor)
+    monitor.autocommit = True
+    monitor_cur = monitor.cursor()
+
+    counter = mp.Value("i", 0)
+    reruns = mp.Value("i", 0)
+    results = mp.Queue()
+    timeline = []
+    started = time.time()
+    deadline = started + args.duration
+
+    workers = []
+    role_cycle = cycle(roles)
+    for n in range(args.sessions):
+        role = next(role_cycle)
+        pool = users.get(role)
+        user = pool[n % len(pool)] if pool else {
+            "id": None, "username": f"loadtest_{n}", "role": role, "assigned_projects": [],
+        }
+        w = mp.Process(
+            target=run_session,
+            args=(n, user, pages, args.dsn, args.think, args.timeout, deadline,
+                  counter, reruns, results),
+            daemon=True,
+        )
+        w.start()
+        workers.append(w)
+
+    collected = {}  # session -> samples, None for a session process that died
+    while len(collected) < len(workers):
+        timeline.append({
+            "t": round(time.time() - started, 1),
+            "rss_mb": round(sum(rss_mb(w.pid) for w in workers if w.is_alive()), 1),
+            "connections_opened": counter.value,
+            "server_backends": server_backends(monitor_cur),
+            "reruns": reruns.value,
+        })
+        try:
+            n, batch = results.get(timeout=args.sample_interval)
+            collected[n] = batch
+        except queue.Empty:
+            # A process killed before posting (crash, OOM) would otherwise be
+            # waited for forever; it counts as a failed session.
+            for n, w in enumerate(workers):
+                if n not in collected and not w.is_alive() and w.exitcode != 0:
+                    collected[n] = None
+    for w in workers:
+        w.join()
+    monitor.close()
+
+    samples = defaultdict(list)
+    errors = defaultdict(int)
+    dead = sorted(n for n, batch in collected.items() if batch is None)
+    for page, elapsed, failed in (s for batch in collected.values() if batch for s in batch):
+        samples[page].append(elapsed)
+        errors[page] += failed
+
+    report = {"sessions": args.sessions, "duration_s": args.duration, "pages": {}, "timeline": timeline}
+    all_samples = [s for v in samples.values() for s in v]
+    for page, values in sorted(samples.items()) + [("ALL", all_samples)]:
+        report["pages"][page] = {
+            "reruns": len(values),
+            "errors": errors[page] if page != "ALL" else sum(errors.values()),
+            "p50_ms": round(percentile(values, 50) * 1000, 1),
+            "p95_ms": round(percentile(values, 95) * 1000, 1),
+            "p99_ms": round(percentile(values, 99) * 1000, 1),
+        }
+    report["failed_sessions"] = dead
+    report["connections_opened"] = counter.value
+    report["peak_server_backends"] = max((s["server_backends"] for s in timeline), default=0)
+    report["peak_rss_mb"] = max((s["rss_mb"] for s in timeline), default=0)
+
+    print(f"{'page':<22}{'reruns':>8}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for page, r in report["pages"].items():
+        print(f"{page:<22}{r['reruns']:>8}{r['errors']:>8}{r['p50_ms']:>10}{r['p95_ms']:>10}{r['p99_ms']:>10}")
+    print()
+    if dead:
+        print(f"Sessions whose process died: {len(dead)} of {args.sessions} ({', '.join(map(str, dead))})")
+    print(f"DB connections opened: {report['connections_opened']}  "
+          f"(peak server backends: {report['peak_server_backends']})")
+    print(f"Peak RSS (all session processes): {report['peak_rss_mb']} MB")
+    print()
+    print(f"{'t (s)':>8}{'RSS MB':>10}{'conns':>8}{'backends':>10}{'reruns':>8}")
+    for s in timeline:
+        print(f"{s['t']:>8}{s['rss_mb']:>10}{s['connections_opened']:>8}{s['server_backends']:>10}{s['reruns']:>8}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +0,0 @@
-touch utils/__init__.py
-git add utils/__init__.py utils/core.py
-git commit -m "Add core.py with session and auth functions"
-git push
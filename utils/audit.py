@@ -0,0 +1,129 @@
+import atexit
+import json
+import queue
+import sys
+import threading
+import time
+from datetime import date, datetime
+
+import streamlit as st
+from psycopg2.extras import execute_values
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from utils.db import pooled_connection
+
+
+# ─── Batched audit writer ──────────────────────────────────────────────────────
+# record() only timestamps the event and puts it on an in-memory queue; one
+# daemon thread per process drains the queue every `audit_flush_seconds` (or
+# as soon as a batch is full) and writes it to activity_log in one INSERT. A full queue drops events (and counts
+# them) rather than slowing a page down; a failed flush keeps the batch and
+# retries on the next cycle.
+class AuditWriter:
+    def __init__(self, batch_size: int, flush_seconds: float, max_queued: int):
+        self.batch_size = batch_size
+        self.max_queued = max_queued
+        self.flush_seconds = flush_seconds
+        self.events = queue.Queue(maxsize=max_queued)
+        self.pending = []
+        self.dropped = 0
+        self.months = set()
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True, name="audit-writer")
+        self.thread.start()
+        atexit.register(self.flush)
+
+    def put(self, event: tuple):
+        try:
+            self.events.put_nowait(event)
+        except queue.Full:
+            self.dropped += 1
+            return
+        if self.events.qsize() >= self.batch_size:
+            self.wake.set()
+
+    def _run(self):
+        while True:
+            self.wake.wait(self.flush_seconds)
+            self.wake.clear()
+            if not self.flush():
+                time.sleep(self.flush_seconds)
+
+    def flush(self) -> bool:
+        # Events stay on the queue until a flush takes them under the lock,
+        # so the exit-time flush never misses a batch the thread was holding.
+        with self.lock:
+            batch, self.pending = self.pending, []
+            while True:
+                try:
+                    batch.append(self.events.get_nowait())
+                except queue.Empty:
+                    break
+            if not batch:
+                return True
+            try:
+                self._write(batch)
+                return True
+            except Exception as e:
+                print(f"audit: flush of {len(batch)} events failed: {e!r}", file=sys.stderr)
+                self.dropped += max(0, len(batch) - self.max_queued)
+                self.pending = batch[-self.max_queued:]
+                return False
+
+    def _write(self, batch: list[tuple]):
+        with pooled_connection() as conn:
+            cur = conn.cursor()
+            months = {e[0].date().replace(day=1) for e in batch} - self.months
+            for month in months:
+                cur.execute("SELECT ensure_activity_partition(%s)", (month,))
+            execute_values(
+                cur,
+                """
+                INSERT INTO activity_log
+                    (occurred_at, user_id, username, action, entity, entity_id, summary, details)
+                VALUES %s
+                """,
+                batch,
+                page_size=self.batch_size,
+            )
+        self.months |= months
+
+
+@st.cache_resource
+def get_audit_writer() -> AuditWriter:
+    return AuditWriter(
+        batch_size=int(st.secrets.get("audit_batch_size", 200)),
+        flush_seconds=float(st.secrets.get("audit_flush_seconds", 2)),
+        max_queued=int(st.secrets.get("audit_queue_max", 10000)),
+    )
+
+
+def _json_default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return str(value)
+
+
+def record(action: str, entity: str, entity_id=None, summary: str = "", user: dict | None = None,
+           **details):
+    """Queues one audit event; returns immediately. The acting user is taken
+    from the session unless passed explicitly (e.g. at login)."""
+    if user is None and get_script_run_ctx() is not None:
+        user = st.session_state.get("user")
+    user = user if isinstance(user, dict) else {}
+    get_audit_writer().put((
+        datetime.now(),
+        str(user["id"]) if user.get("id") else None,
+        user.get("username"),
+        action,
+        entity,
+        str(entity_id) if entity_id is not None else None,
+        summary,
+        json.dumps(details, default=_json_default) if details else None,
+    ))
+
+
+def changes(old: dict, new: dict) -> dict:
+    """{field: [old, new]} for the fields of `new` whose value differs."""
+    return {k: [old.get(k), v] for k, v in new.items() if old.get(k) != v}
@@ -0,0 +1,104 @@
+import functools
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+
+import streamlit as st
+
+from utils.db import reads_from_primary
+from utils.notifications import get_hub
+
+
+# ─── Change-driven, single-flight cache ────────────────────────────────────────
+# Entries are keyed by the loader's arguments and the server the session
+# reads from (utils/db.py routing), and stamped with the data versions they
+# were built from (see data_versions). A call whose stamp is
+# current returns at once. Otherwise the first caller rebuilds while every
+# other caller keeps getting the previous value; only the very first load of
+# a key makes others wait. Values are shared between sessions as-is, so
+# callers must not mutate them.
+#
+# While the listener is disconnected the stamp falls back to a time bucket of
+# `cache_fallback_seconds`. Entries are also rebuilt after
+# `cache_max_age_seconds`, which bounds how long replica-built entries can
+# lag behind the change their rebuild was triggered by.
+class ChangeCache:
+    def __init__(self, max_entries: int, max_age: float):
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # key -> (stamp, built_at, value)
+        self.inflight = {}            # key -> Event set when the build ends
+
+    def get(self, key, stamp, build):
+        while True:
+            with self.lock:
+                entry = self.entries.get(key)
+                if entry and entry[0] == stamp and time.time() - entry[1] < self.max_age:
+                    self.entries.move_to_end(key)
+                    return entry[2]
+                done = self.inflight.get(key)
+                if done is None:
+                    done = self.inflight[key] = threading.Event()
+                    break
+            if entry:
+                return entry[2]  # stale while another caller rebuilds
+            done.wait()  # first load: wait, then re-check (the build may have failed)
+
+        try:
+            value = build()
+            with self.lock:
+                self.entries[key] = (stamp, time.time(), value)
+                self.entries.move_to_end(key)
+                while len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+            return value
+        finally:
+            with self.lock:
+                del self.inflight[key]
+            done.set()
+
+
+@st.cache_resource
+def _cache_for(name: str) -> ChangeCache:
+    return ChangeCache(
+        max_entries=int(st.secrets.get("cache_max_entries", 64)),
+        max_age=float(st.secrets.get("cache_max_age_seconds", 300)),
+    )
+
+
+def _fallback_stamp() -> tuple:
+    return ("t", int(time.time() // float(st.secrets.get("cache_fallback_seconds", 30))))
+
+
+def change_stamp(domains: tuple[str, ...]) -> tuple:
+    """Changes whenever one of the data_versions domains does."""
+    hub = get_hub()
+    versions = tuple(hub.version(d) for d in domains)
+    if None in versions:
+        return _fallback_stamp()
+    return versions
+
+
+def month_stamp(month: date) -> tuple:
+    """Changes whenever a payment request requested or paid in the month
+    starting `month` does."""
+    return get_hub().month_version(month) or _fallback_stamp()
+
+
+def change_cached(*domains: str):
+    """Caches a loader until one of the named data_versions changes."""
+    def decorate(fn):
+        name = f"{fn.__module__}.{fn.__qualname__}"
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            # The stamp is read before building, so a change that lands
+            # during the build leaves the entry stale and it is rebuilt.
+            # A session reading its own writes never gets an entry that a
+            # lagging replica built under the same stamp.
+            key = (reads_from_primary(), args, tuple(sorted(kwargs.items())))
+            return _cache_for(name).get(key, change_stamp(domains), lambda: fn(*args, **kwargs))
+        return wrapper
+    return decorate
@@ -0,0 +1,32 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+
+@st.cache_resource
+def get_executor():
+    return ThreadPoolExecutor(
+        max_workers=int(st.secrets.get("fetch_workers", 8)),
+        thread_name_prefix="paytrack-fetch",
+    )
+
+
+# ─── Run independent loaders at once ───────────────────────────────────────────
+# Each call runs on a worker thread attached to the current script run, so
+# @st.cache_data, st.secrets and session state behave as on the main thread.
+# Returns {name: result} once every call has finished; the first error is
+# re-raised.
+def run_parallel(calls: dict) -> dict:
+    ctx = get_script_run_ctx()
+
+    def attached(fn):
+        def run():
+            add_script_run_ctx(threading.current_thread(), ctx)
+            return fn()
+        return run
+
+    executor = get_executor()
+    futures = {name: executor.submit(attached(fn)) for name, fn in calls.items()}
+    return {name: future.result() for name, future in futures.items()}
@@ -1,31 +1,23 @@
-import psycopg2
 import streamlit as st
-from utils.db_connection import get_db_connection
-from datetime import datetime
+
+from logic import repository
+from logic.login_handler import hash_password
+
+# ---------------------------------------
+# Compatibility wrappers over logic/repository.py
+# ---------------------------------------
 
 # ---------------------------------------
 # Authenticate User
-# (Moved here temporarily to match import in login page)
 # ---------------------------------------
 def authenticate_user(username: str, password: str):
-    from utils.auth import hash_password  # local import to avoid circular
-    conn = get_db_connection()
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT id, username, hashed_password, role, assigned_projects
-        FROM users
-        WHERE username = %s
-    """, (username,))
-    user = cur.fetchone()
-    cur.close()
-    conn.close()
-
-    if user and user[2] == hash_password(password):
+    user = repository.user_for_login(username)
+    if user and user["hashed_password"] == hash_password(password):
         return {
-            "user_id": user[0],
-            "username": user[1],
-            "role": user[3],
-            "assigned_projects": user[4]
+            "user_id": user["id"],
+            "username": user["username"],
+            "role": user["role"],
+            "assigned_projects": user["assigned_projects"]
         }
     return None
 
@@ -34,23 +26,7 @@ def authenticate_user(username: str, password: str):
 # ---------------------------------------
 def add_contractor(name, contact_person=None, contact_email=None, contact_phone=None, address=None):
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        cur.execute("""
-            INSERT INTO contractors (name, contact_person, contact_email, contact_phone, address, created_at, updated_at)
-            VALUES (%s, %s, %s, %s, %s, %s, %s)
-        """, (
-            name,
-            contact_person,
-            contact_email,
-            contact_phone,
-            address,
-            datetime.utcnow(),
-            datetime.utcnow()
-        ))
-        conn.commit()
-        cur.close()
-        conn.close()
+        repository.insert_contractor(name, contact_person, contact_email, contact_phone, address)
         return True
     except Exception as e:
         st.error(f"Error adding contractor: {e}")
@@ -61,17 +37,7 @@ def add_contractor(name, contact_person=None, contact_email=None, contact_phone=
 # ---------------------------------------
 def get_all_contractors():
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        cur.execute("""
-            SELECT name, contact_person, contact_email, contact_phone, address, created_at
-            FROM contractors
-            ORDER BY created_at DESC
-        """)
-        contractors = cur.fetchall()
-        cur.close()
-        conn.close()
-        return contractors
+        return repository.list_contractors()
     except Exception as e:
         st.error(f"Error loading contractors: {e}")
         return []
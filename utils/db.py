@@ -0,0 +1,148 @@
+import re
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+import psycopg2.extensions
+import streamlit as st
+from psycopg2.extras import RealDictCursor
+from psycopg2.pool import ThreadedConnectionPool
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+READ_YOUR_WRITES_KEY = "_primary_reads_until"
+
+
+class PreparingConnection(psycopg2.extensions.connection):
+    """A pooled connection that remembers the statements it has prepared."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared = set()
+
+
+# ─── Process-wide connection pools (one per DSN) ───────────────────────────────
+# ThreadedConnectionPool raises instead of waiting when it is exhausted, so a
+# semaphore of the same size makes callers queue for a free connection.
+@st.cache_resource
+def _pool_for(dsn: str, readonly: bool):
+    max_size = int(st.secrets.get("db_pool_max", 10))
+    kwargs = {"cursor_factory": RealDictCursor, "connection_factory": PreparingConnection}
+    if readonly:
+        # A write routed to the replica by mistake fails loudly.
+        kwargs["options"] = "-c default_transaction_read_only=on"
+    pool = ThreadedConnectionPool(1, max_size, dsn, **kwargs)
+    return pool, threading.BoundedSemaphore(max_size)
+
+
+def get_pool(replica: bool = False):
+    read_dsn = st.secrets.get("db_read_url")
+    if replica and read_dsn:
+        return _pool_for(read_dsn, True)
+    return _pool_for(st.secrets["db_url"], False)
+
+
+@contextmanager
+def pooled_connection(replica: bool = False):
+    pool, slots = get_pool(replica)
+    slots.acquire()
+    conn = None
+    try:
+        conn = pool.getconn()
+        yield conn
+        conn.commit()
+    except Exception:
+        if conn is not None and not conn.closed:
+            conn.rollback()
+        raise
+    finally:
+        if conn is not None:
+            pool.putconn(conn, close=bool(conn.closed))
+        slots.release()
+
+
+# ─── Read / write routing ──────────────────────────────────────────────────────
+# Read-only loaders go to `db_read_url` when it is configured. A session that
+# has just written reads from the primary for `read_your_writes_seconds`, so
+# it never sees a replica that has not caught up with its own change.
+def mark_write():
+    if get_script_run_ctx() is None:
+        return
+    window = float(st.secrets.get("read_your_writes_seconds", 30))
+    st.session_state[READ_YOUR_WRITES_KEY] = time.time() + window
+
+
+def reads_from_primary() -> bool:
+    if not st.secrets.get("db_read_url"):
+        return True
+    if get_script_run_ctx() is None:
+        return False
+    return st.session_state.get(READ_YOUR_WRITES_KEY, 0) > time.time()
+
+
+@contextmanager
+def read_connection():
+    with pooled_connection(replica=not reads_from_primary()) as conn:
+        yield conn
+
+
+@contextmanager
+def write_connection():
+    with pooled_connection() as conn:
+        yield conn
+    mark_write()
+
+
+# ─── Server-side prepared statements ───────────────────────────────────────────
+# A Statement is written with %(name)s parameters like any other query. On a
+# pooled connection it is PREPAREd the first time that connection runs it and
+# EXECUTEd by name afterwards, so repeated calls skip parsing and planning.
+# Prepared statements outlive rollbacks and end with the connection. Set
+# `db_prepared_statements = false` behind a transaction-mode pooler (e.g.
+# PgBouncer), where a session's statements do not follow it between
+# transactions; statements then run as plain queries.
+#
+# Parameter types are inferred from the SQL when prepared. Arrays arrive as
+# text[], so cast them in place: `= ANY(%(ids)s::text[]::uuid[])`.
+_PARAM = re.compile(r"%\((\w+)\)s")
+_statements = {}
+
+
+@dataclass(frozen=True)
+class Statement:
+    name: str
+    sql: str                # psycopg2 form, for plain execution
+    text: str               # $n form, for PREPARE
+    params: tuple[str, ...]
+
+
+def statement(name: str, sql: str) -> Statement:
+    order = []
+
+    def number(match):
+        if match.group(1) not in order:
+            order.append(match.group(1))
+        return f"${order.index(match.group(1)) + 1}"
+
+    text = _PARAM.sub(number, sql).replace("%%", "%")
+    if name in _statements and _statements[name].sql != sql:
+        raise ValueError(f"Statement {name!r} is already defined")
+    _statements[name] = Statement(name, sql, text, tuple(order))
+    return _statements[name]
+
+
+def execute(cur, stmt: Statement, params: dict | None = None):
+    params = params or {}
+    conn = cur.connection
+    if not isinstance(conn, PreparingConnection) or not st.secrets.get("db_prepared_statements", True):
+        cur.execute(stmt.sql, params)
+        return cur
+    if stmt.name not in conn.prepared:
+        cur.execute(f"PREPARE {stmt.name} AS {stmt.text}")
+        conn.prepared.add(stmt.name)
+    if stmt.params:
+        placeholders = ", ".join(["%s"] * len(stmt.params))
+        cur.execute(f"EXECUTE {stmt.name} ({placeholders})", [params[p] for p in stmt.params])
+    else:
+        cur.execute(f"EXECUTE {stmt.name}")
+    return cur
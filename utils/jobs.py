@@ -0,0 +1,385 @@
+"""Background jobs in Postgres (migration 0014).
+
+    python -m utils.jobs work --workers 4              # run a pool of worker processes
+    python -m utils.jobs enqueue archive --payload '{"after_days": 365}'
+    python -m utils.jobs status                        # queue depth by kind and status
+
+Pages and jobs alike call submit()/enqueue() to defer slow work. Any number
+of workers, in the app (`jobs_app_workers` threads per server process) or in
+separate processes, claim the most urgent due job with FOR UPDATE SKIP
+LOCKED. A job runs under a lease of `timeout` seconds; one that raises is
+put back with an exponential delay until `max_attempts` is used up, and one
+whose worker died is handed out again when its lease runs out.
+"""
+
+import argparse
+import importlib
+import json
+import multiprocessing
+import os
+import select
+import socket
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable
+
+import psycopg2
+import streamlit as st
+from psycopg2.extras import Json, RealDictCursor
+
+from utils.db import execute, pooled_connection, statement, write_connection
+
+CHANNEL = "jobs"
+HANDLER_MODULES = ("logic.archive", "logic.cleanup", "logic.reports")
+TIMEOUT_SECONDS = 900
+RETRY_BASE_SECONDS = 30
+POLL_SECONDS = 30
+SWEEP_SECONDS = 3600
+KEEP_DONE_DAYS = 7
+KEEP_FAILED_DAYS = 30
+
+# Conventional priorities: what a user is waiting for, then maintenance
+PRIORITY_INTERACTIVE = 10
+PRIORITY_DEFAULT = 0
+PRIORITY_MAINTENANCE = -10
+
+
+# ─── Handlers ──────────────────────────────────────────────────────────────────
+# A handler gets a connection of its own (RealDictCursor, not autocommit) and
+# the job's payload, may commit as it goes, and returns a JSON-able result.
+# on_failure runs once a job has used its last attempt.
+@dataclass(frozen=True)
+class Handler:
+    run: Callable
+    on_failure: Callable | None = None
+
+
+HANDLERS: dict[str, Handler] = {}
+
+
+def job_handler(kind: str, on_failure: Callable | None = None):
+    def register(fn):
+        HANDLERS[kind] = Handler(fn, on_failure)
+        return fn
+    return register
+
+
+def load_handlers():
+    for module in HANDLER_MODULES:
+        importlib.import_module(module)
+
+
+# ─── Queue ─────────────────────────────────────────────────────────────────────
+# A job with a dedupe_key is not queued twice: while one is still waiting,
+# enqueueing another returns it (raising its priority if need be).
+ENQUEUE = """
+    INSERT INTO jobs (kind, payload, priority, dedupe_key, max_attempts, timeout_seconds, run_after)
+    VALUES (%(kind)s, %(payload)s, %(priority)s, %(dedupe_key)s, %(max_attempts)s, %(timeout)s,
+            NOW() + make_interval(secs => %(delay)s))
+    ON CONFLICT (dedupe_key) WHERE status = 'queued'
+    DO UPDATE SET priority = GREATEST(jobs.priority, EXCLUDED.priority)
+    RETURNING id
+"""
+
+JOB_STATUS = statement("job_status", """
+    SELECT id, kind, status, attempts, max_attempts, last_error, result,
+           created_at, started_at, finished_at
+    FROM jobs
+    WHERE id = ANY(%(ids)s)
+""")
+
+
+def enqueue(conn, kind: str, payload: dict | None = None, *, priority: int = PRIORITY_DEFAULT,
+            dedupe_key: str | None = None, delay: float = 0, max_attempts: int = 3,
+            timeout: int = TIMEOUT_SECONDS) -> int:
+    """Adds a job in the caller's transaction, so it only exists if the
+    caller's write commits; returns its id."""
+    cur = conn.cursor()
+    cur.execute(ENQUEUE, {
+        "kind": kind, "payload": Json(payload or {}), "priority": priority,
+        "dedupe_key": dedupe_key, "max_attempts": max_attempts, "timeout": timeout,
+        "delay": delay,
+    })
+    return cur.fetchone()["id"]
+
+
+def submit(kind: str, payload: dict | None = None, **options) -> int:
+    """Queues a job on its own and returns its id."""
+    with write_connection() as conn:
+        job_id = enqueue(conn, kind, payload, **options)
+    ensure_app_workers()
+    return job_id
+
+
+def job_status(*job_ids: int) -> dict[int, dict]:
+    """Status rows by job id: a primary-key lookup, cheap enough to poll."""
+    with pooled_connection() as conn:  # the primary: status follows the workers
+        rows = execute(conn.cursor(), JOB_STATUS, {"ids": list(job_ids)}).fetchall()
+    return {row["id"]: row for row in rows}
+
+
+# ─── Worker ────────────────────────────────────────────────────────────────────
+# Whether job j goes back to the queue after an attempt that did not finish:
+# it has attempts left and no newer job with its dedupe key is waiting.
+# Otherwise it fails, and gets a finished_at so the sweep removes it in time.
+TRY_AGAIN = """
+    j.attempts < j.max_attempts AND NOT EXISTS (
+        SELECT 1 FROM jobs q WHERE q.dedupe_key = j.dedupe_key AND q.status = 'queued'
+    )
+"""
+
+# Leases that ran out belong to workers that died; their jobs go back to the
+# queue, or fail if that was their last attempt.
+RELEASE_EXPIRED = f"""
+    UPDATE jobs j
+    SET status = CASE WHEN {TRY_AGAIN} THEN 'queued' ELSE 'failed' END,
+        last_error = 'lease expired: worker ' || COALESCE(j.worker, '?') || ' lost',
+        lease_until = NULL,
+        finished_at = CASE WHEN {TRY_AGAIN} THEN NULL ELSE NOW() END
+    WHERE j.status = 'running' AND j.lease_until < NOW()
+    RETURNING j.id, j.kind, j.payload, j.status, j.last_error
+"""
+
+CLAIM = """
+    UPDATE jobs
+    SET status = 'running', attempts = attempts + 1, worker = %(worker)s, started_at = NOW(),
+        lease_until = NOW() + make_interval(secs => timeout_seconds)
+    WHERE id = (
+        SELECT id FROM jobs
+        WHERE status = 'queued' AND run_after <= NOW()
+        ORDER BY priority DESC, run_after, id
+        LIMIT 1
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING id, kind, payload, attempts, max_attempts
+"""
+
+FINISH = """
+    UPDATE jobs SET status = 'done', result = %(result)s, last_error = NULL,
+                    lease_until = NULL, finished_at = NOW()
+    WHERE id = %(id)s AND status = 'running' AND worker = %(worker)s
+"""
+
+# Another try after RETRY_BASE_SECONDS * 2^(attempts - 1), unless the attempts
+# are used up or a newer job with the same dedupe key is already waiting
+RETRY = f"""
+    UPDATE jobs j
+    SET status = CASE WHEN {TRY_AGAIN} THEN 'queued' ELSE 'failed' END,
+        last_error = %(error)s,
+        lease_until = NULL,
+        run_after = NOW() + make_interval(secs => %(base)s * power(2, j.attempts - 1)),
+        finished_at = CASE WHEN {TRY_AGAIN} THEN NULL ELSE NOW() END
+    WHERE j.id = %(id)s AND j.status = 'running' AND j.worker = %(worker)s
+    RETURNING j.status
+"""
+
+NEXT_DUE = """
+    SELECT EXTRACT(EPOCH FROM MIN(run_after) - NOW()) AS wait FROM jobs WHERE status = 'queued'
+"""
+
+# Jobs superseded by a successor used to fail without a finished_at; their
+# last start stands in for it
+SWEEP = """
+    DELETE FROM jobs
+    WHERE (status = 'done' AND finished_at < NOW() - make_interval(days => %(keep_done)s))
+       OR (status = 'failed'
+           AND COALESCE(finished_at, started_at) < NOW() - make_interval(days => %(keep_failed)s))
+"""
+
+# Moves committed data version log rows into their domain's count (migration
+# 0017); writers do the same now and then, so this only tidies up
+PRUNE_DATA_VERSIONS = "SELECT prune_data_version_log()"
+
+
+class Worker:
+    def __init__(self, dsn: str, name: str):
+        self.dsn = dsn
+        self.name = name
+        self.swept = 0.0
+
+    def run_forever(self):
+        backoff = 1
+        while True:
+            conn = None
+            try:
+                conn = psycopg2.connect(self.dsn, cursor_factory=RealDictCursor,
+                                        application_name=f"paytrack-jobs {self.name}")
+                conn.cursor().execute(f"LISTEN {CHANNEL}")
+                conn.commit()
+                backoff = 1
+                while True:
+                    if not self.run_one(conn):
+                        self.sweep(conn)
+                        self.wait(conn)
+            except Exception as e:
+                print(f"jobs: worker {self.name} reconnecting after {e!r}", file=sys.stderr)
+                if conn is not None:
+                    conn.close()
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 60)
+
+    def run_one(self, conn) -> bool:
+        """Runs the most urgent due job, if any; False when none is due."""
+        cur = conn.cursor()
+        cur.execute(RELEASE_EXPIRED)
+        expired = cur.fetchall()
+        conn.commit()
+        for job in expired:
+            if job["status"] == "failed":
+                self._failed(conn, job, job["last_error"])
+
+        cur.execute(CLAIM, {"worker": self.name})
+        job = cur.fetchone()
+        conn.commit()
+        if job is None:
+            return False
+        handler = HANDLERS.get(job["kind"])
+        try:
+            if handler is None:
+                raise LookupError(f"no handler for job kind {job['kind']!r}")
+            result = handler.run(conn, job["payload"])
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            error = f"{type(e).__name__}: {e}"[:2000]
+            cur.execute(RETRY, {"id": job["id"], "worker": self.name, "error": error,
+                                "base": RETRY_BASE_SECONDS})
+            row = cur.fetchone()
+            conn.commit()
+            if row and row["status"] == "failed":
+                self._failed(conn, job, error)
+        else:
+            cur.execute(FINISH, {"id": job["id"], "worker": self.name, "result": Json(result)})
+            conn.commit()
+        return True
+
+    def _failed(self, conn, job: dict, error: str):
+        handler = HANDLERS.get(job["kind"])
+        if handler is None or handler.on_failure is None:
+            return
+        try:
+            handler.on_failure(conn, job["payload"], error)
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            print(f"jobs: on_failure of {job['kind']} job {job['id']} raised {e!r}", file=sys.stderr)
+
+    def sweep(self, conn):
+        if time.time() - self.swept < SWEEP_SECONDS:
+            return
+        cur = conn.cursor()
+        cur.execute(SWEEP, {"keep_done": KEEP_DONE_DAYS, "keep_failed": KEEP_FAILED_DAYS})
+        cur.execute(PRUNE_DATA_VERSIONS)
+        conn.commit()
+        self.swept = time.time()
+
+    def wait(self, conn):
+        """Sleeps until a job is announced, the next delayed one falls due or
+        POLL_SECONDS pass (which also notices expired leases)."""
+        cur = conn.cursor()
+        cur.execute(NEXT_DUE)
+        wait = cur.fetchone()["wait"]
+        conn.commit()
+        timeout = POLL_SECONDS if wait is None else min(POLL_SECONDS, max(float(wait), 0.05))
+        if select.select([conn], [], [], timeout) != ([], [], []):
+            conn.poll()
+            conn.notifies.clear()
+
+
+def worker_name(suffix: str = "") -> str:
+    return f"{socket.gethostname()}:{os.getpid()}{suffix}"
+
+
+# ─── App integration ───────────────────────────────────────────────────────────
+# Threads that work the queue inside the Streamlit server, so jobs run even
+# where no separate worker is deployed. Set `jobs_app_workers = 0` when
+# `python -m utils.jobs work` runs elsewhere.
+def _app_worker(dsn: str, name: str):
+    load_handlers()  # here rather than in the page run that started the thread
+    Worker(dsn, name).run_forever()
+
+
+@st.cache_resource
+def _app_workers() -> list[threading.Thread]:
+    threads = []
+    for i in range(int(st.secrets.get("jobs_app_workers", 1))):
+        threads.append(threading.Thread(
+            target=_app_worker, args=(st.secrets["db_url"], worker_name(f"/app-{i}")),
+            daemon=True, name=f"job-worker-{i}",
+        ))
+        threads[-1].start()
+    return threads
+
+
+def ensure_app_workers():
+    _app_workers()
+
+
+# ─── CLI ───────────────────────────────────────────────────────────────────────
+def _work(dsn: str, index: int):
+    # Through the imported module: under `python -m` this file is __main__,
+    # while the handler modules register on utils.jobs.
+    from utils import jobs
+
+    jobs.load_handlers()
+    jobs.Worker(dsn, worker_name(f"/{index}")).run_forever()
+
+
+def _serve(dsn: str, workers: int):
+    """Keeps `workers` worker processes running until interrupted."""
+    processes = {}
+    try:
+        while True:
+            for i in range(workers):
+                if i not in processes or not processes[i].is_alive():
+                    processes[i] = multiprocessing.Process(target=_work, args=(dsn, i), daemon=True)
+                    processes[i].start()
+            time.sleep(5)
+    except KeyboardInterrupt:
+        for p in processes.values():
+            p.terminate()
+
+
+def main():
+    from utils.migrations import default_dsn
+
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--dsn", default=default_dsn())
+    parser = argparse.ArgumentParser(description="PayTrack background jobs")
+    sub = parser.add_subparsers(dest="command", required=True)
+    work = sub.add_parser("work", parents=[common], help="run worker processes")
+    work.add_argument("--workers", type=int, default=2)
+    add = sub.add_parser("enqueue", parents=[common], help="queue one job")
+    add.add_argument("kind")
+    add.add_argument("--payload", type=json.loads, default={})
+    add.add_argument("--priority", type=int, default=PRIORITY_MAINTENANCE,
+                     help="higher runs first (default: %(default)s, below work queued by users)")
+    add.add_argument("--dedupe-key")
+    sub.add_parser("status", parents=[common], help="jobs by kind and status")
+    args = parser.parse_args()
+    if not args.dsn:
+        parser.error("no DSN: pass --dsn or set PAYTRACK_DB_URL")
+
+    if args.command == "work":
+        _serve(args.dsn, args.workers)
+        return
+    conn = psycopg2.connect(args.dsn, cursor_factory=RealDictCursor)
+    try:
+        if args.command == "enqueue":
+            job_id = enqueue(conn, args.kind, args.payload, priority=args.priority,
+                             dedupe_key=args.dedupe_key)
+            conn.commit()
+            print(f"queued job {job_id}")
+        else:
+            cur = conn.cursor()
+            cur.execute("SELECT kind, status, COUNT(*) AS n FROM jobs GROUP BY 1, 2 ORDER BY 1, 2")
+            for row in cur.fetchall():
+                print(f"{row['kind']:<12} {row['status']:<8} {row['n']}")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+import argparse
+import hashlib
+import importlib.util
+import os
+import re
+import sys
+import tomllib
+from pathlib import Path
+
+import psycopg2
+from psycopg2.extras import RealDictCursor
+
+MIGRATIONS_DIR = Path(__file__).resolve().parent.parent / "migrations"
+MIGRATION_FILE = re.compile(r"^(\d{4})_(\w+)\.(sql|py)$")
+NO_TRANSACTION = "-- migrate: no-transaction"
+LOCK_KEY = 727274  # pg_advisory_lock key so two deploys never migrate at once
+
+# ─── Indexes every deployment must have (table, leading key columns) ───────────
+# Expression keys are written as Postgres prints them, e.g. "lower(ref_no)".
+EXPECTED_INDEXES = [
+    ("payment_requests", ("contract_id", "status", "requested_date")),
+    ("payment_requests", ("status", "created_at")),
+    ("payment_requests", ("created_at",)),
+    ("payment_requests", ("requested_date",)),
+    ("contracts", ("project_id",)),
+    ("contracts", ("contractor_id",)),
+    ("contract_attachments", ("contract_id", "uploaded_at")),
+    ("payment_request_attachments", ("payment_request_id", "created_at")),
+    ("user_projects", ("user_id",)),
+    ("user_projects", ("project_id",)),
+    ("project_assignments", ("user_id",)),
+    ("project_assignments", ("project_id",)),
+    ("users", ("username",)),
+    ("payment_requests", ("lower(ref_no)",)),
+]
+
+
+# ─── DSN (CLI use, outside Streamlit) ──────────────────────────────────────────
+def default_dsn() -> str | None:
+    if os.environ.get("PAYTRACK_DB_URL"):
+        return os.environ["PAYTRACK_DB_URL"]
+    secrets = Path(__file__).resolve().parent.parent / ".streamlit" / "secrets.toml"
+    if secrets.is_file():
+        with open(secrets, "rb") as f:
+            return tomllib.load(f).get("db_url")
+    return None
+
+
+# ─── Discovery ─────────────────────────────────────────────────────────────────
+def discover() -> list[tuple[int, str, Path]]:
+    found = []
+    for path in sorted(MIGRATIONS_DIR.iterdir()):
+        m = MIGRATION_FILE.match(path.name)
+        if m:
+            found.append((int(m.group(1)), m.group(2), path))
+    versions = [v for v, _, _ in found]
+    if len(versions) != len(set(versions)):
+        raise RuntimeError("Duplicate migration version in migrations/")
+    return found
+
+
+def checksum(sql: str) -> str:
+    return hashlib.sha256(sql.encode()).hexdigest()
+
+
+def run_module(path: Path, conn):
+    # A .py migration defines upgrade(conn), for data moves that must commit
+    # in batches. It is called in autocommit mode and manages its own
+    # transactions; it is recorded as applied only if it returns.
+    spec = importlib.util.spec_from_file_location(f"migration_{path.stem}", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    module.upgrade(conn)
+
+
+def split_statements(sql: str) -> list[str]:
+    # Only used for no-transaction files (plain DDL, no function bodies).
+    lines = [l for l in sql.splitlines() if not l.strip().startswith("--")]
+    return [s.strip() for s in "\n".join(lines).split(";") if s.strip()]
+
+
+# ─── Runner ────────────────────────────────────────────────────────────────────
+def ensure_table(cur):
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version    INTEGER PRIMARY KEY,
+            name       TEXT NOT NULL,
+            checksum   TEXT NOT NULL,
+            applied_at TIMESTAMP NOT NULL DEFAULT NOW()
+        )
+        """
+    )
+
+
+def applied_versions(cur) -> dict[int, str]:
+    cur.execute("SELECT version, checksum FROM schema_migrations")
+    return {r["version"]: r["checksum"] for r in cur.fetchall()}
+
+
+def upgrade(dsn: str, target: int | None = None) -> list[str]:
+    conn = psycopg2.connect(dsn, cursor_factory=RealDictCursor)
+    conn.autocommit = True
+    cur = conn.cursor()
+    cur.execute("SELECT pg_advisory_lock(%s)", (LOCK_KEY,))
+    done = []
+    try:
+        ensure_table(cur)
+        applied = applied_versions(cur)
+        for version, name, path in discover():
+            if target is not None and version > target:
+                break
+            sql = path.read_text()
+            if version in applied:
+                if applied[version] != checksum(sql):
+                    print(f"warning: {path.name} changed after it was applied", file=sys.stderr)
+                continue
+
+            if path.suffix == ".py":
+                try:
+                    run_module(path, conn)
+                finally:
+                    if not conn.autocommit:
+                        conn.rollback()
+                        conn.autocommit = True
+                cur.execute(
+                    "INSERT INTO schema_migrations (version, name, checksum) VALUES (%s, %s, %s)",
+                    (version, name, checksum(sql)),
+                )
+            elif sql.lstrip().startswith(NO_TRANSACTION):
+                for statement in split_statements(sql):
+                    cur.execute(statement)
+                cur.execute(
+                    "INSERT INTO schema_migrations (version, name, checksum) VALUES (%s, %s, %s)",
+                    (version, name, checksum(sql)),
+                )
+            else:
+                conn.autocommit = False
+                try:
+                    cur.execute(sql)
+                    cur.execute(
+                        "INSERT INTO schema_migrations (version, name, checksum) VALUES (%s, %s, %s)",
+                        (version, name, checksum(sql)),
+                    )
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+                finally:
+                    conn.autocommit = True
+            done.append(path.name)
+    finally:
+        cur.execute("SELECT pg_advisory_unlock(%s)", (LOCK_KEY,))
+        conn.close()
+    return done
+
+
+def status(dsn: str) -> list[tuple[str, bool]]:
+    conn = psycopg2.connect(dsn, cursor_factory=RealDictCursor)
+    cur = conn.cursor()
+    ensure_table(cur)
+    applied = applied_versions(cur)
+    conn.commit()
+    conn.close()
+    return [(path.name, version in applied) for version, _, path in discover()]
+
+
+# ─── Index check ───────────────────────────────────────────────────────────────
+def missing_indexes(dsn: str) -> list[tuple[str, tuple[str, ...]]]:
+    conn = psycopg2.connect(dsn, cursor_factory=RealDictCursor)
+    cur = conn.cursor()
+    cur.execute(
+        """
+        SELECT t.relname AS table_name,
+               array_agg(pg_get_indexdef(i.indexrelid, k.ord::int, true) ORDER BY k.ord) AS columns
+        FROM pg_index i
+        JOIN pg_class t ON t.oid = i.indrelid
+        JOIN pg_namespace n ON n.oid = t.relnamespace
+        CROSS JOIN LATERAL generate_series(1, i.indnkeyatts) AS k(ord)
+        WHERE n.nspname = current_schema() AND i.indisvalid
+        GROUP BY i.indexrelid, t.relname
+        """
+    )
+    present = [(r["table_name"], tuple(r["columns"])) for r in cur.fetchall()]
+    conn.close()
+
+    missing = []
+    for table, columns in EXPECTED_INDEXES:
+        if not any(t == table and cols[:len(columns)] == columns for t, cols in present):
+            missing.append((table, columns))
+    return missing
+
+
+# ─── CLI ───────────────────────────────────────────────────────────────────────
+def main():
+    parser = argparse.ArgumentParser(description="PayTrack schema migrations")
+    parser.add_argument("command", choices=["upgrade", "status", "check"])
+    parser.add_argument("--dsn", default=default_dsn())
+    parser.add_argument("--target", type=int, help="stop after this version")
+    args = parser.parse_args()
+    if not args.dsn:
+        parser.error("no DSN: pass --dsn or set PAYTRACK_DB_URL")
+
+    if args.command == "upgrade":
+        done = upgrade(args.dsn, args.target)
+        print("\n".join(f"applied {name}" for name in done) or "schema is up to date")
+    elif args.command == "status":
+        for name, is_applied in status(args.dsn):
+            print(f"[{'x' if is_applied else ' '}] {name}")
+    else:
+        pending = [name for name, is_applied in status(args.dsn) if not is_applied]
+        missing = missing_indexes(args.dsn)
+        for name in pending:
+            print(f"pending migration: {name}")
+        for table, columns in missing:
+            print(f"missing index: {table} ({', '.join(columns)})")
+        if pending or missing:
+            sys.exit(1)
+        print("schema and indexes OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+import json
+import select
+import sys
+import threading
+import time
+from collections import deque
+from datetime import date, datetime
+
+import psycopg2
+import psycopg2.extensions
+import streamlit as st
+
+CHANNEL = "payment_requests"
+VERSIONS_CHANNEL = "data_versions"
+MONTHS_CHANNEL = "payment_request_months"
+ALL_PROJECTS_ROLES = ["Superadmin", "HQ Admin", "HQ Accountant"]
+
+
+# ─── Shared listener ───────────────────────────────────────────────────────────
+# One thread per process holds a dedicated LISTEN connection to the primary
+# and fans each notification out to the users subscribed to its project. Each
+# user has a bounded in-memory inbox; sessions only read it, so showing the
+# bell never queries the database. The same connection follows changes to
+# the data_versions domains, which change-driven caches key on, and the
+# months of payment request changes (migration 0018), which the closed-month
+# store keys on.
+class NotificationHub:
+    def __init__(self, dsn: str, inbox_size: int, idle_seconds: float):
+        self.dsn = dsn
+        self.inbox_size = inbox_size
+        self.idle_seconds = idle_seconds
+        self.lock = threading.Lock()
+        self.subscribers = {}  # user key -> (project ids or None for all, last seen)
+        self.inboxes = {}      # user key -> deque of events, newest last
+        self.unread = {}       # user key -> count
+        self.received = 0
+        self.versions = {}     # data_versions name -> change token; empty while disconnected
+        self.months = None     # month start (or "*" for all) -> changes seen; None while disconnected
+        self.connections = 0
+        self.thread = threading.Thread(target=self._run, daemon=True, name="notification-listener")
+        self.thread.start()
+
+    def subscribe(self, user_key: str, project_ids: frozenset | None):
+        with self.lock:
+            self.subscribers[user_key] = (project_ids, time.time())
+            self.inboxes.setdefault(user_key, deque(maxlen=self.inbox_size))
+            self.unread.setdefault(user_key, 0)
+
+    def inbox(self, user_key: str) -> tuple[list[dict], int]:
+        with self.lock:
+            return list(self.inboxes.get(user_key, ())), self.unread.get(user_key, 0)
+
+    def mark_read(self, user_key: str):
+        with self.lock:
+            self.unread[user_key] = 0
+
+    def version(self, name: str) -> tuple[int, int] | None:
+        """A token that changes whenever the domain changes, or None while the
+        listener is not connected (callers then fall back to time-based
+        expiry). Tokens are only comparable within this process."""
+        return self.versions.get(name)
+
+    def month_version(self, month: date) -> tuple[int, int, int] | None:
+        """Like version(), for the payment requests requested or paid in the
+        month starting `month`."""
+        with self.lock:
+            if self.months is None:
+                return None
+            return self.connections, self.months["*"], self.months.get(month, 0)
+
+    def _set_months(self, payload: str):
+        with self.lock:
+            for part in payload.split(","):
+                month = "*" if part == "*" else date.fromisoformat(part)
+                self.months[month] = self.months.get(month, 0) + 1
+
+    def _set_version(self, payload: str):
+        # Every notification counts as a change: writers commit in any order,
+        # so the xid in the payload says nothing about which change is newer.
+        name, _, _ = payload.rpartition(":")
+        with self.lock:
+            connection, changes = self.versions.get(name, (self.connections, 0))
+            self.versions[name] = (connection, changes + 1)
+
+    def dispatch(self, event: dict):
+        project_id = event.get("project_id")
+        now = time.time()
+        with self.lock:
+            self.received += 1
+            for key, (projects, seen) in list(self.subscribers.items()):
+                if now - seen > self.idle_seconds:
+                    # Nobody from this user has rendered a page for a while.
+                    del self.subscribers[key]
+                    self.inboxes.pop(key, None)
+                    self.unread.pop(key, None)
+                    continue
+                if projects is not None and project_id not in projects:
+                    continue
+                if event.get("requested_by") and event["requested_by"] == key:
+                    continue  # the user's own submission
+                self.inboxes[key].append(event)
+                self.unread[key] += 1
+
+    def _run(self):
+        backoff = 1
+        while True:
+            try:
+                conn = psycopg2.connect(self.dsn)
+                conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+                cur = conn.cursor()
+                cur.execute(f"LISTEN {CHANNEL}; LISTEN {VERSIONS_CHANNEL}; LISTEN {MONTHS_CHANNEL}")
+                # Fresh tokens per connection: changes made while the listener
+                # was down were never seen, so nothing cached before counts.
+                cur.execute("SELECT name FROM data_version_names")
+                with self.lock:
+                    self.connections += 1
+                    self.versions = {name: (self.connections, 0) for name, in cur.fetchall()}
+                    self.months = {"*": 0}
+                backoff = 1
+                while True:
+                    if select.select([conn], [], [], 30) == ([], [], []):
+                        conn.cursor().execute("SELECT 1")  # keep-alive; notices a dead link
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        notify = conn.notifies.pop(0)
+                        if notify.channel == VERSIONS_CHANNEL:
+                            self._set_version(notify.payload)
+                            continue
+                        if notify.channel == MONTHS_CHANNEL:
+                            self._set_months(notify.payload)
+                            continue
+                        try:
+                            event = json.loads(notify.payload)
+                        except ValueError:
+                            continue
+                        event["received_at"] = datetime.now()
+                        self.dispatch(event)
+            except Exception as e:
+                with self.lock:
+                    self.versions = {}
+                    self.months = None
+                print(f"notifications: listener reconnecting after {e!r}", file=sys.stderr)
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 60)
+
+
+@st.cache_resource
+def get_hub() -> NotificationHub:
+    return NotificationHub(
+        st.secrets["db_url"],
+        inbox_size=int(st.secrets.get("notifications_max", 50)),
+        idle_seconds=float(st.secrets.get("notifications_idle_minutes", 60)) * 60,
+    )
+
+
+# ─── Session side ──────────────────────────────────────────────────────────────
+def user_key(user: dict) -> str | None:
+    return str(user["id"]) if user.get("id") else user.get("username")
+
+
+def subscribe_current_user() -> str | None:
+    user = st.session_state.get("user")
+    if not isinstance(user, dict) or not user_key(user):
+        return None
+    if user.get("role") in ALL_PROJECTS_ROLES:
+        projects = None
+    else:
+        projects = frozenset(str(p) for p in user.get("assigned_projects") or ())
+    key = user_key(user)
+    get_hub().subscribe(key, projects)
+    return key
+
+
+def describe(event: dict) -> str:
+    ref = event.get("ref_no") or "A payment request"
+    if event.get("event") == "insert":
+        return f"🆕 {ref} submitted ({event.get('status')})"
+    return f"🔄 {ref}: {event.get('old_status')} → {event.get('status')}"
@@ -0,0 +1,118 @@
+"""Boot-time warm-up of a Streamlit server process.
+
+    python -m utils.warmup serve app.py --server.port 8501   # streamlit run + warm-up at boot
+
+The first user after a deploy would otherwise pay for pandas, pyarrow and
+plotly being imported and for every cold loader behind the first pages. The
+warm-up does that work on a background thread instead: it imports the heavy
+libraries, then fills the reference store, the schema registry and the
+dashboard aggregates (all projects, then each of the first `warmup_projects`
+projects). `serve` starts it as soon as the server's runtime exists; under a
+plain `streamlit run` the first page run starts it (start_warm_up() is
+called by app.py and render_header()), so it is never done twice in one
+process. Set `warmup = false` to turn it off.
+"""
+
+import argparse
+import importlib
+import logging
+import sys
+import threading
+import time
+
+import streamlit as st
+
+# Libraries the pandas/plotly pages need, and the app modules that pull them in
+WARM_IMPORTS = (
+    "pandas", "pyarrow", "plotly.express",
+    "logic.analytics", "logic.user_admin", "logic.reports",
+)
+
+
+def _timed(timings: dict, step: str, fn):
+    started = time.perf_counter()
+    try:
+        return fn()
+    except Exception as e:
+        print(f"warmup: {step} failed: {e!r}", file=sys.stderr)
+    finally:
+        timings[step] = timings.get(step, 0.0) + time.perf_counter() - started
+
+
+def warm_up() -> dict[str, float]:
+    """Imports the heavy modules and fills the shared caches; returns the
+    seconds spent per step. A failing step is reported and skipped."""
+    timings = {}
+    for module in WARM_IMPORTS:
+        _timed(timings, f"import {module}", lambda m=module: importlib.import_module(m))
+
+    from logic.analytics import dashboard_calls
+    from logic.reference import reference_store
+    from logic.schema import schema_registry
+
+    ref = _timed(timings, "reference data", reference_store)
+    _timed(timings, "schema registry", schema_registry)
+    scopes = [None]
+    if ref is not None:
+        scopes += ref.project_names.ids.tolist()[:int(st.secrets.get("warmup_projects", 20))]
+    for project_id in scopes:
+        for name, call in dashboard_calls(project_id).items():
+            _timed(timings, f"dashboard {name}", call)
+    return timings
+
+
+class _NoScriptContextWarnings(logging.Filter):
+    # The warm-up thread runs outside any script run on purpose; Streamlit
+    # would otherwise warn about that on every cached call it makes.
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.threadName != "warm-up"
+
+
+@st.cache_resource(show_spinner=False)
+def start_warm_up() -> threading.Thread | None:
+    """Starts warm_up() on a background thread, once per process."""
+    if not st.secrets.get("warmup", True):
+        return None
+    logging.getLogger("streamlit.runtime.scriptrunner_utils.script_run_context").addFilter(
+        _NoScriptContextWarnings()
+    )
+    thread = threading.Thread(target=warm_up, daemon=True, name="warm-up")
+    thread.start()
+    return thread
+
+
+# ─── CLI ───────────────────────────────────────────────────────────────────────
+def _serve(streamlit_args: list[str]):
+    # Through the imported module: under `python -m` this file is __main__,
+    # while the pages call utils.warmup.start_warm_up().
+    from streamlit import runtime
+    from streamlit.web import cli
+
+    from utils import warmup
+
+    def start_when_ready():
+        # The cache storage belongs to the runtime; warming before it exists
+        # would fill throwaway caches.
+        while not runtime.exists():
+            time.sleep(0.05)
+        warmup.start_warm_up()
+
+    threading.Thread(target=start_when_ready, daemon=True, name="warm-up-boot").start()
+    sys.argv = ["streamlit", "run", *streamlit_args]
+    sys.exit(cli.main())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PayTrack boot-time warm-up")
+    sub = parser.add_subparsers(dest="command", required=True)
+    serve = sub.add_parser("serve", help="run the app with `streamlit run`, warming up at boot")
+    serve.add_argument("streamlit_args", nargs=argparse.REMAINDER,
+                       help="script and options for `streamlit run`, e.g. app.py --server.port 8501")
+    args = parser.parse_args()
+    if not args.streamlit_args:
+        parser.error("serve needs the app script, e.g. app.py")
+    _serve(args.streamlit_args)
+
+
+if __name__ == "__main__":
+    main()